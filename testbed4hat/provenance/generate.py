@@ -3,6 +3,8 @@ __package__ = "testbed4hat.provenance"
 from collections import defaultdict
 import csv
 from datetime import datetime
+from functools import partial
+import itertools
 import json
 import logging
 from pathlib import Path
@@ -13,7 +15,9 @@ import click
 from munch import munchify
 
 from provenance.bindings import *
-from ..testbed4hat.serge import SergeGame
+from ..testbed4hat.map_delta import MapDeltaDecoder
+from ..testbed4hat.message_journal import MessageJournal
+from ..testbed4hat.serge import STREAM_CHUNK_SIZE, SergeGame, iter_json_items
 
 
 logger = logging.getLogger(__name__)
@@ -337,9 +341,16 @@ class WAMessage(Message):
 
 
 class ShipDefenceWorld:
-    def __init__(self, game_id: str):
+    def __init__(self, game_id: str, server_url: str = None, journal: MessageJournal = None):
         self.game_id: str = game_id
-        self.serge = SergeGame(game_id)  # interface with the Serge server for the selected game
+        # the messages already journaled (e.g. by the runner of the game) are not downloaded again
+        self.journal = MessageJournal() if journal is None else journal
+        # interface with the Serge server for the selected game
+        self.serge = (
+            SergeGame(game_id, journal=self.journal)
+            if server_url is None
+            else SergeGame(game_id, server_url=server_url, journal=self.journal)
+        )
         self.turn_numer: int = 0
         self.adjudication_start_timestamp: Optional[datetime] = None
         self.phase: str = ""
@@ -354,6 +365,7 @@ class ShipDefenceWorld:
         # actions released their corresponding WA message id (in a list to accommodate multiple same actions)
         self.actions: dict[tuple, list[str]] = defaultdict(list)
 
+        self.map_decoder = MapDeltaDecoder()  # the map updates may be deltas
         self.bindings: list[tuple] = list()  # list of provenance bindings
 
     def record_bindings(self, bindings: tuple):
@@ -767,41 +779,60 @@ class ShipDefenceWorld:
         return missile
 
     def run(self):
-        # load messages from the Serge server
+        # messages cached as JSON by the previous versions (streamed into the journal)
         cached_messages_file = Path(f"provenance/outputs/{self.game_id}.json")
-        if cached_messages_file.exists():
-            with cached_messages_file.open() as f:
-                messages = json.load(f)
-                logger.debug("Loaded %d messages from %s", len(messages), cached_messages_file)
-        else:
-            messages = self.serge.get_new_messages()
-            logger.debug("Retrieved %d messages from the game %s", len(messages), self.game_id)
-            with cached_messages_file.open("w") as f:
-                json.dump(messages, f, indent=2)
-
-        # process messages
-        messages = munchify(messages)
+        if cached_messages_file.exists() and not self.journal.count(self.game_id):
+            with cached_messages_file.open("rb") as f:
+                chunks = iter(partial(f.read, STREAM_CHUNK_SIZE), b"")
+                self.journal.append(self.game_id, iter_json_items(chunks, key=None))
+                logger.debug("Loaded %d messages from %s", self.journal.count(self.game_id), cached_messages_file)
+        # load the messages from the journal, and the new ones from the Serge server
+        downloaded = self.serge.sync_journal()
+        logger.debug("Retrieved %d new messages from the game %s", downloaded, self.game_id)
+        self.process_messages(self.journal.iter_messages(self.game_id))
+
+    def process_messages(self, messages: Iterable[dict]):
+        """
+        Process the messages of the game in order, one at a time (e.g. as they are read from the journal or
+        downloaded, see SergeGame.iter_messages).
+        """
         # add timestamp to the messages
-        messages = list(map(add_timestamp_from_id, messages))
+        messages = (add_timestamp_from_id(munchify(msg)) for msg in messages)
         # initialise the game world
-        first_info_message = messages[0]
+        first_info_message = next(messages)
         assert first_info_message.messageType == "InfoMessage"  # expecting the first message to be an InfoMessage
         self.init_game(first_info_message)
-        while messages:
-            msg = messages.pop(0)
+        # consecutive MappingMessages overwrite the previous one; we only need the last one (processed at the time of
+        #   the first one)
+        mapping_message, mapping_timestamp = None, None
+        for msg in itertools.chain([first_info_message], messages):
+            if msg.messageType == "MappingMessage":
+                # (the map may be sent as deltas, each of them is decoded)
+                features = self.map_decoder.decode(msg.featureCollection)
+                if features is None:
+                    logger.warning("Ignoring the MappingMessage at %s (a previous map update is missing)", msg._id)
+                    continue
+                msg.featureCollection.features = munchify(features)
+                if mapping_message is None:
+                    mapping_timestamp = msg.timestamp
+                else:
+                    logger.debug("Ignoring the MappingMessage at %s", mapping_message._id)
+                mapping_message = msg
+                continue
+            if mapping_message is not None:
+                self.timestamp = mapping_timestamp
+                self.process_mapping_message(mapping_message)
+                mapping_message = None
             self.timestamp = msg.timestamp
             if msg.messageType == "InfoMessage":
                 self.process_info_message(msg)
-            elif msg.messageType == "MappingMessage":
-                while messages and messages[0].messageType == "MappingMessage":
-                    # consecutive MappingMessage overwrites the previous one; we only need the last one
-                    logger.debug("Ignoring the MappingMessage at %s", msg._id)
-                    msg = messages.pop(0)
-                self.process_mapping_message(msg)
             elif msg.messageType == "CustomMessage":
                 self.process_custom_message(msg)
             else:
                 logger.warning("Unknown message type: %s", msg.messageType)
+        if mapping_message is not None:
+            self.timestamp = mapping_timestamp
+            self.process_mapping_message(mapping_message)
 
     # save the bindings to a CSV file
     def write_bindings(self, path: Path):
@@ -825,7 +856,14 @@ def add_ed_to_verbs(verb: str) -> str:
 
 @click.command()
 @click.argument("game_id")
-def main(game_id: str):
+@click.option(
+    "-j",
+    "--journal",
+    default="provenance/outputs/messages.sqlite",
+    type=click.Path(dir_okay=False),
+    help="SQLite file journaling the game messages (shared with serge_env_runner.py --journal)",
+)
+def main(game_id: str, journal: str):
     logging.basicConfig(level=logging.DEBUG)
     # Path initialisations
     csv_folder = Path("provenance/csv")
@@ -834,7 +872,7 @@ def main(game_id: str):
     log_file_handler = logging.FileHandler(target_folder / f"{game_id}.log")
     logger.addHandler(log_file_handler)
 
-    world = ShipDefenceWorld(game_id)
+    world = ShipDefenceWorld(game_id, journal=MessageJournal(journal))
 
     # load and process game messages
     world.run()
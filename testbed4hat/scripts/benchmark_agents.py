@@ -0,0 +1,43 @@
+# Copyright 2024 The Johns Hopkins University Applied Physics Laboratory LLC
+# All rights reserved.
+#
+# Licensed under the 3-Clause BSD License (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://opensource.org/licenses/BSD-3-Clause
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+
+import click
+
+from testbed4hat.agent_benchmark import DEFAULT_RAID_SIZES, run_benchmark
+
+
+@click.command()
+@click.option("-a", "--agent", "agents", multiple=True, help="Agent to benchmark (repeatable, default: all agents).")
+@click.option("-n", "--num-threats", "raid_sizes", multiple=True, type=int,
+              help=f"Number of threats in the observations (repeatable, default: {DEFAULT_RAID_SIZES}).")
+@click.option("-r", "--repeats", default=30, type=int, help="Number of timed decisions per agent and raid size.")
+@click.option("-s", "--seed", default=0, type=int, help="Seed of the synthetic observations.")
+@click.option("-o", "--output", default="agent_benchmark.json", help="JSON file the results are written to.")
+def main(agents: tuple, raid_sizes: tuple, repeats: int, seed: int, output: str):
+    """
+    Time the registered agents on synthetic observations of increasing raid sizes, and write the p50/p99 latency,
+    decisions per second and allocations to a JSON file (diff the files of two commits to spot regressions).
+    """
+    results = run_benchmark(agents or None, raid_sizes or DEFAULT_RAID_SIZES, repeats=repeats, seed=seed,
+                            progress=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+    print(f"Results written to {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+# Copyright 2024 The Johns Hopkins University Applied Physics Laboratory LLC
+# All rights reserved.
+#
+# Licensed under the 3-Clause BSD License (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://opensource.org/licenses/BSD-3-Clause
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+
+import click
+
+from testbed4hat.sweep import ParameterSweep, grid_design, random_design
+
+
+@click.command()
+@click.argument("sweep_spec", type=click.Path(exists=True))
+@click.option("-o", "--results", default="sweep_results.jsonl", help="JSON lines file the results are appended to.")
+@click.option("-w", "--workers", default=None, type=int, help="Number of worker processes (default: one per CPU).")
+def main(sweep_spec: str, results: str, workers: int):
+    """
+    Run a parameter sweep described by a JSON file, for example:
+
+    \b
+    {
+        "base_config": {"max_episode_time_in_seconds": 900},
+        "design": "grid",
+        "config": {"weapon_0_reload_time": [5, 10, 15], "num_ship_0_weapon_0": [5, 10]},
+        "agent": "heuristic",
+        "agent_params": {"threshold": [0.35, 0.5]},
+        "seeds": [0, 1, 2, 3]
+    }
+
+    For a random design, set "design" to "random", give [low, high] ranges (or lists of choices, as {"choices": [...]})
+    and the number of points to sample with "num_points". Agent parameter ranges with integer bounds (e.g.
+    "max_actions": [2, 10]) are sampled as integers, so float ones need float bounds (e.g. "threshold": [0.0, 1.0]).
+    Cells already in the results file are skipped.
+    """
+    with open(sweep_spec, 'r') as f:
+        spec = json.load(f)
+
+    if spec.get("design", "grid") == "grid":
+        cells = grid_design(spec.get("base_config"), spec["config"], spec["seeds"],
+                            agent=spec.get("agent", "heuristic"), agent_grid=spec.get("agent_params"))
+    else:
+        def to_space(space):
+            return space["choices"] if isinstance(space, dict) else tuple(space)
+
+        cells = random_design(spec.get("base_config"), {k: to_space(v) for k, v in spec["config"].items()},
+                              spec["num_points"], spec["seeds"], agent=spec.get("agent", "heuristic"),
+                              agent_space={k: to_space(v) for k, v in spec.get("agent_params", {}).items()},
+                              design_seed=spec.get("design_seed", 0))
+
+    sweep = ParameterSweep(results, max_workers=workers)
+    print(f"{len(cells)} cells, {len(sweep.pending(cells))} to compute")
+    sweep.run(cells, progress=True)
+
+
+if __name__ == '__main__':
+    main()
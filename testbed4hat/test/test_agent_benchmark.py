@@ -0,0 +1,46 @@
+# Copyright 2024 The Johns Hopkins University Applied Physics Laboratory LLC
+# All rights reserved.
+#
+# Licensed under the 3-Clause BSD License (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://opensource.org/licenses/BSD-3-Clause
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import unittest
+
+from testbed4hat.agent_benchmark import benchmark_config, run_benchmark, synthetic_observation
+from testbed4hat.hat_env import HatEnv
+
+
+class TestAgentBenchmark(unittest.TestCase):
+    def test_synthetic_observation_format(self):
+        config = benchmark_config()
+        observation = synthetic_observation(config, 20)
+        env_observation, info = HatEnv(config).reset()
+        self.assertEqual(observation.keys(), env_observation.keys())
+        for ship_key in ("ship_0", "ship_1"):
+            self.assertEqual(observation[ship_key].keys(), env_observation[ship_key].keys())
+            self.assertEqual(len(observation[ship_key]["threats"]), 20)
+            self.assertEqual(len(observation[ship_key]["weapons"]), 2)
+
+    def test_run_benchmark(self):
+        results = run_benchmark(["heuristic", "vectorized_heuristic"], raid_sizes=[10], repeats=3)
+        self.assertEqual([(r["agent"], r["format"]) for r in results["results"]],
+                         [("heuristic", "dict"), ("vectorized_heuristic", "dict"), ("vectorized_heuristic", "array")])
+        for result in results["results"]:
+            self.assertEqual(result["repeats"], 3)
+            self.assertLessEqual(result["p50_ms"], result["p99_ms"])
+            self.assertGreater(result["peak_alloc_bytes"], 0)
+        json.dumps(results)  # the results can be saved as JSON
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+# Copyright 2024 The Johns Hopkins University Applied Physics Laboratory LLC
+# All rights reserved.
+#
+# Licensed under the 3-Clause BSD License (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://opensource.org/licenses/BSD-3-Clause
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+import unittest
+
+import numpy as np
+
+from testbed4hat.anytime import AnytimeAgent
+from testbed4hat.hat_env import HatEnv
+from testbed4hat.hat_env_config import HatEnvConfig
+from testbed4hat.heuristic_agent import HeuristicAgent
+from testbed4hat.rollout_planner import RolloutPlanner
+
+
+class SlowAgent:
+    def heuristic_action(self, observation):
+        time.sleep(0.5)
+        return [(1, 1, "slow")]
+
+
+class FastAgent:
+    def heuristic_action(self, observation):
+        return [(0, 0, "fast")]
+
+
+class TestAnytimeAgent(unittest.TestCase):
+    def setUp(self):
+        np.random.seed(0)
+        self.config = HatEnvConfig({"render_env": False, "verbose": False, "seed": 0})
+        self.env = HatEnv(self.config)
+        self.agent = HeuristicAgent(self.config.weapon_0_speed, self.config.weapon_1_speed)
+        self.obs, info = self.env.reset()
+        for _ in range(6):
+            self.obs, reward, terminated, truncated, info = self.env.step(self.agent.heuristic_action(self.obs))
+
+    def test_single_step_agent(self):
+        decision = AnytimeAgent.from_agent(self.agent).act(self.obs, deadline_s=10)
+        self.assertTrue(decision.final)
+        self.assertEqual(decision.actions, self.agent.heuristic_action(self.obs))
+
+    def test_fast_agent_as_its_own_fallback(self):
+        anytime_agent = AnytimeAgent.from_agent(self.agent, fallback=self.agent)
+        decision = anytime_agent.act(self.obs, deadline_s=0)
+        self.assertTrue(decision.final)
+        self.assertEqual(decision.actions, self.agent.heuristic_action(self.obs))
+        # (no search is left running in the background)
+        self.assertFalse(anytime_agent.refining)
+        self.assertIs(anytime_agent.wait(timeout=0), decision)
+
+    def test_deadline_with_slow_agent(self):
+        anytime_agent = AnytimeAgent.from_agent(SlowAgent(), fallback=FastAgent())
+        start = time.perf_counter()
+        decision = anytime_agent.act(self.obs, deadline_s=0.05)
+        self.assertLess(time.perf_counter() - start, 0.4)
+        self.assertEqual(decision.actions, [(0, 0, "fast")])
+        self.assertEqual(decision.completed, 0.)
+
+        # the search keeps going in the background
+        self.assertTrue(anytime_agent.refining)
+        decision = anytime_agent.wait(timeout=10)
+        self.assertFalse(anytime_agent.refining)
+        self.assertTrue(decision.final)
+        self.assertEqual(decision.actions, [(1, 1, "slow")])
+
+    def test_planner(self):
+        planner = RolloutPlanner(self.config, horizon=2, num_seeds=2, max_workers=0)
+        anytime_agent = AnytimeAgent.from_planner(planner, self.env)
+        decision = anytime_agent.act(self.obs, deadline_s=60)
+        self.assertTrue(decision.final)
+        self.assertIn(decision.actions, planner.candidates(self.obs))
+
+        decision = anytime_agent.act(self.obs, deadline_s=0)
+        self.assertTrue(0 <= decision.completed <= 1)
+        anytime_agent.stop()
+        self.assertTrue(anytime_agent.latest().completed >= decision.completed)
+
+
+if __name__ == '__main__':
+    unittest.main()
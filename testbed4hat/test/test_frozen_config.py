@@ -0,0 +1,82 @@
+# Copyright 2024 The Johns Hopkins University Applied Physics Laboratory LLC
+# All rights reserved.
+#
+# Licensed under the 3-Clause BSD License (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://opensource.org/licenses/BSD-3-Clause
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pickle
+import unittest
+
+from testbed4hat.hat_env import HatEnv
+from testbed4hat.hat_env_config import HatEnvConfig, FrozenHatEnvConfig
+
+
+class TestFrozenConfig(unittest.TestCase):
+    def setUp(self):
+        self.config_data = {
+            "render_env": False,
+            "verbose": False,
+            "threat_0_color": [254, 1, 1],
+            "hard_ship_0_location": [-250, -200],
+            "schedule": {200: (0, 1), 100: (1, 1)},
+        }
+
+    def test_freeze_is_immutable(self):
+        config = HatEnvConfig(self.config_data).freeze()
+        self.assertIsInstance(config, FrozenHatEnvConfig)
+        with self.assertRaises(AttributeError):
+            config.seed = 42
+        with self.assertRaises(AttributeError):
+            config.set_parameter("seed", 42)
+
+    def test_canonical_hash(self):
+        config_1 = HatEnvConfig(self.config_data).freeze()
+        # same content, but tuples instead of lists and a different schedule order
+        config_2 = FrozenHatEnvConfig({**self.config_data,
+                                       "threat_0_color": (254, 1, 1),
+                                       "hard_ship_0_location": (-250, -200),
+                                       "schedule": {100: (1, 1), 200: (0, 1)}})
+        self.assertEqual(config_1.config_hash, config_2.config_hash)
+        self.assertEqual(config_1, config_2)
+        self.assertEqual(hash(config_1), hash(config_2))
+        self.assertEqual(config_1.config_hash, HatEnvConfig(self.config_data).config_hash)
+
+        # seeds share the content hash, but are different configs
+        config_3 = config_1.replace(seed=7)
+        self.assertEqual(config_1.config_hash, config_3.config_hash)
+        self.assertNotEqual(config_1, config_3)
+
+        config_4 = config_1.replace(weapon_0_reload_time=3)
+        self.assertNotEqual(config_1.config_hash, config_4.config_hash)
+        with self.assertRaises(ValueError):
+            config_1.replace(non_existent_parameter=1)
+
+    def test_pickle_round_trip(self):
+        config = HatEnvConfig(self.config_data).freeze()
+        self.assertEqual(pickle.loads(pickle.dumps(config)), config)
+
+    def test_derived_quantities_shared(self):
+        config = HatEnvConfig(self.config_data).freeze()
+        self.assertIs(config.derived, config.replace(seed=3).derived)
+
+        env = HatEnv(config)
+        self.assertEqual(env.max_weapons_per_turn, {"weapon_0": 4, "weapon_1": 6})
+        self.assertEqual(env.max_actions_step, 20)
+
+        calls = []
+        config.derived.memoize("key", lambda: calls.append(1))
+        config.replace(seed=5).derived.memoize("key", lambda: calls.append(1))
+        self.assertEqual(len(calls), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+# Copyright 2024 The Johns Hopkins University Applied Physics Laboratory LLC
+# All rights reserved.
+#
+# Licensed under the 3-Clause BSD License (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://opensource.org/licenses/BSD-3-Clause
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import asyncio
+import os
+import sys
+import unittest
+import warnings
+
+import numpy as np
+
+# (the game host and the runner are scripts, importing their sibling modules as top-level modules)
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "testbed4hat"))
+from game_host import GameHost  # noqa: E402
+from testbed4hat.serge_server import SergeStandIn  # noqa: E402
+from testbed4hat.wait_strategies import AdaptivePolling  # noqa: E402
+
+
+def stub_game(runner, play):
+    """Replace the game of a runner by the coroutine function play(runner)."""
+    async def run_async(max_in_flight):
+        await play(runner)
+    runner.run_async = run_async
+
+
+class TestGameHost(unittest.TestCase):
+    def test_slots_in_arrival_order(self):
+        # with one slot, the games waiting for it get it in the order they reached their adjudication phase
+        order = []
+
+        def arriving(delay):
+            async def play(runner):
+                await asyncio.sleep(delay)
+                async with runner.adjudication_slots:
+                    order.append(runner.game_id)
+                    await asyncio.sleep(0.05)
+            return play
+
+        with GameHost("http://127.0.0.1:1", max_adjudications=1) as host:
+            for game_id, delay in (("first", 0.), ("fourth", 0.03), ("second", 0.01), ("third", 0.02)):
+                stub_game(host.add_game(game_id), arriving(delay))
+            reports = asyncio.run(host.run())
+        self.assertEqual(order, ["first", "second", "third", "fourth"])
+        self.assertTrue(all(report["status"] == "finished" for report in reports.values()))
+
+    def test_add_game_while_running(self):
+        played = []
+
+        async def play(runner):
+            played.append(runner.game_id)
+
+        async def play_and_add(runner):
+            await asyncio.sleep(0.01)
+            # (the game is started at once, but its task has not run yet)
+            stub_game(host.add_game("late"), play)
+            played.append(runner.game_id)
+
+        with GameHost("http://127.0.0.1:1") as host:
+            stub_game(host.add_game("early"), play_and_add)
+            reports = asyncio.run(host.run())
+        self.assertEqual(played, ["early", "late"])
+        self.assertEqual({game_id: report["status"] for game_id, report in reports.items()},
+                         {"early": "finished", "late": "finished"})
+
+    def test_failing_game(self):
+        # a game failing mid-game is reported, and the others play to the end
+        np.random.seed(0)
+        with SergeStandIn(planning_seconds=0.2, max_turns=2) as server, GameHost(server.url) as host:
+            runners = {
+                game_id: host.add_game(game_id, max_game_minutes=2, wait_strategy=AdaptivePolling(
+                    min_interval=0.05, max_interval=0.2, default_phase_duration=0.2))
+                for game_id in ("wargame-ok-0", "wargame-failing", "wargame-ok-1")}
+
+            def fail():
+                raise RuntimeError("adjudication failed")
+            runners["wargame-failing"]._step_environment = fail
+            with warnings.catch_warnings(record=True) as caught:
+                warnings.simplefilter("always")
+                reports = asyncio.run(host.run())
+
+        self.assertEqual(reports["wargame-failing"]["status"], "failed")
+        self.assertIn("adjudication failed", reports["wargame-failing"]["error"])
+        self.assertTrue(any("Game wargame-failing failed" in str(w.message) for w in caught))
+        for game_id in ("wargame-ok-0", "wargame-ok-1"):
+            self.assertEqual(reports[game_id]["status"], "finished")
+            self.assertEqual(reports[game_id]["turns_processed"], 2)
+        self.assertEqual(len(server.games["wargame-ok-0"].since()), len(server.games["wargame-ok-1"].since()))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+# Copyright 2024 The Johns Hopkins University Applied Physics Laboratory LLC
+# All rights reserved.
+#
+# Licensed under the 3-Clause BSD License (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://opensource.org/licenses/BSD-3-Clause
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+import numpy as np
+
+from testbed4hat.hat_env import HatEnv
+from testbed4hat.hat_env_config import HatEnvConfig
+from testbed4hat.heuristic_agent import HeuristicAgent
+from testbed4hat.utils import InterceptGeometry, distance, get_weapon_launch_info
+
+
+class TestInterceptCache(unittest.TestCase):
+    def test_geometry_matches_launch_info(self):
+        rng = np.random.default_rng(0)
+        ship_location = np.array([1500., -300.])
+        weapon_speeds = (125., 150.)
+        for _ in range(20):
+            location = rng.uniform(-50_000, 50_000, size=2)
+            velocity = rng.uniform(-200, 200, size=2)
+            geometry = InterceptGeometry(location, velocity, ship_location, weapon_speeds)
+            for step in range(0, 300, 60):
+                threat_location = location + step * velocity
+                elapsed_time = geometry.elapsed_time(threat_location)
+                self.assertAlmostEqual(elapsed_time, step, places=6)
+                for weapon_idx, speed in enumerate(weapon_speeds):
+                    info = get_weapon_launch_info(threat_location, ship_location, velocity, speed)
+                    expected = 0. if info is None else float(distance(ship_location, info["intercept_point"]))
+                    self.assertAlmostEqual(geometry.intercept_distance(elapsed_time, weapon_idx), expected, places=4)
+
+    def test_cache_evicts_gone_threats(self):
+        np.random.seed(0)
+        config = HatEnvConfig({"render_env": False, "verbose": False, "seed": 0})
+        env = HatEnv(config)
+        agent = HeuristicAgent(config.weapon_0_speed, config.weapon_1_speed)
+        obs, info = env.reset()
+        terminated = truncated = False
+        while not (terminated or truncated):
+            action = agent.heuristic_action(obs)
+            threat_ids = {t["threat_id"] for t in obs["ship_0"]["threats"] + obs["ship_1"]["threats"]}
+            self.assertLessEqual(set(agent._intercept_cache), threat_ids)
+            obs, reward, terminated, truncated, info = env.step(action)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+# Copyright 2024 The Johns Hopkins University Applied Physics Laboratory LLC
+# All rights reserved.
+#
+# Licensed under the 3-Clause BSD License (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://opensource.org/licenses/BSD-3-Clause
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import random
+import unittest
+
+from testbed4hat.map_delta import MapDeltaDecoder, MapDeltaEncoder, quantize
+
+
+def feature(feature_id: str, x: float, y: float, **properties) -> dict:
+    return {
+        "geometry": {"coordinates": [x, y], "type": "Point"},
+        "properties": {"id": feature_id, "turn": 1, **properties},
+        "type": "Feature",
+    }
+
+
+def canonical(features: list[dict]) -> list[str]:
+    return sorted(json.dumps(f, sort_keys=True) for f in features)
+
+
+class TestMapDelta(unittest.TestCase):
+    def test_round_trip(self):
+        rng = random.Random(0)
+        encoder, decoder = MapDeltaEncoder(keyframe_interval=4), MapDeltaDecoder()
+        threats = {f"T{i}": (43. + rng.random(), 12. + rng.random()) for i in range(5)}
+        ring = {"geometry": {"coordinates": [[[43., 12.], [43.5, 12.5], [43., 12.]]], "type": "Polygon"},
+                "properties": {"id": "feature-range-long"}, "type": "Feature"}
+        for turn in range(12):
+            threats = {t: (x + 0.01, y - 0.01) for t, (x, y) in threats.items() if rng.random() > 0.2}
+            threats[f"T{turn + 5}"] = (43., 12.)
+            features = [ring] + [feature(t, x, y, turn=turn) for t, (x, y) in threats.items()]
+            # two lines to the same threat
+            features += [feature("line", 43., 12.), feature("line", 43.1, 12.1, turn=turn)]
+            collection = encoder.encode(features)
+            self.assertEqual(collection["delta"]["base"] == collection["delta"]["seq"], turn % 4 == 0)
+            self.assertEqual(canonical(decoder.decode(json.loads(json.dumps(collection)))),
+                             canonical([quantize(f) for f in features]))
+
+    def test_changes(self):
+        encoder = MapDeltaEncoder()
+        ship = feature("ship", 43.123456789, 12., **{"LR ammo": 10})
+        encoder.encode([ship, feature("T1", 43., 12.)])
+        # moving less than the precision is not a change
+        delta = encoder.encode([ship, feature("T1", 43.0000001, 12.)])
+        self.assertEqual((delta["features"], delta["delta"]["patches"], delta["delta"]["removed"]), ([], [], []))
+
+        ship["properties"]["LR ammo"] = 9  # (changed in place, as the runner does)
+        delta = encoder.encode([ship, feature("T2", 44., 13.)])
+        self.assertEqual(delta["delta"]["keys"], ["T2"])
+        self.assertEqual(delta["delta"]["removed"], ["T1"])
+        self.assertEqual(delta["delta"]["patches"], [{"key": "ship", "patch": {"properties": {"LR ammo": 9}}}])
+
+    def test_missed_updates(self):
+        encoder, decoder = MapDeltaEncoder(keyframe_interval=3), MapDeltaDecoder()
+        collections = [encoder.encode([feature("T1", 43. + i, 12.)]) for i in range(6)]
+        # a missed delta: the next one is from the keyframe too
+        self.assertEqual(decoder.decode(collections[0])[0]["geometry"]["coordinates"], [43., 12.])
+        self.assertEqual(decoder.decode(collections[2])[0]["geometry"]["coordinates"], [45., 12.])
+        # a missed keyframe: the map is unknown until the next one
+        decoder = MapDeltaDecoder()
+        self.assertIsNone(decoder.decode(collections[1]))
+        self.assertEqual(decoder.decode(collections[3])[0]["geometry"]["coordinates"], [46., 12.])
+        # whole maps are returned as they are
+        self.assertEqual(decoder.decode({"features": [feature("T9", 1., 2.)]}), [feature("T9", 1., 2.)])
+
+    def test_smaller(self):
+        encoder = MapDeltaEncoder(keyframe_interval=10)
+        ring = {"geometry": {"coordinates": [[[43. + i / 100, 12.] for i in range(65)]], "type": "Polygon"},
+                "properties": {"id": "feature-range-long"}, "type": "Feature"}
+        full, encoded = 0, 0
+        for turn in range(10):
+            features = [ring] + [feature(f"T{i}", 43. + turn / 100, 12., turn=turn) for i in range(20)]
+            full += len(json.dumps(features))
+            encoded += len(json.dumps(encoder.encode(features)))
+        self.assertLess(encoded, full * 0.7)  # (the ring is only in the keyframe, the threats all move)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+# Copyright 2024 The Johns Hopkins University Applied Physics Laboratory LLC
+# All rights reserved.
+#
+# Licensed under the 3-Clause BSD License (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://opensource.org/licenses/BSD-3-Clause
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import unittest
+
+import numpy as np
+import pyproj
+
+from testbed4hat.map_projection import MapProjection
+
+
+class TestMapProjection(unittest.TestCase):
+    def test_same_as_proj(self):
+        # the conversion the runner did point by point
+        proj = pyproj.Proj(proj="utm", zone=31, ellps="WGS84", preserve_units=True)
+        zero_x, zero_y = proj(12.819648833091783, 43.21484211402448)
+        xy = np.random.default_rng(0).uniform(-40000, 40000, (100, 2))
+        expected = []
+        for x, y in xy:
+            lat, long = proj(x + zero_x, y + zero_y, inverse=True)
+            expected.append([long, lat])
+
+        projection = MapProjection()
+        self.assertEqual(projection.to_long_lat(xy).tolist(), expected)
+        self.assertEqual(projection.to_long_lat(xy.tolist()).tolist(), expected)
+        self.assertEqual(projection.point(*xy[0]), expected[0])
+        np.testing.assert_allclose(projection.to_long_lat([[0, 0]]), [projection.origin], rtol=1e-12)
+
+    def test_static_points(self):
+        projection = MapProjection()
+        point = projection.point(-250, -200)
+        point.append(0.)  # (the returned lists are copies)
+        self.assertEqual(projection.point(-250, -200), point[:2])
+        self.assertEqual(len(projection._static), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
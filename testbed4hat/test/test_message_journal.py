@@ -0,0 +1,80 @@
+# Copyright 2024 The Johns Hopkins University Applied Physics Laboratory LLC
+# All rights reserved.
+#
+# Licensed under the 3-Clause BSD License (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://opensource.org/licenses/BSD-3-Clause
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+from pathlib import Path
+import tempfile
+import unittest
+
+from testbed4hat.message_journal import MessageJournal
+from testbed4hat.serge import SergeGame
+from testbed4hat.serge_server import SergeStandIn
+
+
+def message(msg_id: str) -> dict:
+    return {"_id": msg_id, "messageType": "CustomMessage", "message": {"content": msg_id}}
+
+
+class TestMessageJournal(unittest.TestCase):
+    def test_journal(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "messages.sqlite"
+            with MessageJournal(path) as journal:
+                self.assertIsNone(journal.last_id("game"))
+                self.assertEqual(journal.append("game", [message("b"), message("a"), {"_id": "initial_wargame"}]), 2)
+                self.assertEqual(journal.append("game", [message("b"), message("c")]), 1)  # "b" is already there
+                journal.append("other game", [message("z")])
+
+            # the journal persists, and is read in id order after a cursor
+            with MessageJournal(path) as journal:
+                self.assertEqual(journal.count("game"), 3)
+                self.assertEqual(journal.last_id("game"), "c")
+                self.assertEqual([m["_id"] for m in journal.read("game")], ["a", "b", "c"])
+                self.assertEqual([m["_id"] for m in journal.read("game", after="a", limit=1)], ["b"])
+                self.assertEqual([m["_id"] for m in journal.iter_messages("game", batch_size=2)], ["a", "b", "c"])
+
+    def test_incremental_sync(self):
+        with SergeStandIn(auto_advance=False) as server:
+            local_game = server.create_game("wargame-journal")
+            journal = MessageJournal()
+            game = SergeGame("wargame-journal", server_url=server.url, journal=journal)
+            for i in range(3):
+                game.send_chat_message(f"message {i}")
+            self.assertEqual(len(game.get_new_messages()), 4)  # with the first InfoMessage
+            local_game.advance_phase()
+
+            # only the new message is downloaded, the others of the turn are read from the journal
+            self.assertEqual(game.sync_journal(), 1)
+            self.assertEqual(journal.read("wargame-journal")[-1]["phase"], "planning")
+            sent_bytes = server.stats()["sent_bytes"]
+            messages = game.get_messages(since_msg_id=journal.read("wargame-journal", limit=1)[0]["_id"])
+            self.assertEqual([m["messageType"] for m in messages], ["CustomMessage"] * 3 + ["InfoMessage"])
+            # (responses to lastDoc end with the game definition)
+            definition_size = len(json.dumps(server.template))
+            self.assertLess(server.stats()["sent_bytes"] - sent_bytes, definition_size + 100)
+            self.assertEqual(journal.count("wargame-journal"), 5)
+
+            # another client sharing the journal does not download the messages again
+            other = SergeGame("wargame-journal", server_url=server.url, journal=journal)
+            sent_bytes = server.stats()["sent_bytes"]
+            self.assertEqual(len(other.get_new_messages()), 5)
+            self.assertEqual(other.wait_for_messages(timeout=0.1), [])  # nothing new
+            self.assertLess(server.stats()["sent_bytes"] - sent_bytes, definition_size + 200)
+            game.close()
+            other.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+# Copyright 2024 The Johns Hopkins University Applied Physics Laboratory LLC
+# All rights reserved.
+#
+# Licensed under the 3-Clause BSD License (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://opensource.org/licenses/BSD-3-Clause
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import os
+import tempfile
+import unittest
+
+from testbed4hat.phase_timers import METRIC_NAME, PhaseTimers
+
+
+class TestPhaseTimers(unittest.TestCase):
+    def test_histogram(self):
+        timers = PhaseTimers(buckets=(0.01, 0.1, 1.))
+        for seconds in (0.005, 0.01, 0.05, 0.5, 2.):
+            timers.observe("step", seconds)
+        counts, total, count = timers.histogram("step")
+        self.assertEqual(counts, [2, 3, 4, 5])  # (the bounds are inclusive)
+        self.assertAlmostEqual(total, 2.565)
+        self.assertEqual(count, 5)
+        self.assertEqual(timers.histogram("send"), ([0, 0, 0, 0], 0., 0))
+
+        with self.assertRaises(ValueError), timers.time("map"):
+            raise ValueError()
+        summary = timers.summary()
+        self.assertEqual(summary["map"]["count"], 1)
+        self.assertEqual(summary["step"]["max_ms"], 2000.)
+
+    def test_prometheus(self):
+        timers = PhaseTimers(buckets=(0.1, 1.))
+        timers.observe("wait", 0.5)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "metrics", "game.prom")
+            timers.write(path, {"game": 'wargame "1"'})
+            with open(path) as f:
+                lines = f.read().splitlines()
+            self.assertEqual(os.listdir(os.path.dirname(path)), ["game.prom"])
+        labels = 'game="wargame \\"1\\"",phase="wait"'
+        self.assertEqual(lines[1], f"# TYPE {METRIC_NAME} histogram")
+        self.assertEqual(lines[2:], [
+            f'{METRIC_NAME}_bucket{{{labels},le="0.1"}} 0',
+            f'{METRIC_NAME}_bucket{{{labels},le="1.0"}} 1',
+            f'{METRIC_NAME}_bucket{{{labels},le="+Inf"}} 1',
+            f"{METRIC_NAME}_sum{{{labels}}} 0.5",
+            f"{METRIC_NAME}_count{{{labels}}} 1",
+        ])
+
+    def test_failed_write(self):
+        # a failed write leaves the previous file, and no temporary file
+        timers = PhaseTimers()
+        timers.observe("wait", 0.5)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "game.prom")
+            timers.write(path)
+            with open(path) as f:
+                written = f.read()
+
+            def fail(labels=None):
+                raise ValueError("not serializable")
+            timers.to_prometheus = fail
+            with self.assertRaises(ValueError):
+                timers.write(path)
+            self.assertEqual(os.listdir(directory), ["game.prom"])
+            with open(path) as f:
+                self.assertEqual(f.read(), written)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+# Copyright 2024 The Johns Hopkins University Applied Physics Laboratory LLC
+# All rights reserved.
+#
+# Licensed under the 3-Clause BSD License (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://opensource.org/licenses/BSD-3-Clause
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+from copy import deepcopy
+import random
+import statistics
+import unittest
+
+from testbed4hat.player_bots import CommandingOfficerBot, ReactionTime
+from testbed4hat.serge import MSG_WA, AsyncSergeGame, SergeGame
+from testbed4hat.serge_server import SergeStandIn
+from testbed4hat.wait_strategies import ChangeFeed
+
+INSTANT = ReactionTime(median=0.01, sigma=0., min_seconds=0.)
+
+
+class TestPlayerBots(unittest.TestCase):
+    def setUp(self):
+        self.server = SergeStandIn(auto_advance=False).start()
+        self.local_game = self.server.create_game("wargame-bots")
+        self.ai = SergeGame("wargame-bots", server_url=self.server.url)
+
+    def tearDown(self):
+        self.ai.close()
+        self.server.stop()
+
+    def suggest(self, threat_id: str, weapon: str, channel: str = SergeGame.TARGETING_CHANNEL_A) -> None:
+        message = deepcopy(MSG_WA)
+        message["details"]["channel"] = channel
+        message["message"].update({"Title": f"(1) {threat_id}: {weapon}", "Weapon": weapon})
+        message["message"]["Threat"]["ID"] = threat_id
+        self.ai.send_message(message)
+
+    def play(self, seconds: float = 0.5, **params) -> tuple[CommandingOfficerBot, list[dict]]:
+        """Run a bot of ship Alpha for a while, and return the WA messages posted by then."""
+        async def run():
+            bot = CommandingOfficerBot.for_ship(
+                AsyncSergeGame("wargame-bots", server_url=self.server.url), "alpha",
+                wait_strategy=ChangeFeed(timeout=0.1), **params
+            )
+            task = asyncio.create_task(bot.run())
+            await asyncio.sleep(seconds)
+            task.cancel()
+            await bot.game.drain()
+            bot.game.close()
+            return bot
+
+        bot = asyncio.run(run())
+        messages = [m for m in self.ai.get_messages() if m.get("templateId") == "WA Message"]
+        return bot, messages
+
+    def test_reaction_time(self):
+        rng = random.Random(0)
+        samples = [ReactionTime(median=20., sigma=0.6, min_seconds=1.).sample(rng) for _ in range(2000)]
+        self.assertAlmostEqual(statistics.median(samples), 20., delta=1.)
+        self.assertGreaterEqual(min(samples), 1.)
+        self.assertEqual(ReactionTime(median=5., sigma=0.).sample(rng), 5.)
+
+    def test_review(self):
+        self.local_game.advance_phase()  # planning
+        self.suggest("T1", "Long Range")
+        self.suggest("T2", "Short Range", channel=SergeGame.TARGETING_CHANNEL_B)  # not for CO Alpha
+        bot, messages = self.play(decision_weights=(0., 1., 0.), reaction_time=INSTANT, manual_probability=0.)
+
+        self.assertEqual(bot.stats.suggestions, 1)
+        self.assertEqual(bot.stats.amended, 1)
+        self.assertEqual(bot.stats.late, 0)
+        decision = messages[-1]
+        self.assertEqual(decision["details"]["collaboration"]["status"], "Released")
+        self.assertEqual(decision["message"]["Weapon"], "Short Range")
+        self.assertEqual(decision["message"]["Title"], "(1) T1: Short Range")
+        feedback = decision["details"]["collaboration"]["feedback"]
+        self.assertEqual([(f["fromId"], f["feedback"][:7]) for f in feedback], [("co-alpha", "[Amend]")])
+
+    def test_manual_assignment(self):
+        threat = {"_type": "MilSymRenderer", "force": "f-militia", "id": "T7", "Ship Targeted": "Alpha"}
+        self.ai.send_message({
+            "messageType": "MappingMessage",
+            "details": {"channel": "core-mapping"},
+            "featureCollection": {"type": "FeatureCollection", "features": [{"properties": threat}]},
+        })
+        self.local_game.advance_phase()  # planning
+        bot, messages = self.play(manual_probability=1., manual_reaction_time=INSTANT)
+
+        self.assertEqual(bot.stats.manual, 1)
+        self.assertEqual(len(messages), 1)
+        message = messages[0]
+        self.assertEqual(message["details"]["from"]["roleId"], "co-alpha")
+        self.assertEqual(message["details"]["channel"], SergeGame.TARGETING_CHANNEL_A)
+        self.assertEqual(message["details"]["collaboration"]["status"], "Released")
+        self.assertEqual(message["message"]["Threat"]["ID"], "T7")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+# Copyright 2024 The Johns Hopkins University Applied Physics Laboratory LLC
+# All rights reserved.
+#
+# Licensed under the 3-Clause BSD License (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://opensource.org/licenses/BSD-3-Clause
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import json
+from pathlib import Path
+import tempfile
+import unittest
+
+import numpy as np
+from pyproj import Geod
+
+from testbed4hat.range_rings import geodesic_point_buffer, great_circle_ring, range_ring
+
+
+class TestRangeRings(unittest.TestCase):
+    def test_great_circle_ring(self):
+        geod = Geod(ellps="WGS84")
+        for lat, lon in ((12.819648833091783, 43.21484211402448), (60., 10.), (-45., 170.)):
+            for radius in (1550., 13350., 29950.):
+                ring = great_circle_ring(lat, lon, radius)
+                exact = geodesic_point_buffer(lat, lon, radius)
+                self.assertEqual(ring.shape, exact.shape)
+                np.testing.assert_array_equal(ring[0], ring[-1])
+                *_, distances = geod.inv(np.full(len(ring), lon), np.full(len(ring), lat), ring[:, 0], ring[:, 1])
+                np.testing.assert_allclose(distances, radius, atol=1.)
+                *_, errors = geod.inv(exact[:, 0], exact[:, 1], ring[:, 0], ring[:, 1])
+                self.assertLess(errors.max(), 1.)
+
+    def test_cache(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            ring = range_ring(12.8, 43.2, 1550., cache_dir=cache_dir)
+            self.assertEqual(ring, great_circle_ring(12.8, 43.2, 1550.).tolist())
+            (path,) = Path(cache_dir).iterdir()
+            self.assertEqual(json.loads(path.read_text())["ring"], ring)
+
+            # cached rings are read back, and unreadable ones computed again
+            path.write_text(json.dumps({"key": json.loads(path.read_text())["key"], "ring": [[0., 0.]]}))
+            self.assertEqual(range_ring(12.8, 43.2, 1550., cache_dir=cache_dir), [[0., 0.]])
+            path.write_text("{")
+            self.assertEqual(range_ring(12.8, 43.2, 1550., cache_dir=cache_dir), ring)
+            self.assertEqual(json.loads(path.read_text())["ring"], ring)
+
+            # other rings have their own file
+            range_ring(12.8, 43.2, 1550., resolution=8, cache_dir=cache_dir)
+            range_ring(12.8, 43.2, 1550., exact=True, cache_dir=cache_dir)
+            self.assertEqual(len(list(Path(cache_dir).glob("*.json"))), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
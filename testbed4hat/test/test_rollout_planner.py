@@ -0,0 +1,98 @@
+# Copyright 2024 The Johns Hopkins University Applied Physics Laboratory LLC
+# All rights reserved.
+#
+# Licensed under the 3-Clause BSD License (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://opensource.org/licenses/BSD-3-Clause
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pickle
+import unittest
+
+import numpy as np
+
+from testbed4hat.hat_env import HatEnv
+from testbed4hat.hat_env_config import HatEnvConfig
+from testbed4hat.heuristic_agent import HeuristicAgent
+from testbed4hat.rollout_planner import RolloutPlanner
+
+
+class TestRolloutPlanner(unittest.TestCase):
+    def setUp(self):
+        np.random.seed(0)
+        self.config = HatEnvConfig({"render_env": False, "verbose": False, "seed": 0})
+        self.env = HatEnv(self.config)
+        self.agent = HeuristicAgent(self.config.weapon_0_speed, self.config.weapon_1_speed)
+        self.obs, info = self.env.reset()
+        for _ in range(6):
+            self.obs, reward, terminated, truncated, info = self.env.step(self.agent.heuristic_action(self.obs))
+
+    def _play(self, env, first_actions, num_steps=5):
+        rewards = []
+        actions = first_actions
+        for _ in range(num_steps):
+            obs, reward, terminated, truncated, info = env.step(actions)
+            rewards.append(reward)
+            if terminated or truncated:
+                break
+            actions = self.agent.heuristic_action(obs)
+        return rewards
+
+    def test_snapshot_restores_state(self):
+        actions = self.agent.heuristic_action(self.obs)
+        state = self.env.get_state()
+        rewards = self._play(self.env, actions)
+
+        self.env.set_state(state)
+        self.assertEqual(self._play(self.env, actions), rewards)
+
+        other_env = HatEnv(self.config)
+        other_env.reset()
+        other_env.set_state(pickle.loads(pickle.dumps(state)))
+        self.assertEqual(self._play(other_env, actions), rewards)
+
+    def test_snapshot_without_global_rng(self):
+        # the global numpy generator is left as it is, e.g. for the other environments drawing from it
+        state = self.env.get_state(include_global_rng=False)
+        self.assertNotIn("np_random_state", state)
+        self._play(self.env, self.agent.heuristic_action(self.obs))
+        np_random_state = np.random.get_state()
+        self.env.set_state(state)
+        self.env.set_state(self.env.get_state(), include_global_rng=False)
+        self.assertEqual(np.random.get_state()[2], np_random_state[2])
+        np.testing.assert_array_equal(np.random.get_state()[1], np_random_state[1])
+
+    def test_plan_in_process_leaves_env_untouched(self):
+        planner = RolloutPlanner(self.config, horizon=2, num_seeds=2, max_workers=0)
+        actions = self.agent.heuristic_action(self.obs)
+        state = self.env.get_state()
+
+        result = planner.plan(self.env, self.obs, time_budget=60)
+        self.assertIn(result.actions, result.candidates)
+        self.assertEqual(result.num_rollouts, 2 * len(result.candidates))
+        self.assertEqual(max(result.mean_returns), result.mean_returns[result.candidates.index(result.actions)])
+
+        # neither the env nor the global numpy generator were changed by the rollouts
+        rewards = self._play(self.env, actions)
+        self.env.set_state(state)
+        self.assertEqual(self._play(self.env, actions), rewards)
+
+    def test_plan_in_pool_within_budget(self):
+        with RolloutPlanner(self.config, horizon=2, num_seeds=2, max_workers=2) as planner:
+            result = planner.plan(self.env, self.obs, time_budget=30)
+            self.assertIn(result.actions, result.candidates)
+            self.assertLess(result.elapsed_time, 31)
+            # without any budget, the base policy actions are used
+            result = planner.plan(self.env, self.obs, time_budget=0)
+            self.assertEqual(result.actions, result.candidates[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
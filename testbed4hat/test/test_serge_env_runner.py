@@ -0,0 +1,379 @@
+# Copyright 2024 The Johns Hopkins University Applied Physics Laboratory LLC
+# All rights reserved.
+#
+# Licensed under the 3-Clause BSD License (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://opensource.org/licenses/BSD-3-Clause
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import asyncio
+from collections import Counter, defaultdict
+import copy
+import os
+import sys
+import tempfile
+from typing import Callable
+import unittest
+
+import numpy as np
+
+# (the runner is a script, importing its sibling modules as top-level modules)
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "testbed4hat"))
+from serge_env_runner import ICONS, SergeEnvRunner  # noqa: E402
+from testbed4hat.anytime import Decision  # noqa: E402
+from testbed4hat.serge import content_key  # noqa: E402
+from testbed4hat.serge_server import SergeStandIn  # noqa: E402
+from testbed4hat.wait_strategies import AdaptivePolling, ChangeFeed  # noqa: E402
+
+MAX_TURNS = 4
+
+
+class Crash(Exception):
+    pass
+
+
+def contents(messages: list[dict]) -> Counter:
+    """The contents of messages (see content_key)."""
+    return Counter(map(content_key, messages))
+
+
+def sent_messages(server: SergeStandIn, game_id: str) -> Counter:
+    """The contents of the messages sent by the runner of a game."""
+    return contents([
+        message for message in server.games[game_id].docs.values()
+        if message.get("messageType") in ("CustomMessage", "MappingMessage")
+    ])
+
+
+def suggestions_by_turn(server: SergeStandIn, game_id: str) -> Counter:
+    """The number of AI suggestions sent for each turn (from their title, e.g. "(3) threat_7: Long Range")."""
+    return Counter(
+        message["message"]["Title"].split(")")[0] for message in server.games[game_id].docs.values()
+        if message.get("templateId") == "WA Message"
+    )
+
+
+def messages_by_turn(server: SergeStandIn, game_id: str) -> defaultdict[int, list[dict]]:
+    """The messages sent by the runner of a game, by the turn of the adjudication phase they follow."""
+    messages = defaultdict(list)
+    turn = None
+    for message in server.games[game_id].since():
+        if message.get("messageType") == "InfoMessage" and message["phase"] == "adjudication":
+            turn = message["gameTurn"]
+        elif message.get("messageType") in ("CustomMessage", "MappingMessage"):
+            messages[turn].append(message)
+    return messages
+
+
+def rng_position() -> tuple[bytes, int]:
+    """The state of the global numpy random generator."""
+    state = np.random.get_state()
+    return state[1].tobytes(), state[2]
+
+
+class TestSergeEnvRunner(unittest.TestCase):
+    def setUp(self):
+        self.server = SergeStandIn(planning_seconds=0.3, max_turns=MAX_TURNS).start()
+        self.checkpoint_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.server.stop()
+        self.checkpoint_dir.cleanup()
+
+    def make_runner(self, game_id: str, max_game_minutes: int = MAX_TURNS, **params) -> SergeEnvRunner:
+        return SergeEnvRunner(game_id, server_url=self.server.url, max_game_minutes=max_game_minutes,
+                              wait_strategy=ChangeFeed(fallback=AdaptivePolling()), **params)
+
+    @staticmethod
+    def play(runner: SergeEnvRunner, use_async: bool) -> None:
+        if use_async:
+            asyncio.run(runner.run_async())
+        else:
+            runner.run()
+
+    def play_reference(self, game_id: str, use_async: bool, **params) -> None:
+        np.random.seed(0)
+        self.play(self.make_runner(game_id, **params), use_async)
+
+    def crash_and_resume(self, game_id: str, crash_turn: int, use_async: bool,
+                         patch_resumed: Callable[[SergeEnvRunner], None] = None) -> str:
+        """
+        Play a game crashing once the messages of <crash_turn> are posted (before its checkpoint), and resume it with
+        another runner.
+        :param patch_resumed: (Callable[[SergeEnvRunner], None]) Function changing the resumed runner.
+        :return: (str) The checkpoint file.
+        """
+        checkpoint_file = os.path.join(self.checkpoint_dir.name, f"{game_id}.ckpt")
+        np.random.seed(0)
+        crashing = self.make_runner(game_id, checkpoint_file=checkpoint_file)
+        save_checkpoint = crashing._save_checkpoint
+
+        def save_or_crash():
+            if crashing.turn == crash_turn:
+                raise Crash()
+            save_checkpoint()
+        crashing._save_checkpoint = save_or_crash
+        with self.assertRaises(Crash):
+            self.play(crashing, use_async)
+        crashing.serge_game.close()
+
+        resumed = self.make_runner(game_id, checkpoint_file=checkpoint_file)
+        if patch_resumed is not None:
+            patch_resumed(resumed)
+        self.play(resumed, use_async)
+        return checkpoint_file
+
+    def test_resume(self):
+        # a runner resuming a crashed game sends the same messages as an uninterrupted one, none twice
+        for use_async in (False, True):
+            with self.subTest(use_async=use_async):
+                suffix = "async" if use_async else "sync"
+                self.play_reference(f"wargame-reference-{suffix}", use_async)
+                checkpoint_file = self.crash_and_resume(f"wargame-resumed-{suffix}", 2, use_async)
+                self.assertEqual(sent_messages(self.server, f"wargame-resumed-{suffix}"),
+                                 sent_messages(self.server, f"wargame-reference-{suffix}"))
+                self.assertFalse(os.path.exists(checkpoint_file))  # (the game ended)
+
+    def test_hosted_resume_keeps_global_rng(self):
+        # a hosted game resumed from its checkpoint does not reset the global numpy generator of the other games, while
+        #   a game alone in its process goes on with the draws of the checkpoint
+        checkpoint_file = os.path.join(self.checkpoint_dir.name, "wargame-hosted.ckpt")
+        saving = self.make_runner("wargame-hosted", checkpoint_file=checkpoint_file)
+        saving._start_game()
+        np.random.seed(0)
+        saving._save_checkpoint()
+        saved = rng_position()
+        saving.serge_game.close()
+
+        for hosted in (True, False):
+            with self.subTest(hosted=hosted):
+                resumed = self.make_runner("wargame-hosted", checkpoint_file=checkpoint_file)
+                if hosted:
+                    resumed.adjudication_slots = asyncio.Semaphore()
+                self.assertTrue(resumed._start_game())
+                # (the draws of the env reset aside)
+                np.random.seed(1)
+                position = rng_position()
+                self.assertTrue(resumed._load_checkpoint())
+                self.assertEqual(rng_position(), position if hosted else saved)
+                resumed.serge_game.close()
+
+    def test_resume_with_other_suggestions(self):
+        # the suggestions of the turn of the crash are not sent again, even if the resumed runner suggests otherwise
+        #   (e.g. an agent searching until a deadline)
+        self.play_reference("wargame-reference", use_async=False)
+
+        def suggest_otherwise(runner):
+            make_message = runner._make_suggested_action_message
+
+            def make_other_message(action):
+                message = make_message(action)
+                message["message"]["Title"] += " (resumed)"
+                return message
+            runner._make_suggested_action_message = make_other_message
+
+        self.crash_and_resume("wargame-resumed", 2, use_async=False, patch_resumed=suggest_otherwise)
+        self.assertEqual(suggestions_by_turn(self.server, "wargame-resumed"),
+                         suggestions_by_turn(self.server, "wargame-reference"))
+        titles = [message["message"]["Title"] for message in self.server.games["wargame-resumed"].docs.values()
+                  if message.get("templateId") == "WA Message"]
+        self.assertFalse([title for title in titles if title.startswith("(3)") and title.endswith("(resumed)")])
+
+
+    def play_late(self, game_id: str, late_turn: int, use_async: bool, **params) -> None:
+        """
+        Play a game whose next two adjudication phases pass while the runner waits for that of turn <late_turn> (e.g.
+        during a network outage), so that it catches up with two turns.
+        """
+        np.random.seed(0)
+        runner = self.make_runner(game_id, **params)
+        if use_async:
+            wait = runner._wait_until_next_adjudication_phase_async
+        else:
+            wait = runner._wait_until_next_adjudication_phase
+
+        def skip_phases(adjudication_msg_id):
+            if runner.turn == late_turn - 1:
+                for _ in range(4):
+                    self.server.games[game_id].advance_phase()
+            return adjudication_msg_id
+
+        async def wait_late_async():
+            return skip_phases(await wait())
+        if use_async:
+            runner._wait_until_next_adjudication_phase_async = wait_late_async
+        else:
+            runner._wait_until_next_adjudication_phase = lambda: skip_phases(wait())
+        self.play(runner, use_async)
+
+    def assert_ship_destroyed(self, map_message: dict, ship_id: int):
+        ship = map_message["featureCollection"]["features"][ship_id]
+        self.assertEqual(ship["properties"]["sidc"], ICONS["ShipDestroyed"])
+        self.assertIn("Destroyed By", ship["properties"])
+
+    def test_catch_up(self):
+        # the runner falling two turns behind sends the map of the third one only, with a summary of the two others,
+        #   the same as if it was on time afterwards (without defence, Bravo is destroyed at the 5th turn)
+        self.server.max_turns = 5
+        for use_async in (False, True):
+            with self.subTest(use_async=use_async):
+                suffix = "async" if use_async else "sync"
+                self.play_reference(f"wargame-reference-{suffix}", use_async, max_game_minutes=6)
+                self.play_late(f"wargame-late-{suffix}", 2, use_async, max_game_minutes=6)
+                reference = messages_by_turn(self.server, f"wargame-reference-{suffix}")
+                late = messages_by_turn(self.server, f"wargame-late-{suffix}")
+
+                self.assertEqual(contents(late[0]), contents(reference[0]))
+                self.assertEqual(contents(late[1]), contents(reference[1]))
+                # (no map, chat message or suggestion for the turns caught up with)
+                self.assertEqual(late[2], [])
+                self.assertEqual(late[3], [])
+                summary = [m for m in late[4] if m.get("templateId") == "chat"]
+                self.assertEqual(len(summary), 1)
+                self.assertTrue(summary[0]["message"]["content"].startswith("Turns 2 to 3 were adjudicated late"))
+                self.assertEqual(contents(late[4]) - contents(summary), contents(reference[4]))
+                self.assertEqual(contents(late[5]), contents(reference[5]))
+                final_map = [m for m in late[5] if m["messageType"] == "MappingMessage"][-1]
+                self.assert_ship_destroyed(final_map, 1)
+
+    def test_catch_up_to_the_end(self):
+        # the game ending in a turn caught up with (Bravo destroyed), its final map is sent at its end with the summary
+        self.server.max_turns = 5
+        for use_async in (False, True):
+            with self.subTest(use_async=use_async):
+                suffix = "async" if use_async else "sync"
+                self.play_reference(f"wargame-reference-{suffix}", use_async, max_game_minutes=6)
+                self.play_late(f"wargame-late-{suffix}", 4, use_async, max_game_minutes=6)
+                reference = messages_by_turn(self.server, f"wargame-reference-{suffix}")
+                late = messages_by_turn(self.server, f"wargame-late-{suffix}")
+
+                self.assertEqual(late[4], [])
+                self.assertEqual(late[5], [])
+                maps = [m for m in late[6] if m["messageType"] == "MappingMessage"]
+                self.assertEqual(len(maps), 1)
+                self.assert_ship_destroyed(maps[0], 1)
+                reference_maps = [m for m in reference[5] if m["messageType"] == "MappingMessage"]
+                self.assertEqual(content_key(maps[0]), content_key(reference_maps[-1]))
+                chat = [m["message"]["content"] for m in late[6] if m.get("templateId") == "chat"]
+                self.assertTrue(chat[0].startswith("Turns 4 to 5 were adjudicated late"))
+                self.assertIn("Ship Bravo killed", chat[0])
+                self.assertEqual(chat[1], "Wargame ended!")
+                self.assertFalse([m for m in late[6] if m.get("templateId") == "WA Message"])
+
+
+    def play_releasing(self, game_id: str, release_turn: int, use_async: bool, **params) -> SergeEnvRunner:
+        """
+        Play a game in which a suggestion of turn <release_turn> is released at the very end of the planning phase
+        that follows, i.e. after the runner speculated on the adjudication phase.
+        """
+        np.random.seed(0)
+        runner = self.make_runner(game_id, **params)
+        # (the adjudication phases end once the runner processed them, see drive_game)
+        game = self.server.create_game(game_id, adjudication_seconds=3600.)
+        next_messages = runner.wait_strategy.next_messages
+        next_messages_async = runner.wait_strategy.next_messages_async
+
+        def drive_game():
+            if game.phase != "adjudication" or game.turn != runner.turn:
+                return
+            if runner.turn == release_turn:
+                # (once posted)
+                suggestions = [m for m in game.since() if m.get("templateId") == "WA Message"
+                               and m["message"]["Title"].startswith(f"({release_turn + 1})")]
+                if not suggestions:
+                    return
+                released = copy.deepcopy(suggestions[-1])
+                released["_id"] += "-released"
+                released["details"]["collaboration"]["status"] = "Released"
+                game.put([released])
+                game.advance_phase()  # (and the adjudication phase at once)
+            game.advance_phase()
+
+        def next_messages_driving(serge_game):
+            drive_game()
+            return next_messages(serge_game)
+
+        async def next_messages_driving_async(serge_game):
+            await serge_game.drain()  # (the suggestions posted in the background)
+            drive_game()
+            return await next_messages_async(serge_game)
+        runner.wait_strategy.next_messages = next_messages_driving
+        runner.wait_strategy.next_messages_async = next_messages_driving_async
+        self.play(runner, use_async)
+        return runner
+
+    def test_speculation(self):
+        # the adjudication phases computed in advance send the same messages, and those computed for other actions
+        #   than those released are discarded
+        for use_async in (False, True):
+            with self.subTest(use_async=use_async):
+                suffix = "async" if use_async else "sync"
+                self.play_releasing(f"wargame-reference-{suffix}", 2, use_async, speculate=False)
+                runner = self.play_releasing(f"wargame-speculative-{suffix}", 2, use_async)
+                self.assertEqual(sent_messages(self.server, f"wargame-speculative-{suffix}"),
+                                 sent_messages(self.server, f"wargame-reference-{suffix}"))
+                self.assertEqual(runner.speculation_outcomes["discarded"], 1)
+                self.assertEqual(runner.speculation_outcomes["used"], MAX_TURNS - 1)
+
+
+    def test_speculation_keeps_state(self):
+        # a speculation leaves the state of the runner as it was, warns of suggestions not final as when published,
+        #   and is discarded if the actions released changed
+        runner = self.make_runner("wargame-speculation")
+        runner._start_game()
+        runner.suggestion_agent.act = lambda observation, deadline_s: Decision([], completed=0.5, elapsed_time=0.1)
+        state = dict(vars(runner))
+        time_seconds = runner.env.time_seconds
+        with self.assertWarnsRegex(UserWarning, "not final by the deadline"):
+            runner._speculate([])
+        self.assertEqual(runner.speculation.attributes["turn"], 1)
+        self.assertEqual([name for name, value in vars(runner).items() if value is not state.get(name)],
+                         ["speculation"])
+        self.assertEqual(runner.env.time_seconds, time_seconds)
+
+        runner.turn_actions = [(0, 0, "T01")]
+        self.assertIsNone(runner._use_speculation())
+        self.assertEqual(runner.speculation_outcomes, {"discarded": 1})
+        self.assertEqual(runner.turn, 0)
+        self.assertEqual(runner.env.time_seconds, time_seconds)
+        runner.serge_game.close()
+
+
+    def test_hosted_speculation_keeps_global_rng(self):
+        # the games of a GameHost draw the threat outcomes from the same global numpy generator: the speculation of a
+        #   game neither rewinds the draws of another game adjudicating meanwhile, nor replays its own when used
+        slots = asyncio.Semaphore()
+        speculating, other = runners = [self.make_runner(f"wargame-hosted-{i}") for i in range(2)]
+        for runner in runners:
+            runner.adjudication_slots = slots
+            runner._start_game()
+        np.random.seed(0)
+        drawn = []
+
+        def suggest_while_the_other_steps():
+            # (the other game's adjudication, in another worker thread)
+            other._step_environment()
+            drawn.append(rng_position())
+            return []
+        speculating._suggest = suggest_while_the_other_steps
+        speculating._speculate([])
+        self.assertEqual(rng_position(), drawn[0])
+        self.assertEqual(len(other.env.threats), 2)  # (their outcomes were drawn)
+
+        speculating.turn_actions = []
+        self.assertIsNotNone(speculating._use_speculation())
+        self.assertEqual(rng_position(), drawn[0])
+        for runner in runners:
+            runner.serge_game.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+# Copyright 2024 The Johns Hopkins University Applied Physics Laboratory LLC
+# All rights reserved.
+#
+# Licensed under the 3-Clause BSD License (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://opensource.org/licenses/BSD-3-Clause
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import time
+import unittest
+
+from testbed4hat.serge import SergeGame
+from testbed4hat.serge_server import SergeStandIn
+
+
+class TestSergeStandIn(unittest.TestCase):
+    def setUp(self):
+        self.server = SergeStandIn(auto_advance=False).start()
+        self.game = SergeGame("wargame-test", server_url=self.server.url)
+
+    def tearDown(self):
+        self.game.close()
+        self.server.stop()
+
+    def test_game(self):
+        # the game definition has the channels of the ships
+        definition = self.game.get_wargame_last()
+        channels = {c["name"]: c["uniqid"] for c in definition["data"]["channels"]["channels"]}
+        self.assertEqual(channels["Alpha"], "channel-wa-alpha")
+
+        messages = self.game.get_new_messages()
+        self.assertEqual([(m["messageType"], m["gameTurn"], m["phase"]) for m in messages],
+                         [("InfoMessage", 0, "adjudication")])
+
+        self.server.games["wargame-test"].advance_phase()
+        with self.game.batch() as outbox:
+            self.game.send_chat_message("first")
+            self.game.send_chat_message("second")
+        self.assertTrue(all(outbox.results.values()))
+        self.assertTrue(self.game.send_chat_message("third"))
+        messages = self.game.get_new_messages()
+        self.assertEqual(messages[0]["phase"], "planning")
+        self.assertEqual([m["message"]["content"] for m in messages[1:]], ["first", "second", "third"])
+        self.assertEqual((self.game.turn_number, self.game.phase), (1, "planning"))
+        self.assertEqual(self.server.stats()["received_docs"], 3)
+
+    def test_change_feed(self):
+        self.game.get_new_messages()
+        threading.Timer(0.2, self.server.games["wargame-test"].advance_phase).start()
+        start = time.perf_counter()
+        messages = self.game.wait_for_messages(timeout=5)
+        self.assertLess(time.perf_counter() - start, 2)
+        self.assertEqual([m["phase"] for m in messages], ["planning"])
+
+    def test_phase_clock(self):
+        server = SergeStandIn(planning_seconds=0.05, adjudication_seconds=0.05, max_turns=3).start()
+        try:
+            game = SergeGame("wargame-clock", server_url=server.url)
+            game.get_new_messages()
+            time.sleep(1)
+            phases = [(m["gameTurn"], m["phase"]) for m in game.get_new_messages()]
+            self.assertEqual(phases, [(1, "planning"), (1, "adjudication"), (2, "planning"), (2, "adjudication"),
+                                      (3, "planning"), (3, "adjudication")])
+            game.close()
+        finally:
+            server.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,371 @@
+# Copyright 2024 The Johns Hopkins University Applied Physics Laboratory LLC
+# All rights reserved.
+#
+# Licensed under the 3-Clause BSD License (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://opensource.org/licenses/BSD-3-Clause
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+from copy import deepcopy
+import json
+import threading
+import time
+import unittest
+import warnings
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from testbed4hat.serge import (
+    CHAT_MESSAGE,
+    MSG_CHAT,
+    MSG_MAPPING_SHIPS,
+    AsyncSergeGame,
+    DocumentTemplate,
+    SergeGame,
+    SergeTransport,
+    content_key,
+    iter_json_items,
+)
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep the connections alive
+
+    def _respond(self, status: int, payload: dict):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/game/last":
+            self._respond(200, {"data": [{"_id": "initial_wargame", "data": {}}]})
+        elif self.path.startswith("/game/changes"):
+            if self.server.changes_body is not None:
+                body = self.server.changes_body
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            elif self.server.changes:
+                self._respond(200, {"data": self.server.messages})
+            else:
+                self._respond(404, {"msg": "not found"})
+        elif self.path == "/flaky":
+            self.server.flaky_calls += 1
+            if self.server.flaky_calls <= 2:
+                self._respond(503, {"msg": "unavailable"})
+            else:
+                self._respond(200, {"data": []})
+        else:
+            self._respond(200, {"data": self.server.messages + [{"_id": "initial_wargame"}]})
+
+    def do_PUT(self):
+        message = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        time.sleep(self.server.delay)
+        self.server.puts += 1
+        if self.path.startswith("/bulkDocs/"):
+            if not self.server.bulk or any(m["details"]["channel"] == "rejected" for m in message):
+                self._respond(404 if not self.server.bulk else 400, {"msg": "err"})
+            elif any(m["details"]["channel"] == "conflict" for m in message):
+                # the documents without conflict are applied
+                self.server.messages += [m for m in message if m["details"]["channel"] != "conflict"]
+                self._respond(409, {"msg": "conflict"})
+            else:
+                self.server.messages += message
+                self._respond(200, {"msg": "ok"})
+        elif message["details"]["channel"] == "rejected":
+            self._respond(400, {"msg": "err"})
+        elif any(m["_id"] == message["_id"] for m in self.server.messages) or (
+            message["details"]["channel"] == "conflict" and not self.server.conflicts
+        ):
+            self.server.conflicts += message["details"]["channel"] == "conflict"
+            self._respond(409, {"msg": "conflict"})
+        else:
+            self.server.messages.append(message)
+            self._respond(200, {"msg": "ok"})
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestSergeTransport(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.messages = []
+        self.server.flaky_calls = 0
+        self.server.puts = 0
+        self.server.bulk = True
+        self.server.delay = 0.
+        self.server.changes = False
+        self.server.changes_body = None
+        self.server.conflicts = 0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_connection_reuse(self):
+        with SergeGame("game", server_url=self.url) as game:
+            for i in range(5):
+                self.assertTrue(game.send_chat_message(f"message {i}"))
+            self.assertEqual(game.get_wargame_last()["_id"], "initial_wargame")
+            self.assertEqual(len(game.get_messages()), 5)
+            metrics = game.transport.metrics
+            self.assertEqual(metrics.requests, 7)
+            self.assertEqual(metrics.new_connections, 1)
+            self.assertEqual(metrics.reused_connections, 6)
+
+    def test_retry(self):
+        transport = SergeTransport(backoff_factor=0.01, seed=0)
+        response = transport.get(f"{self.url}/flaky")
+        self.assertTrue(response.ok)
+        self.assertEqual(transport.metrics.retries, 2)
+
+        transport.max_retries = 1
+        self.server.flaky_calls = 0
+        self.assertEqual(transport.get(f"{self.url}/flaky").status_code, 503)
+        transport.close()
+
+    def test_send_failure(self):
+        game = SergeGame("game", server_url=self.url, transport=SergeTransport(max_retries=1, backoff_factor=0.01))
+        message = {"details": {"channel": "rejected"}}
+        with self.assertWarns(UserWarning):
+            self.assertFalse(game.send_message(message))
+        self.assertEqual(game.transport.metrics.retries, 0)  # PUT requests reaching the server are not repeated
+
+        game.url = game.api_endpoint = "http://127.0.0.1:1"  # nothing listens there
+        with warnings.catch_warnings(record=True):
+            warnings.simplefilter("always")
+            self.assertFalse(game.send_message({"details": {"channel": "channel-chat"}}))
+        self.assertEqual(game.transport.metrics.retries, 1)  # the request never reached the server
+        self.assertEqual(game.transport.metrics.failures, 1)
+        game.close()
+
+    def test_batch(self):
+        game = SergeGame("game", server_url=self.url)
+        with game.batch(max_batch_size=4) as outbox:
+            for i in range(10):
+                self.assertTrue(game.send_chat_message(f"message {i}"))
+            self.assertEqual(self.server.puts, 0)
+        self.assertEqual(self.server.puts, 3)
+        self.assertEqual(len(outbox.results), 10)
+        self.assertTrue(all(outbox.results.values()))
+
+        # the messages are received in order, with increasing ids
+        messages = game.get_messages()
+        self.assertEqual([m["message"]["content"] for m in messages], [f"message {i}" for i in range(10)])
+        ids = [m["_id"] for m in messages]
+        self.assertEqual(ids, sorted(set(ids)))
+        game.close()
+
+    def test_batch_fallback(self):
+        game = SergeGame("game", server_url=self.url)
+        with warnings.catch_warnings(record=True):
+            warnings.simplefilter("always")
+            with game.batch() as outbox:
+                game.send_chat_message("accepted")
+                game.send_message({"details": {"channel": "rejected"}})
+                game.send_chat_message("accepted too")
+        self.assertEqual(list(outbox.results.values()), [True, False, True])
+        self.assertEqual(len(self.server.messages), 2)
+        self.assertTrue(game.bulk_supported)
+
+        # servers without a bulk endpoint
+        self.server.bulk = False
+        with warnings.catch_warnings(record=True):
+            warnings.simplefilter("always")
+            with game.batch() as outbox:
+                game.send_chat_message("first")
+                game.send_chat_message("second")
+        self.assertFalse(game.bulk_supported)
+        self.assertEqual(list(outbox.results.values()), [True, True])
+        self.assertEqual([m["message"]["content"] for m in self.server.messages[-2:]], ["first", "second"])
+        game.close()
+
+    def test_partial_bulk(self):
+        game = SergeGame("game", server_url=self.url)
+        with warnings.catch_warnings(record=True):
+            warnings.simplefilter("always")
+            with game.batch() as outbox:
+                game.send_chat_message("applied")
+                conflicting = CHAT_MESSAGE()
+                conflicting["details"]["channel"] = "conflict"  # (its id is taken)
+                game.send_message(conflicting)
+                game.send_chat_message("applied too")
+        # the documents applied by the bulk request are not posted again, the conflicting one gets a new id
+        self.assertEqual(list(outbox.results.values()), [True, True, True])
+        self.assertEqual(len(self.server.messages), 3)
+        self.assertEqual(self.server.messages[-1]["details"]["channel"], "conflict")
+        self.assertNotIn(self.server.messages[-1]["_id"], outbox.results)
+        game.close()
+
+    def test_skip_sent(self):
+        game = SergeGame("game", server_url=self.url)
+        for content in ("sent", "sent", "also sent"):
+            game.send_chat_message(content)
+        # a restarted client sending the same messages again, with new ids and timestamps
+        restarted = SergeGame("game", server_url=self.url)
+        restarted.turn_number = 1
+        restarted.skip_sent(restarted.get_messages())
+        with restarted.batch():
+            for content in ("sent", "new", "sent", "sent"):
+                self.assertTrue(restarted.send_chat_message(content))
+        self.assertEqual([m["message"]["content"] for m in self.server.messages[3:]], ["new", "sent"])
+        self.assertEqual(restarted.sent_before, {content_key(self.server.messages[2]): 1})
+        game.close()
+        restarted.close()
+
+    def test_change_feed(self):
+        game = SergeGame("game", server_url=self.url)
+        game.send_chat_message("message")
+        self.assertIsNone(game.wait_for_messages(timeout=1))
+        self.assertFalse(game.changes_supported)
+
+        game.changes_supported = self.server.changes = True
+        messages = game.wait_for_messages(timeout=1)
+        self.assertEqual(len(messages), 1)
+        self.assertEqual(game.last_msg_id, messages[0]["_id"])
+
+        # unexpected responses are failed requests, the fallback strategy is used
+        for body in (b'{"data": null}', b'not json', b'[1, 2]', b'{"msg": "ok"}'):
+            self.server.changes_body = body
+            self.assertIsNone(game.wait_for_messages(timeout=1), body)
+            self.assertTrue(game.changes_supported)
+        game.close()
+
+    def test_templates_unchanged(self):
+        template = deepcopy(MSG_CHAT)
+        game = SergeGame("game", server_url=self.url)
+        game.send_chat_message("first")
+        game.send_chat_message("second")
+        self.assertEqual(MSG_CHAT, template)
+        self.assertEqual([m["message"]["content"] for m in self.server.messages], ["first", "second"])
+        game.close()
+
+    def test_streamed_messages(self):
+        game = SergeGame("game", server_url=self.url)
+        for i in range(3):
+            game.send_chat_message(f"message {i}")
+        messages = game.iter_messages()
+        self.assertNotIsInstance(messages, list)
+        self.assertEqual([m["message"]["content"] for m in messages], ["message 0", "message 1", "message 2"])
+        self.assertEqual(game.get_messages(), self.server.messages)  # without the game definition
+        game.close()
+
+    def test_async_send(self):
+        channels = [f"channel-{i}" for i in range(4)]
+
+        def send_all(game):
+            messages = [{"details": {"channel": channel}, "message": {"content": i}} for i in range(3)
+                        for channel in channels]
+            for message in messages:
+                game.send_message(message)
+            return messages
+
+        self.server.delay = 0.05
+        game = SergeGame("game", server_url=self.url)
+        start = time.perf_counter()
+        send_all(game)
+        sync_time = time.perf_counter() - start
+        game.close()
+
+        async def run():
+            async_game = AsyncSergeGame("game", server_url=self.url, max_in_flight=4)
+            start = time.perf_counter()
+            sent = send_all(async_game)
+            self.assertEqual(async_game.in_flight, 12)
+            messages = await async_game.poll_new_messages()  # not delayed by the sends
+            self.assertLess(len(messages), 24)
+            results = await async_game.drain()
+            elapsed = time.perf_counter() - start
+            async_game.close()
+            return sent, results, async_game.posted_ids, elapsed
+
+        self.server.messages = []
+        sent, results, posted_ids, async_time = asyncio.run(run())
+        # the results are keyed by the ids set when the messages were sent, not the ids they were posted with
+        self.assertEqual(set(results), {message["_id"] for message in sent})
+        self.assertTrue(all(results.values()))
+        self.assertEqual(set(posted_ids.values()), {message["_id"] for message in self.server.messages})
+        self.assertLess(async_time, sync_time / 2)
+
+        # the messages of each channel are received in order
+        for channel in channels:
+            received = [m["message"]["content"] for m in self.server.messages if m["details"]["channel"] == channel]
+            self.assertEqual(received, [0, 1, 2])
+
+    def test_async_batch(self):
+        async def run():
+            game = AsyncSergeGame("game", server_url=self.url)
+            with game.batch():
+                game.send_chat_message("first")
+                game.send_chat_message("second")
+            game.send_chat_message("third")
+            results = await game.drain()
+            game.close()
+            return results
+
+        results = asyncio.run(run())
+        self.assertEqual(len(results), 3)
+        self.assertEqual(self.server.puts, 2)
+        self.assertEqual([m["message"]["content"] for m in self.server.messages], ["first", "second", "third"])
+
+
+class TestDocumentTemplate(unittest.TestCase):
+    def test_copies(self):
+        template = {"a": [1, 2.5, {"b": None}], "t": (True, "x"), "s": "quote ' \" \\ \u00e9", "n": -3}
+        build = DocumentTemplate(template)
+        copy = build()
+        self.assertEqual(copy, template)
+        copy["a"][2]["b"] = 1
+        self.assertEqual(template["a"][2]["b"], None)
+        self.assertIsNot(build()["a"], build()["a"])
+        self.assertEqual(DocumentTemplate(MSG_MAPPING_SHIPS)(), MSG_MAPPING_SHIPS)
+
+    def test_unsupported(self):
+        for template in ({1: "a"}, {"a": {1, 2}}, {"a": float("nan")}):
+            with self.subTest(template=template), self.assertRaises((TypeError, ValueError)):
+                DocumentTemplate(template)
+
+
+class TestJSONStream(unittest.TestCase):
+    def chunked(self, document: str, size: int) -> list[bytes]:
+        data = document.encode()
+        return [data[i:i + size] for i in range(0, len(data), size)]
+
+    def test_items(self):
+        items = [{"_id": "1", "text": "caf\u00e9 \u2192 \"quoted\" \\", "n": [1.5, -2e3, True, None]}, [], 10, "é"]
+        document = json.dumps({"msg": "ok", "nested": {"data": [0]}, "data": items, "after": 1}, ensure_ascii=False)
+        for size in (1, 2, 3, 7, len(document)):
+            with self.subTest(size=size):
+                self.assertEqual(list(iter_json_items(self.chunked(document, size))), items)
+                self.assertEqual(list(iter_json_items(self.chunked(json.dumps(items), size), key=None)), items)
+
+    def test_numbers_across_chunks(self):
+        self.assertEqual(list(iter_json_items([b"[1", b"2.", b"5e", b"1, 3", b"]"], key=None)), [125., 3])
+
+    def test_missing_data(self):
+        self.assertEqual(list(iter_json_items([b'{"msg": "not found"}'])), [])
+        self.assertEqual(list(iter_json_items([b'{"data": null}'])), [])
+        self.assertEqual(list(iter_json_items([b'{"data": []}'])), [])
+
+    def test_invalid(self):
+        for document in (b'{"data": [1, 2', b'{"data": {}}', b'{"data": [1 2]}', b"[1]"):
+            with self.subTest(document=document), self.assertRaises(ValueError):
+                list(iter_json_items([document]))
+
+
+if __name__ == '__main__':
+    unittest.main()
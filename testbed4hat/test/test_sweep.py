@@ -0,0 +1,77 @@
+# Copyright 2024 The Johns Hopkins University Applied Physics Laboratory LLC
+# All rights reserved.
+#
+# Licensed under the 3-Clause BSD License (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://opensource.org/licenses/BSD-3-Clause
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import tempfile
+import unittest
+
+from testbed4hat.sweep import ParameterSweep, ResultsTable, grid_design, random_design
+
+
+class TestParameterSweep(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.results_path = os.path.join(self.temp_dir.name, "results.jsonl")
+        self.base_config = {"max_episode_time_in_seconds": 300}
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_grid_design(self):
+        cells = grid_design(self.base_config, {"weapon_0_reload_time": [5, 15]}, seeds=[0, 1],
+                            agent_grid={"threshold": [0.35, 0.5]})
+        self.assertEqual(len(cells), 8)
+        self.assertEqual(len({cell.key for cell in cells}), 8)
+        self.assertEqual(len({cell.config.config_hash for cell in cells}), 2)
+
+    def test_random_design(self):
+        cells = random_design(self.base_config, {"num_ship_0_weapon_0": (5, 15), "threat_0_speed": (100, 200)},
+                              num_points=3, seeds=[0], agent_space={"threshold": [0.3, 0.4]})
+        self.assertEqual(len(cells), 3)
+        for cell in cells:
+            self.assertIsInstance(cell.config.num_ship_0_weapon_0, int)
+            self.assertTrue(100 <= cell.config.threat_0_speed <= 200)
+            self.assertIn(cell.agent_params["threshold"], [0.3, 0.4])
+
+    def test_random_design_int_agent_params(self):
+        cells = random_design(self.base_config, {}, num_points=5, seeds=[0],
+                              agent_space={"max_actions": (2, 10), "threshold": (0., 1.)})
+        for cell in cells:
+            self.assertIsInstance(cell.agent_params["max_actions"], int)
+            self.assertTrue(2 <= cell.agent_params["max_actions"] <= 10)
+            self.assertIsInstance(cell.agent_params["threshold"], float)
+        # the sampled params are accepted by the agent
+        ParameterSweep(self.results_path, max_workers=0).run(cells[:1])
+        self.assertEqual(len(ResultsTable(self.results_path)), 1)
+
+    def test_skip_computed_cells(self):
+        cells = grid_design(self.base_config, {"weapon_1_reload_time": [10]}, seeds=[0, 1])
+        ParameterSweep(self.results_path, max_workers=0).run(cells[:1])
+        sweep = ParameterSweep(self.results_path, max_workers=0)
+        self.assertEqual(len(sweep.pending(cells)), 1)
+        sweep.run(cells)
+        self.assertEqual(len(ResultsTable(self.results_path)), 2)
+
+    def test_episodes_are_reproducible(self):
+        cells = grid_design(self.base_config, {"weapon_1_reload_time": [10]}, seeds=[3])
+        first = ParameterSweep(self.results_path, max_workers=0).run(cells)
+        second = ParameterSweep(os.path.join(self.temp_dir.name, "other.jsonl"), max_workers=0).run(cells)
+        row_1, row_2 = first.rows[cells[0].key], second.rows[cells[0].key]
+        self.assertEqual(row_1["total_reward"], row_2["total_reward"])
+        self.assertEqual(row_1["launches"], row_2["launches"])
+
+
+if __name__ == '__main__':
+    unittest.main()
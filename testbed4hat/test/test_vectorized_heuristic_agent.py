@@ -0,0 +1,70 @@
+# Copyright 2024 The Johns Hopkins University Applied Physics Laboratory LLC
+# All rights reserved.
+#
+# Licensed under the 3-Clause BSD License (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://opensource.org/licenses/BSD-3-Clause
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+import numpy as np
+
+from testbed4hat.hat_env import HatEnv
+from testbed4hat.hat_env_config import HatEnvConfig
+from testbed4hat.heuristic_agent import HeuristicAgent
+from testbed4hat.pk_table import get_pk, get_pk_array
+from testbed4hat.vectorized_heuristic_agent import ArrayObservation, VectorizedHeuristicAgent
+
+
+class TestVectorizedHeuristicAgent(unittest.TestCase):
+    def _check_episode(self, seed: int, max_actions: int):
+        np.random.seed(seed)
+        config = HatEnvConfig({"render_env": False, "verbose": False, "seed": seed,
+                               "max_episode_time_in_seconds": 600})
+        env = HatEnv(config)
+        agent = HeuristicAgent(config.weapon_0_speed, config.weapon_1_speed, max_actions=max_actions)
+        vectorized_agent = VectorizedHeuristicAgent(config.weapon_0_speed, config.weapon_1_speed,
+                                                    max_actions=max_actions)
+
+        obs, info = env.reset()
+        num_actions = 0
+        terminated = truncated = False
+        while not (terminated or truncated):
+            actions = agent.heuristic_action(obs)
+            self.assertEqual(vectorized_agent.heuristic_action(obs), actions)
+            self.assertEqual(vectorized_agent.heuristic_action(ArrayObservation.from_observation(obs)), actions)
+            num_actions += len(actions)
+            obs, reward, terminated, truncated, info = env.step(actions)
+        self.assertGreater(num_actions, 0)
+
+    def test_same_actions_as_heuristic_agent(self):
+        for seed in range(3):
+            self._check_episode(seed, max_actions=10)
+
+    def test_same_actions_with_few_max_actions(self):
+        self._check_episode(11, max_actions=2)
+
+    def test_pk_array_matches_pk(self):
+        distances = np.concatenate([np.arange(0, 40000, 250.), [999.9, 1000., 2000., 8000., 17500., 32500., 35000.]])
+        for weapon_ind in (0, 1):
+            for threat_ind in (0, 1):
+                expected = [get_pk(distance, weapon_ind, threat_ind) for distance in distances]
+                self.assertEqual(get_pk_array(distances, weapon_ind, threat_ind).tolist(), expected)
+
+    def test_top_actions_keeps_tie_order(self):
+        agent = VectorizedHeuristicAgent(1000, 1500, max_actions=3)
+        weights = np.array([0.5, 0.9, 0.5, 0.7, 0.5, 0.1])
+        self.assertEqual(agent._top_actions(weights).tolist(), [1, 3, 0])
+        self.assertEqual(agent._top_actions(np.zeros(0)).tolist(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+# Copyright 2024 The Johns Hopkins University Applied Physics Laboratory LLC
+# All rights reserved.
+#
+# Licensed under the 3-Clause BSD License (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://opensource.org/licenses/BSD-3-Clause
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+import numpy as np
+
+from testbed4hat.wait_strategies import AdaptivePolling, ChangeFeed, FixedPolling
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.now += seconds
+
+
+def info_message(phase: str) -> dict:
+    return {"messageType": "InfoMessage", "phase": phase, "gameTurn": 1}
+
+
+class Game:
+    """Game whose phases change at scheduled times, polled with get_new_messages."""
+    def __init__(self, clock: Clock, phase_changes: list[tuple[float, str]], changes_supported: bool = False):
+        self.clock = clock
+        self.phase_changes = list(phase_changes)
+        self.changes_supported = changes_supported
+        self.polls = 0
+
+    def get_new_messages(self) -> list[dict]:
+        self.polls += 1
+        messages = []
+        while self.phase_changes and self.phase_changes[0][0] <= self.clock.now:
+            messages.append(info_message(self.phase_changes.pop(0)[1]))
+        return messages
+
+    def wait_for_messages(self, timeout: float):
+        if not self.changes_supported:
+            return None
+        # the server responds at the next phase change
+        self.clock.now = max(self.clock.now, self.phase_changes[0][0])
+        return self.get_new_messages()
+
+
+class TestWaitStrategies(unittest.TestCase):
+    def test_fixed_polling(self):
+        clock = Clock()
+        strategy = FixedPolling(3., sleep=clock.sleep)
+        self.assertEqual([strategy.delay() for _ in range(3)], [0., 3., 3.])
+
+    def test_adaptive_polling(self):
+        clock = Clock()
+        strategy = AdaptivePolling(min_interval=0.5, max_interval=10., clock=clock, sleep=clock.sleep)
+
+        # unknown phase: back off from the min interval
+        self.assertEqual([strategy.delay() for _ in range(3)], [0.5, 0.75, 1.125])
+
+        # 60-second planning phases, each followed by an (instantaneous) adjudication
+        turns = 6
+        phase_changes = [(0., "planning")]
+        for turn in range(1, turns + 1):
+            phase_changes += [(60. * turn, "adjudication"), (60. * turn, "planning")]
+        game = Game(clock, phase_changes)
+        latencies = []
+        while game.phase_changes:
+            change_time = game.phase_changes[0][0]
+            while not any(m["phase"] == "adjudication" for m in strategy.next_messages(game)):
+                pass
+            latencies.append(clock.now - change_time)
+        self.assertAlmostEqual(strategy.phase_durations["planning"], 60., delta=1.)
+
+        # once the phase duration is known, the phase end is detected within about the min interval, with few polls
+        self.assertLessEqual(max(latencies[2:]), 1.)
+        self.assertLess(game.polls, turns * 60 / 3)  # less than polling every 3 seconds
+
+    def test_adaptive_polling_latency(self):
+        # time to notice the end of a phase, ended at any time by an umpire, whatever the expected phase duration
+        def latencies(make_strategy) -> list[float]:
+            result = []
+            for end in np.arange(0.1, 400., 0.1):
+                clock = Clock()
+                strategy = make_strategy(clock)
+                game = Game(clock, [(0., "planning"), (end, "adjudication")])
+                while not any(m["phase"] == "adjudication" for m in strategy.next_messages(game)):
+                    pass
+                result.append(clock.now - end)
+            return result
+
+        fixed = latencies(lambda clock: FixedPolling(sleep=clock.sleep))
+        for expected_duration in (60., 120.):
+            adaptive = latencies(lambda clock: AdaptivePolling(default_phase_duration=expected_duration, clock=clock,
+                                                               sleep=clock.sleep))
+            self.assertLessEqual(max(adaptive), FixedPolling().interval)  # the worst case of fixed polling
+            self.assertLessEqual(sum(adaptive), sum(fixed))
+
+    def test_change_feed_fallback(self):
+        clock = Clock()
+        phase_changes = [(10., "adjudication"), (20., "adjudication")]
+
+        game = Game(clock, phase_changes, changes_supported=True)
+        strategy = ChangeFeed(fallback=AdaptivePolling(clock=clock, sleep=clock.sleep))
+        self.assertEqual(strategy.next_messages(game), [info_message("adjudication")])
+        self.assertEqual(clock.now, 10.)  # the response is immediate
+        self.assertEqual(strategy.fallback.phase, "adjudication")
+
+        game = Game(clock, phase_changes[1:], changes_supported=False)
+        messages = []
+        while not messages:
+            messages = strategy.next_messages(game)
+        self.assertGreater(game.polls, 0)  # polled instead
+        self.assertEqual(messages, [info_message("adjudication")])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+# Copyright 2024 The Johns Hopkins University Applied Physics Laboratory LLC
+# All rights reserved.
+#
+# Licensed under the 3-Clause BSD License (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://opensource.org/licenses/BSD-3-Clause
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+from collections import Counter
+
+import numpy as np
+
+from testbed4hat.agents import make_agent
+from testbed4hat.hat_env import HatEnv
+from testbed4hat.hat_env_config import HatEnvConfig
+
+
+class TestWTAAgent(unittest.TestCase):
+    def setUp(self):
+        np.random.seed(0)
+        self.config = HatEnvConfig({"render_env": False, "verbose": False, "seed": 0,
+                                    "schedule": {0: (1, 1), 5: (1, 1), 10: (1, 1), 20: (1, 1)}})
+        self.env = HatEnv(self.config)
+
+    def _first_step_with_launches(self, agent):
+        # threats spawn out of range, so wait for them to come closer
+        obs, info = self.env.reset()
+        while len(agent.solve(obs).actions) == 0:
+            obs, reward, terminated, truncated, info = self.env.step([])
+        return obs
+
+    def test_respects_launch_constraints(self):
+        for objective in ("kills", "survival"):
+            agent = make_agent("wta", self.config, objective=objective, threshold=0.0)
+            solution = agent.solve(self._first_step_with_launches(agent))
+            self.assertLessEqual(solution.value, solution.upper_bound + 1e-9)
+
+            launches_per_weapon = Counter((ship, weapon) for ship, weapon, _ in solution.actions)
+            for (ship, weapon), count in launches_per_weapon.items():
+                self.assertLessEqual(count, self.env.max_weapons_per_turn[f"weapon_{weapon}"])
+            for ship in (0, 1):
+                seconds = [s for s, a in zip(solution.launch_seconds, solution.actions) if a[0] == ship]
+                self.assertEqual(len(seconds), len(set(seconds)))  # one launch per second per ship
+                self.assertTrue(all(s < self.config.seconds_per_timestep for s in seconds))
+
+    def test_predicted_launches_match_env(self):
+        agent = make_agent("wta", self.config)
+        obs = self._first_step_with_launches(agent)
+        solution = agent.solve(obs)
+        obs, reward, terminated, truncated, info = self.env.step(solution.actions)
+
+        expected = sorted((a[0], a[1], a[2], round(p, 9)) for a, p in zip(solution.actions, solution.p_kills))
+        launched = sorted((l["ship_id"], l["weapon_type"], l["threat_id"], round(l["p_k"], 9))
+                          for l in obs["launched"])
+        self.assertEqual(launched, expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
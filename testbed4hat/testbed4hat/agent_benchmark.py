@@ -0,0 +1,171 @@
+# Copyright 2024 The Johns Hopkins University Applied Physics Laboratory LLC
+# All rights reserved.
+#
+# Licensed under the 3-Clause BSD License (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://opensource.org/licenses/BSD-3-Clause
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import platform
+import time
+import tracemalloc
+from typing import Iterable
+
+import numpy as np
+
+from .agents import AGENT_REGISTRY, make_agent
+from .hat_env import HatEnv
+from .hat_env_config import HatEnvConfig
+from .vectorized_heuristic_agent import ArrayObservation, VectorizedHeuristicAgent
+from .weapon import Weapon
+from .wta_agent import WTAAgent
+
+DEFAULT_RAID_SIZES = (10, 100, 1000)
+
+# agents whose heuristic_action also takes an ArrayObservation
+ARRAY_AGENT_TYPES = (VectorizedHeuristicAgent, WTAAgent)
+
+
+def benchmark_config(seed: int = 0) -> HatEnvConfig:
+    """Config of the benchmark environments: threats spawn anywhere from the PK rings to the edge of the map."""
+    return HatEnvConfig({"render_env": False, "verbose": False, "seed": seed, "min_threat_distance": 2_000,
+                         "max_threat_distance": 40_000})
+
+
+def synthetic_observation(config: HatEnvConfig, num_threats: int, targeted_fraction: float = 0.1,
+                          seed: int = 0) -> dict:
+    """
+    Build an observation with <num_threats> threats, as emitted by HatEnv. The threats are created by the env threat
+    generator (alternating threat types), and a fraction of them already have a weapon in flight against them.
+    :param config: (HatEnvConfig) The environment config.
+    :param num_threats: (int) Number of threats.
+    :param targeted_fraction: (float) Fraction of the threats with a weapon in flight.
+    :param seed: (int) Seed of the ship placement and of the threats.
+    :return: (dict) The observation.
+    """
+    np.random.seed(seed)
+    env = HatEnv(config)
+    env.reset(seed=seed)
+    for i in range(num_threats):
+        threat = env.generator._create_threat(i % 2)
+        env.threats[threat.threat_id] = threat
+
+    speeds = (config.weapon_0_speed, config.weapon_1_speed)
+    for i, threat in enumerate(list(env.threats.values())[:int(num_threats * targeted_fraction)]):
+        ship = env._get_ship(i % 2)
+        weapon_type = (i // 2) % 2
+        env.weapons.append(Weapon(ship.ship_id, ship.location, ship.orientation, speeds[weapon_type], threat,
+                                  weapon_type, f"W{i + 1:02d}", env.rng))
+    return env._make_observation([], {})
+
+
+def _time_calls(decide, observation, repeats: int, max_time: float) -> list[float]:
+    times = []
+    deadline = time.perf_counter() + max_time
+    while len(times) < repeats and (len(times) == 0 or time.perf_counter() < deadline):
+        start = time.perf_counter()
+        decide(observation)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def _peak_allocation(decide, observation) -> tuple[int, int]:
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        decide(observation)
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak - before, current - before
+
+
+def benchmark_agent(name: str, config: HatEnvConfig, observation: dict, array_format: bool = False,
+                    repeats: int = 30, max_time: float = 5.0, **params) -> dict:
+    """
+    Time the decisions of a registered agent on an observation.
+    :param name: (str) The agent name.
+    :param config: (HatEnvConfig) The environment config.
+    :param observation: (dict) The observation.
+    :param array_format: (bool) Give the agent the observation as an ArrayObservation (built outside the timing).
+    :param repeats: (int) Number of timed decisions.
+    :param max_time: (float) Stop repeating after this many seconds (at least one decision is timed).
+    :param params: The agent parameters.
+    :return: (dict) Latency (first decision, p50, p99, mean, in milliseconds), decisions per second, and memory
+        allocated during a decision (peak and retained, in bytes).
+    """
+    agent = make_agent(name, config, **params)
+    if array_format:
+        observation = ArrayObservation.from_observation(observation)
+
+    # agents may cache between decisions, so the first one is reported separately
+    start = time.perf_counter()
+    num_actions = len(agent.heuristic_action(observation))
+    first_call = time.perf_counter() - start
+
+    times = np.array(_time_calls(agent.heuristic_action, observation, repeats, max_time)) * 1000
+    peak_bytes, retained_bytes = _peak_allocation(agent.heuristic_action, observation)
+    return {
+        "agent": name,
+        "params": params,
+        "format": "array" if array_format else "dict",
+        "num_actions": num_actions,
+        "repeats": len(times),
+        "first_ms": round(first_call * 1000, 4),
+        "p50_ms": round(float(np.percentile(times, 50)), 4),
+        "p99_ms": round(float(np.percentile(times, 99)), 4),
+        "mean_ms": round(float(np.mean(times)), 4),
+        "decisions_per_s": round(float(1000 / np.mean(times)), 2),
+        "peak_alloc_bytes": int(peak_bytes),
+        "retained_alloc_bytes": int(retained_bytes),
+    }
+
+
+def run_benchmark(agents: Iterable[str] = None, raid_sizes: Iterable[int] = DEFAULT_RAID_SIZES, repeats: int = 30,
+                  max_time: float = 5.0, seed: int = 0, progress: bool = False) -> dict:
+    """
+    Benchmark agents against raids of several sizes, on the dict observations and, for the agents supporting it, on
+    array observations.
+    :param agents: (Iterable[str]) Names of registered agents (default: all of them).
+    :param raid_sizes: (Iterable[int]) Numbers of threats of the observations.
+    :param repeats: (int) Number of timed decisions per agent and raid size.
+    :param max_time: (float) Max timing duration per agent and raid size, in seconds.
+    :param seed: (int) Seed of the synthetic observations.
+    :param progress: (bool) Print each result.
+    :return: (dict) The benchmark results, to be saved as JSON.
+    """
+    agents = sorted(AGENT_REGISTRY) if agents is None else list(agents)
+    config = benchmark_config(seed)
+    results = []
+    for num_threats in raid_sizes:
+        observation = synthetic_observation(config, num_threats, seed=seed)
+        for name in agents:
+            formats = [False]
+            if isinstance(make_agent(name, config), ARRAY_AGENT_TYPES):
+                formats.append(True)
+            for array_format in formats:
+                result = {"num_threats": num_threats,
+                          **benchmark_agent(name, config, observation, array_format, repeats, max_time)}
+                results.append(result)
+                if progress:
+                    print(f"{name} [{result['format']}] {num_threats} threats: p50={result['p50_ms']:.3f} ms, "
+                          f"p99={result['p99_ms']:.3f} ms, {result['decisions_per_s']:.1f} decisions/s")
+    return {
+        "environment": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "processor": platform.processor(),
+        },
+        "repeats": repeats,
+        "seed": seed,
+        "results": results,
+    }
@@ -0,0 +1,74 @@
+# Copyright 2024 The Johns Hopkins University Applied Physics Laboratory LLC
+# All rights reserved.
+#
+# Licensed under the 3-Clause BSD License (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://opensource.org/licenses/BSD-3-Clause
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from typing import Any, Callable
+
+from .hat_env_config import HatEnvConfig
+from .heuristic_agent import HeuristicAgent
+from .vectorized_heuristic_agent import VectorizedHeuristicAgent
+from .wta_agent import WTAAgent
+
+
+def _make_heuristic_agent(config: HatEnvConfig, **params) -> HeuristicAgent:
+    return HeuristicAgent(config.weapon_0_speed, config.weapon_1_speed, **params)
+
+
+def _make_vectorized_heuristic_agent(config: HatEnvConfig, **params) -> VectorizedHeuristicAgent:
+    return VectorizedHeuristicAgent(config.weapon_0_speed, config.weapon_1_speed, **params)
+
+
+def _make_wta_agent(config: HatEnvConfig, **params) -> WTAAgent:
+    return WTAAgent(config.weapon_0_speed, config.weapon_1_speed, config.weapon_0_reload_time,
+                    config.weapon_1_reload_time, config.seconds_per_timestep,
+                    threat_kill_probs=(config.threat_0_kill_prob, config.threat_1_kill_prob), **params)
+
+
+# Agent name -> factory building the agent from the env config and the agent parameters
+AGENT_REGISTRY: dict[str, Callable[..., Any]] = {
+    "heuristic": _make_heuristic_agent,
+    "vectorized_heuristic": _make_vectorized_heuristic_agent,
+    "wta": _make_wta_agent,
+}
+
+
+def register_agent(name: str, factory: Callable[..., Any]) -> None:
+    """
+    Register an agent so that it can be used by name in sweeps and benchmarks.
+    :param name: (str) The agent name.
+    :param factory: (Callable) Function taking the env config and the agent parameters as keyword arguments, and
+        returning the agent.
+    """
+    if name in AGENT_REGISTRY:
+        raise ValueError(f"Agent {name} is already registered")
+    AGENT_REGISTRY[name] = factory
+
+
+def make_agent(name: str, config: HatEnvConfig, **params) -> Any:
+    """
+    Build a registered agent.
+    :param name: (str) The agent name.
+    :param config: (HatEnvConfig) The config of the environment the agent will act in.
+    :param params: Agent parameters, e.g. threshold=0.5 for the heuristic agent.
+    :return: The agent.
+    """
+    if name not in AGENT_REGISTRY:
+        raise ValueError(f"Unknown agent {name}, must be one of {sorted(AGENT_REGISTRY)}")
+    return AGENT_REGISTRY[name](config, **params)
+
+
+def policy_id(name: str, params: dict = None) -> str:
+    """Get a stable string ID for an agent with the given parameters, e.g. 'heuristic(max_actions=4,threshold=0.5)'"""
+    params = params or {}
+    return f"{name}(" + ",".join(f"{k}={params[k]!r}" for k in sorted(params)) + ")"
@@ -0,0 +1,171 @@
+# Copyright 2024 The Johns Hopkins University Applied Physics Laboratory LLC
+# All rights reserved.
+#
+# Licensed under the 3-Clause BSD License (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://opensource.org/licenses/BSD-3-Clause
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import time
+from typing import Any, Callable, Iterator, Union
+from warnings import warn
+
+from .hat_env import HatEnv
+from .rollout_planner import RolloutPlanner
+
+# function taking an observation, and yielding (actions, fraction of the search completed) as the search improves
+Refinement = Callable[[dict], Iterator[tuple[list, float]]]
+
+
+class Decision:
+    def __init__(self, actions: list, completed: float, elapsed_time: float):
+        """
+        Best-known actions of an anytime agent.
+        :param actions: (list) The actions.
+        :param completed: (float) Fraction of the agent's search completed when the actions were found, in [0, 1].
+        :param elapsed_time: (float) Time from the start of the decision until the actions were found, in seconds.
+        """
+        self.actions = actions
+        self.completed = completed
+        self.elapsed_time = elapsed_time
+
+    @property
+    def final(self) -> bool:
+        """Whether the search was completed, i.e. the actions will not be refined anymore."""
+        return self.completed >= 1
+
+
+class AnytimeAgent:
+    """
+    Run an agent's decision in a background thread, so that a decision is always available by a deadline: <act>
+    returns the best actions known at the deadline, and the search keeps refining them in the background (see
+    <latest>) until it is completed, a new decision is started, or <stop> is called.
+    """
+    def __init__(self, refine: Union[Refinement, None], fallback: Any = None):
+        """
+        :param refine: (Refinement) The agent search, yielding improving (actions, fraction completed). None for the
+            actions of the fallback to be final (no search).
+        :param fallback: Agent with a (fast) heuristic_action method, whose actions are used when the search yields
+            nothing by the deadline. No actions are suggested in that case if None.
+        """
+        self.refine = refine
+        self.fallback = fallback
+        self._lock = threading.Lock()
+        self._latest: Union[Decision, None] = None
+        self._thread: Union[threading.Thread, None] = None
+        self._stop_event = threading.Event()
+        self._done_event = threading.Event()
+
+    @classmethod
+    def from_agent(cls, agent, fallback: Any = None) -> "AnytimeAgent":
+        """
+        Anytime version of an agent with a heuristic_action method (a single step search, which can't be interrupted:
+        the deadline is only met with a fallback).
+        :param agent: The agent.
+        :param fallback: Agent used when <agent> has not returned by the deadline. If it is <agent> itself (a fast
+            agent), its actions are computed at once and final, without a background search.
+        """
+        if fallback is agent:
+            return cls(None, fallback=agent)
+
+        def refine(observation: dict) -> Iterator[tuple[list, float]]:
+            yield agent.heuristic_action(observation), 1.
+
+        return cls(refine, fallback=fallback)
+
+    @classmethod
+    def from_planner(cls, planner: RolloutPlanner, env: HatEnv, fallback: Any = None,
+                     max_refine_time: float = None) -> "AnytimeAgent":
+        """
+        Anytime version of a rollout planner. Its base policy actions are available as soon as the candidates are
+        computed, and are refined as rollouts complete.
+        :param planner: (RolloutPlanner) The planner.
+        :param env: (HatEnv) The environment the observations come from (in the state they were observed in).
+        :param fallback: Agent used when the planner yields nothing by the deadline.
+        :param max_refine_time: (float) Stop starting rollouts this many seconds after the start of a decision (None to
+            run all of them).
+        """
+        def refine(observation: dict) -> Iterator[tuple[list, float]]:
+            deadline = None if max_refine_time is None else time.perf_counter() + max_refine_time
+            for result in planner.iter_plan(env, observation, deadline):
+                yield result.actions, result.completed
+
+        return cls(refine, fallback=fallback)
+
+    def act(self, observation: dict, deadline_s: float) -> Decision:
+        """
+        Start a decision, and return the best actions known after at most <deadline_s> seconds (sooner if the search
+        completes). Any decision still being refined is stopped first.
+        :param observation: (dict) The observation from the HAT environment.
+        :param deadline_s: (float) Time budget in seconds.
+        :return: (Decision) The best-known actions, with the fraction of the search completed.
+        """
+        start = time.perf_counter()
+        self.stop()
+        initial_actions = [] if self.fallback is None else self.fallback.heuristic_action(observation)
+        completed = 1. if self.refine is None else 0.
+        with self._lock:
+            self._latest = Decision(initial_actions, completed, time.perf_counter() - start)
+
+        self._stop_event = threading.Event()
+        self._done_event = threading.Event()
+        if self.refine is None:
+            self._done_event.set()
+            return self.latest()
+
+        self._thread = threading.Thread(target=self._run, args=(observation, start, self._stop_event,
+                                                                self._done_event), daemon=True)
+        self._thread.start()
+        self._done_event.wait(timeout=max(0., deadline_s - (time.perf_counter() - start)))
+        return self.latest()
+
+    def _run(self, observation: dict, start: float, stop_event: threading.Event,
+             done_event: threading.Event) -> None:
+        refinements = self.refine(observation)
+        try:
+            for actions, completed in refinements:
+                if stop_event.is_set():
+                    break
+                with self._lock:
+                    self._latest = Decision(actions, completed, time.perf_counter() - start)
+                if completed >= 1:
+                    break
+        except Exception as e:
+            # the best-known actions are kept, a failing search must not stall the game
+            warn(f"Anytime agent search failed: {e!r}")
+        finally:
+            refinements.close()
+            done_event.set()
+
+    def latest(self) -> Union[Decision, None]:
+        """Get the best-known actions of the current (or last) decision."""
+        with self._lock:
+            return self._latest
+
+    @property
+    def refining(self) -> bool:
+        """Whether the current decision is still being refined in the background."""
+        return self._thread is not None and not self._done_event.is_set()
+
+    def wait(self, timeout: float = None) -> Union[Decision, None]:
+        """Wait (at most <timeout> seconds) for the search of the current decision to complete, and get its result."""
+        self._done_event.wait(timeout)
+        return self.latest()
+
+    def stop(self, timeout: float = None) -> None:
+        """
+        Stop refining the current decision, and wait for the search to return (at most <timeout> seconds).
+        Observations share arrays with the environment, so stop the search before stepping the environment.
+        """
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
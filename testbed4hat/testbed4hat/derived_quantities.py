@@ -0,0 +1,97 @@
+# Copyright 2024 The Johns Hopkins University Applied Physics Laboratory LLC
+# All rights reserved.
+#
+# Licensed under the 3-Clause BSD License (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://opensource.org/licenses/BSD-3-Clause
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+from typing import Any, Callable, Hashable
+
+from .utils import compute_pk_ring_radii
+
+
+class DerivedQuantities:
+    """
+    Quantities derived from a HatEnvConfig that are expensive or repetitive to recompute for every consumer (HatEnv,
+    SergeEnvRunner, agents). Instances are shared between everyone using configs with the same content hash, so
+    consumers must not modify any of the attributes.
+    """
+    def __init__(self, config):
+        """
+        Compute the derived quantities of a config.
+        :param config: (HatEnvConfig) A validated config.
+        """
+        self.config_hash: str = config.config_hash
+
+        # The max number of each kind of weapon that can be launched per ship per turn
+        self.max_weapons_per_turn = {
+            "weapon_0": config.seconds_per_timestep // config.weapon_0_reload_time,
+            "weapon_1": config.seconds_per_timestep // config.weapon_1_reload_time,
+        }
+        # The max number of weapons that can be launched per turn for both boats
+        self.max_actions_step = self.max_weapons_per_turn["weapon_0"] * 2 + self.max_weapons_per_turn["weapon_1"] * 2
+
+        # amount to "shrink" plotting coordinates so that everything fits on the screen: max threat distance plus 5km
+        #   buffer, multiplied by 2 because this is a radius, divided by the smallest the screen can be
+        outside_of_screen = (config.max_threat_distance + 5000) * 2
+        self.coordinate_size_reduction = (outside_of_screen / min(config.screen_height, config.screen_width)
+                                          / config.zoom)
+
+        self.low_pk_ring_radius, self.short_pk_ring_radius, self.long_pk_ring_radius = compute_pk_ring_radii()
+
+        self._memo: dict[Hashable, Any] = dict()
+        self._memo_lock = threading.Lock()
+
+    def memoize(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """
+        Get a consumer-specific derived quantity (e.g. the geodesic range polygons of the Serge map), computing it with
+        <compute> the first time it is requested for this config.
+        :param key: (Hashable) Key identifying the quantity, including any extra inputs it depends on.
+        :param compute: (Callable) Zero-argument function computing the quantity.
+        :return: The (shared) quantity.
+        """
+        try:
+            return self._memo[key]
+        except KeyError:
+            pass
+        with self._memo_lock:
+            if key not in self._memo:
+                self._memo[key] = compute()
+            return self._memo[key]
+
+
+_DERIVED_CACHE: dict[str, DerivedQuantities] = dict()
+_DERIVED_CACHE_LOCK = threading.Lock()
+
+
+def get_derived_quantities(config) -> DerivedQuantities:
+    """
+    Get the derived quantities of a config, computing them only the first time a config with this content hash is
+    seen in the process.
+    :param config: (HatEnvConfig) The config.
+    :return: (DerivedQuantities) The shared derived quantities.
+    """
+    key = config.config_hash
+    derived = _DERIVED_CACHE.get(key)
+    if derived is None:
+        with _DERIVED_CACHE_LOCK:
+            derived = _DERIVED_CACHE.get(key)
+            if derived is None:
+                derived = DerivedQuantities(config)
+                _DERIVED_CACHE[key] = derived
+    return derived
+
+
+def clear_derived_cache() -> None:
+    """Drop all cached derived quantities."""
+    with _DERIVED_CACHE_LOCK:
+        _DERIVED_CACHE.clear()
@@ -0,0 +1,212 @@
+# Copyright 2024 The Johns Hopkins University Applied Physics Laboratory LLC
+# All rights reserved.
+#
+# Licensed under the 3-Clause BSD License (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://opensource.org/licenses/BSD-3-Clause
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import json
+import os
+import time
+import traceback
+from warnings import warn
+
+import click
+import numpy as np
+
+from serge import SergeTransport
+from serge_env_runner import SergeEnvRunner
+from testbed4hat.testbed4hat.map_projection import MapProjection
+from testbed4hat.testbed4hat.message_journal import MessageJournal
+from testbed4hat.testbed4hat.wait_strategies import WAIT_STRATEGIES
+
+DEFAULT_POOL_SIZE = 100  # kept-alive connections to the Serge server, shared by the games
+
+
+class HostedGame:
+    def __init__(self, runner: SergeEnvRunner):
+        """
+        A game of a GameHost: its runner, and how it is going.
+        :param runner: (SergeEnvRunner) The runner of the game.
+        """
+        self.runner = runner
+        self.task: asyncio.Task | None = None
+        self.started: float | None = None  # time.perf_counter() values
+        self.ended: float | None = None
+        self.error: BaseException | None = None
+
+    @property
+    def status(self) -> str:
+        if self.task is None:
+            return "pending"
+        if self.ended is None:
+            return "running"
+        return "failed" if self.error is not None else "finished"
+
+    def report(self) -> dict:
+        """The status of the game, its turns processed, and its lag (see SergeEnvRunner.adjudication_lags)."""
+        lags = self.runner.adjudication_lags
+        report = {
+            "status": self.status,
+            "turn": self.runner.turn,
+            "turns_processed": len(self.runner.turn_processing_times),
+            "lag_s": {
+                "last": round(lags[-1], 3),
+                "p50": round(float(np.percentile(lags, 50)), 3),
+                "max": round(max(lags), 3),
+            } if lags else {},
+        }
+        if self.started is not None:
+            report["duration_s"] = round((self.ended or time.perf_counter()) - self.started, 3)
+        if self.error is not None:
+            report["error"] = repr(self.error)
+        return report
+
+
+class GameHost:
+    """
+    Host of many Serge games in one process: a SergeEnvRunner per game, all run on one asyncio event loop (see
+    SergeEnvRunner.run_async), instead of a mostly idle process per game.
+    The games share the pool of kept-alive connections to the server, the projection of the map coordinates, and
+    (as their configs are the same) the derived quantities of the environment, e.g. the PK rings and range polygons.
+    The adjudication phases are computed in worker threads, so that the event loop goes on polling the other games
+    meanwhile. The GIL still runs one of them at a time: rather than run them in parallel, the adjudication slots
+    order the games, at most <max_adjudications> processing an adjudication phase at once and the others waiting for
+    a slot in the order they reached theirs, so that a burst of adjudications delays each game by a fair share. A
+    game failing is reported (see <report>) without stopping the others.
+    Usage:
+        host = GameHost("https://serge.example.org")
+        for game_id in game_ids:
+            host.add_game(game_id)
+        reports = asyncio.run(host.run())
+    """
+    def __init__(self, server_url: str, max_adjudications: int = 1, max_in_flight: int = 4,
+                 pool_size: int = DEFAULT_POOL_SIZE):
+        """
+        :param server_url: (str) The Serge server URL.
+        :param max_adjudications: (int) Max number of games processing an adjudication phase at once (the adjudications
+            are CPU-bound and share the GIL, so more only interleaves them).
+        :param max_in_flight: (int) Max number of concurrent requests of each game.
+        :param pool_size: (int) Max number of kept-alive connections to the server, shared by the games.
+        """
+        self.server_url = server_url
+        self.max_adjudications = max_adjudications
+        self.max_in_flight = max_in_flight
+        self.transport = SergeTransport(pool_size=pool_size)
+        self.projection = MapProjection()
+        self.games: dict[str, HostedGame] = {}
+        self._adjudication_slots: asyncio.Semaphore | None = None  # (created on the event loop)
+
+    def add_game(self, game_id: str, **params) -> SergeEnvRunner:
+        """
+        Add a game to the host. Games added while the host runs are started at once.
+        :param game_id: (str) The game id.
+        :param params: Parameters of its SergeEnvRunner (e.g. max_game_minutes, wait_strategy, journal).
+        :return: (SergeEnvRunner) The runner of the game.
+        """
+        if game_id in self.games:
+            raise ValueError(f"Game {game_id} already hosted")
+        runner = SergeEnvRunner(game_id, server_url=self.server_url, transport=self.transport,
+                                projection=self.projection, **params)
+        game = self.games[game_id] = HostedGame(runner)
+        if self._adjudication_slots is not None:
+            self._start(game)
+        return runner
+
+    def _start(self, game: HostedGame) -> None:
+        game.runner.adjudication_slots = self._adjudication_slots
+        game.task = asyncio.get_running_loop().create_task(self._play(game), name=game.runner.game_id)
+
+    async def _play(self, game: HostedGame) -> None:
+        game.started = time.perf_counter()
+        try:
+            await game.runner.run_async(self.max_in_flight)
+        except Exception as e:
+            # (the other games go on)
+            game.error = e
+            warn(f"Game {game.runner.game_id} failed: {''.join(traceback.format_exception(e))}")
+            # waiting for the requests being sent, without blocking the other games
+            await asyncio.to_thread(game.runner.serge_game.close)
+        finally:
+            game.ended = time.perf_counter()
+
+    async def _print_reports(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            print(json.dumps(self.report()), flush=True)
+
+    async def run(self, report_interval: float = None) -> dict[str, dict]:
+        """
+        Run all the games, until all of them ended (including the games added meanwhile).
+        :param report_interval: (float) Print the report of the games every this many seconds (None not to).
+        :return: (dict[str, dict]) The final report of each game (see <report>).
+        """
+        self._adjudication_slots = asyncio.Semaphore(self.max_adjudications)
+        reporter = None if report_interval is None else asyncio.create_task(self._print_reports(report_interval))
+        try:
+            while pending := [game for game in self.games.values() if game.ended is None]:
+                for game in pending:
+                    if game.task is None:
+                        self._start(game)
+                await asyncio.wait([game.task for game in pending])
+        finally:
+            if reporter is not None:
+                reporter.cancel()
+            self._adjudication_slots = None
+        return self.report()
+
+    def report(self) -> dict[str, dict]:
+        """The status, turns and lag of each game (see HostedGame.report)."""
+        return {game_id: game.report() for game_id, game in self.games.items()}
+
+    def close(self) -> None:
+        """Close the connections to the server."""
+        self.transport.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+@click.command()
+@click.argument("game_ids", nargs=-1, required=True)
+@click.option("-u", "--server-url", default="https://serge-inet.herokuapp.com", help="URL of the Serge server")
+@click.option("-m", "--max-game-minutes", default=20, type=int,
+              help="Truncating the games at the specified max game minutes")
+@click.option("-w", "--wait", default="adaptive", type=click.Choice(sorted(WAIT_STRATEGIES)),
+              help="How the games wait for new messages (see serge_env_runner.py)")
+@click.option("-a", "--max-adjudications", default=1, type=click.IntRange(min=1),
+              help="Max number of games processing an adjudication phase at once")
+@click.option("-j", "--journal", default=None, type=click.Path(dir_okay=False),
+              help="SQLite file journaling the messages of all the games, kept in memory if not set")
+@click.option("--report-interval", default=60., type=float, help="Print the report of the games every N seconds")
+@click.option("--metrics-dir", default=None, type=click.Path(file_okay=False),
+              help="Directory of the latency histograms of each game (<game id>.prom, in the Prometheus text format)")
+@click.option("-c", "--checkpoint-dir", default=None, type=click.Path(file_okay=False),
+              help="Directory of the checkpoints of the games (<game id>.ckpt), resumed after a restart")
+def main(game_ids: tuple[str], server_url: str, max_game_minutes: int, wait: str, max_adjudications: int,
+         journal: str, report_interval: float, metrics_dir: str, checkpoint_dir: str):
+    """Run the AI Assistant of many Serge games (GAME_IDS) in one process."""
+    journal = None if journal is None else MessageJournal(journal)
+    with GameHost(server_url, max_adjudications=max_adjudications) as host:
+        for game_id in game_ids:
+            metrics_file = None if metrics_dir is None else os.path.join(metrics_dir, f"{game_id}.prom")
+            checkpoint_file = None if checkpoint_dir is None else os.path.join(checkpoint_dir, f"{game_id}.ckpt")
+            host.add_game(game_id, max_game_minutes=max_game_minutes, wait_strategy=WAIT_STRATEGIES[wait](),
+                          journal=journal, metrics_file=metrics_file, checkpoint_file=checkpoint_file)
+        print(json.dumps(asyncio.run(host.run(report_interval)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
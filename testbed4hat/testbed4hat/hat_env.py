@@ -13,29 +13,38 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import copy
 import warnings
 from typing import Any, Union, Iterable, Tuple
 
 import gymnasium as gym
 import numpy as np
-import pygame
 from gymnasium.core import ObsType
 
 from .messages import WeaponLaunchInfo, WeaponEndMessage, ShipDestroyedMessage, ThreatMissMessage, WeaponMissMessage
 from .pk_table import get_pk
 from .ship import Ship
 from .threat import Threat
-from .utils import distance, compute_pk_ring_radii
+from .utils import distance
 from .wave_generator import WaveGenerator
 from .weapon import Weapon
 from .hat_env_config import HatEnvConfig
 
+pygame = None  # imported when rendering (see _import_pygame): it is slow to import, and most envs do not render
+
+
+def _import_pygame():
+    global pygame
+    import pygame
+
 
 class HatEnv(gym.Env):
     VALID_SHIP_IDS = {0, 1}
 
     def __init__(self, config: HatEnvConfig):
         self.config = config
+        # derived quantities are shared by all environments created from configs with the same content
+        derived = self.config.derived
 
         # set environment variables
         self.seed = self.config.seed
@@ -59,13 +68,10 @@ class HatEnv(gym.Env):
 
         # The max number of each kind of weapon that can be launched per ship per turn. Used to warn users they are
         #   asking for too many weapon launches per turn, and to quite processing actions early, if needed.
-        self.max_weapons_per_turn = {
-            "weapon_0": self.seconds_per_timestep // self.weapon_0_reload_time,
-            "weapon_1": self.seconds_per_timestep // self.weapon_1_reload_time,
-        }
+        self.max_weapons_per_turn = dict(derived.max_weapons_per_turn)
         # max actions per step are how many max weapons can be launched per turn for both boats. Used to warn users they
         #   are giving too many actions per turn, and to quite processing the actions list if it was too large
-        self.max_actions_step = self.max_weapons_per_turn["weapon_0"] * 2 + self.max_weapons_per_turn["weapon_1"] * 2
+        self.max_actions_step = derived.max_actions_step
 
         self.rng = np.random.RandomState(self.seed)
 
@@ -87,12 +93,7 @@ class HatEnv(gym.Env):
         self.screen_height = self.config.screen_height
 
         #   amount to "shrink" plotting coordinates so that everything fits on the screen
-        outside_of_screen = (self.max_threat_distance + 5000) * 2  # max threat distance plus 5km buffer, multiplied by
-        # 2 because this is a radius, and the screen needs to extend both directions
-        zoom_factor = self.config.zoom
-
-        #   divide by smallest screen can be
-        self.coordinate_size_reduction = outside_of_screen / min(self.screen_height, self.screen_width) / zoom_factor
+        self.coordinate_size_reduction = derived.coordinate_size_reduction
 
         self.screen_background_color = (255, 255, 255)  # White
         self.font_color = self.config.font_color
@@ -116,7 +117,9 @@ class HatEnv(gym.Env):
         self.ship_0_color = self.config.ship_0_color
         self.ship_1_color = self.config.ship_1_color
 
-        self.low_pk_ring_radius, self.short_pk_ring_radius, self.long_pk_ring_radius = compute_pk_ring_radii()
+        self.low_pk_ring_radius = derived.low_pk_ring_radius
+        self.short_pk_ring_radius = derived.short_pk_ring_radius
+        self.long_pk_ring_radius = derived.long_pk_ring_radius
         if self.verbose:
             print("Ring info:")
             print(f"\tLow PK Ring Radius: {self.low_pk_ring_radius} meters")
@@ -127,6 +130,7 @@ class HatEnv(gym.Env):
         self.long_pk_ring_color = self.weapon_0_color
 
         if self.render_env:
+            _import_pygame()
             pygame.init()
             self.screen = pygame.display.set_mode((self.screen_width, self.screen_height))
             if self.verbose:
@@ -464,6 +468,41 @@ class HatEnv(gym.Env):
 
         return self._make_observation([], {}), {}
 
+    # Attributes making up the simulation state, i.e. everything <step> reads or changes
+    STATE_ATTRIBUTES = ("seed", "rng", "generator", "ship_0", "ship_1", "threats", "weapons", "time_step",
+                        "time_seconds", "weapon_counter", "action_queue", "step_messages")
+
+    def get_state(self, include_global_rng: bool = True) -> dict:
+        """
+        Snapshot the simulation state, so that the environment can be rolled back to it with <set_state> (e.g. to roll
+        out several candidate actions from the same state). Ship placement and threat outcomes use the global numpy
+        random generator, so its state is part of the snapshot by default. The snapshot is independent of the
+        environment, and can be pickled to restore it in another environment built from the same config.
+        :param include_global_rng: (bool) Include the state of the global numpy random generator: leave it out when
+            other environments of the process draw from it (e.g. the games of a GameHost), as restoring it would replay
+            their draws.
+        :return: (dict) The state.
+        """
+        # deep copied together, so that the objects sharing the env random generator still share the copy
+        state = copy.deepcopy({name: getattr(self, name) for name in self.STATE_ATTRIBUTES})
+        if include_global_rng:
+            state["np_random_state"] = np.random.get_state()
+        return state
+
+    def set_state(self, state: dict, include_global_rng: bool = True) -> None:
+        """
+        Restore a simulation state from <get_state>. The snapshot is copied, so it can be restored any number of times.
+        :param state: (dict) The state.
+        :param include_global_rng: (bool) Restore the state of the global numpy random generator, if in the snapshot
+            (see <get_state>).
+        """
+        state = copy.deepcopy(state)
+        np_random_state = state.pop("np_random_state", None)
+        if include_global_rng and np_random_state is not None:
+            np.random.set_state(np_random_state)
+        for name in self.STATE_ATTRIBUTES:
+            setattr(self, name, state[name])
+
     def _reward_terminated_truncated(self, messages: list, launches: list) -> tuple[Union[int, float], bool, bool]:
         """Create reward, terminated, and truncated values for a step."""
         # if a ship dies, game over, reward = -5
@@ -695,4 +734,5 @@ class HatEnv(gym.Env):
         pygame.time.Clock().tick(60)
 
     def __del__(self):
-        pygame.quit()
+        if pygame is not None:
+            pygame.quit()
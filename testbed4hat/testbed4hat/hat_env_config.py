@@ -13,9 +13,11 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import hashlib
 import json
 from typing import Union, Any
 
+from .derived_quantities import DerivedQuantities, get_derived_quantities
 from .wave_generator import WaveGenerator, DEFAULT_THREAT_0_SPEED, DEFAULT_THREAT_1_SPEED
 
 
@@ -219,7 +221,42 @@ class HatEnvConfig:
         self.validate()
 
     def to_dict(self):
-        return vars(self).copy()
+        return {k: v for k, v in vars(self).items() if not k.startswith("_")}
+
+    def to_canonical_dict(self) -> dict:
+        """
+        Get the parameters of this config in a canonical, JSON-serializable form: the raw <config> input is dropped
+        (its content is already applied to the parameters), tuples become lists, and schedule keys become sorted
+        strings. Two configs describing the same environment have the same canonical dict.
+        """
+        data = self.to_dict()
+        data.pop("config", None)
+        for k, v in data.items():
+            if isinstance(v, (tuple, list)):
+                data[k] = list(v)
+        if isinstance(data["schedule"], dict):
+            data["schedule"] = {str(t): list(data["schedule"][t]) for t in sorted(data["schedule"])}
+        return data
+
+    @property
+    def config_hash(self) -> str:
+        """
+        Stable content hash of this config. The seed is deliberately left out so that all seeds of the same scenario
+        share the hash (and the derived quantities).
+        """
+        data = self.to_canonical_dict()
+        data.pop("seed")
+        encoded = json.dumps(data, sort_keys=True, separators=(",", ":")).encode("utf-8")
+        return hashlib.sha256(encoded).hexdigest()
+
+    @property
+    def derived(self) -> DerivedQuantities:
+        """Quantities derived from this config, shared with all other configs with the same content hash."""
+        return get_derived_quantities(self)
+
+    def freeze(self) -> "FrozenHatEnvConfig":
+        """Get an immutable, canonicalized copy of this config."""
+        return FrozenHatEnvConfig(self.to_dict())
 
     def to_json(self, file_path: str):
         data = self.to_dict()
@@ -255,7 +292,7 @@ class HatEnvConfig:
                               }
         print("The configuration object for the HatEnv environment. The configuration parameters are as follows:")
         print()
-        for k, v in self.__dict__.items():
+        for k, v in self.to_dict().items():
             print(f"Parameter: {k}")
             print(f"\tType: {self.PARAM_TYPES[k]}")
             print(f"\tCurrent value: {v}")
@@ -357,3 +394,72 @@ class HatEnvConfig:
             for key, value in self.schedule.items():
                 assert isinstance(key, int) and isinstance(value, tuple)
                 assert value == (0, 1) or value == (1, 0) or value == (1, 1)
+
+
+class FrozenHatEnvConfig(HatEnvConfig):
+    """
+    Immutable, canonicalized configuration object of HAT environment. Parameters are validated once, on creation, and
+    can't be changed afterward (use <replace> to get a modified copy). Frozen configs are hashable, so they can be used
+    as dictionary keys, and their content hash and derived quantities are only computed once.
+    """
+    def __init__(self, config: Union[str, dict] = None):
+        super().__init__(config)
+        # canonicalize the parameters, so that equal configs have equal attributes
+        for k, v in self.to_dict().items():
+            if "color" in k or (k.startswith("hard_ship_") and v is not None):
+                setattr(self, k, tuple(v))
+        if isinstance(self.schedule, dict):
+            self.schedule = {t: tuple(self.schedule[t]) for t in sorted(self.schedule)}
+        self.config = None  # the raw input is already applied to the parameters
+        self._config_hash = super().config_hash
+        self._frozen = True
+
+    def __setattr__(self, name: str, value: Any):
+        if getattr(self, "_frozen", False):
+            raise AttributeError(f"Cannot set parameter {name}: the config is frozen, use replace() instead")
+        super().__setattr__(name, value)
+
+    def __delattr__(self, name: str):
+        raise AttributeError(f"Cannot delete parameter {name}: the config is frozen")
+
+    def __eq__(self, other):
+        if not isinstance(other, FrozenHatEnvConfig):
+            return NotImplemented
+        return self._config_hash == other._config_hash and self.seed == other.seed
+
+    def __hash__(self):
+        return hash((self._config_hash, self.seed))
+
+    def __repr__(self):
+        return f"FrozenHatEnvConfig(hash={self._config_hash[:12]}, seed={self.seed})"
+
+    def __reduce__(self):
+        # rebuild from the parameters when unpickled (e.g. when sent to worker processes)
+        return self.__class__, (self.to_dict(),)
+
+    @property
+    def config_hash(self) -> str:
+        return self._config_hash
+
+    def set_parameter(self, parameter: str, value: Any):
+        raise AttributeError(f"Cannot set parameter {parameter}: the config is frozen, use replace() instead")
+
+    def replace(self, **parameters) -> "FrozenHatEnvConfig":
+        """
+        Get a frozen copy of this config with some parameters changed, checking that the parameters are valid.
+        :param parameters: parameter names and their new values
+        """
+        data = self.to_dict()
+        for parameter in parameters:
+            if parameter not in data:
+                raise ValueError(f"Parameter {parameter} is not defined")
+        data.update(parameters)
+        return self.__class__(data)
+
+    def freeze(self) -> "FrozenHatEnvConfig":
+        return self
+
+    def validate(self):
+        if getattr(self, "_frozen", False):
+            return  # validated on creation, and can't have changed since
+        super().validate()
@@ -16,7 +16,7 @@
 from typing import Union, Tuple
 
 from .pk_table import get_pk
-from .utils import distance, get_weapon_launch_info
+from .utils import InterceptGeometry
 
 
 class HeuristicAgent:
@@ -50,6 +50,20 @@ class HeuristicAgent:
         self.max_urgency_dist = 10_000
         self.max_actions = max_actions
 
+        # threat ID -> ship index -> intercept geometry of the threat for weapons launched from the ship. Threats fly
+        #   at constant velocity, so the intercept coefficients are only computed once per threat
+        self._intercept_cache: dict[str, dict[int, InterceptGeometry]] = dict()
+
+    def _get_intercept_geometry(self, ship_threat, ship_location, ship_idx) -> InterceptGeometry:
+        """Get the cached intercept geometry of a threat for a ship, (re)computing it for new threats."""
+        threat_cache = self._intercept_cache.setdefault(ship_threat["threat_id"], dict())
+        geometry = threat_cache.get(ship_idx)
+        if geometry is None or not geometry.matches(ship_threat["velocity"], ship_location):
+            geometry = InterceptGeometry(ship_threat["location"], ship_threat["velocity"], ship_location,
+                                         (self.weapon_0_speed, self.weapon_1_speed))
+            threat_cache[ship_idx] = geometry
+        return geometry
+
     def _get_ship_weapon_choice(self, ship_threat, ship_location, ship_idx, ship_inventory) \
             -> Union[Tuple[int, int, str, float], None]:
         """
@@ -65,26 +79,17 @@ class HeuristicAgent:
         """
         # Returns None if no good choices (threshold and inventory may block)
         threat_distance = ship_threat["distance"]
-        threat_location = ship_threat["location"]
-        threat_velocity = ship_threat["velocity"]
 
         if threat_distance > self.max_urgency_dist:
             ship_threat_urgency = 1 - threat_distance / self.max_threat_dist
         else:
             ship_threat_urgency = 1.0
 
-        weapon_0_intercept_info = get_weapon_launch_info(threat_location, ship_location, threat_velocity,
-                                                         self.weapon_0_speed)
-        weapon_1_intercept_info = get_weapon_launch_info(threat_location, ship_location, threat_velocity,
-                                                         self.weapon_1_speed)
-
-        # Weapons may not be able to intercept, resulting in <None>, so set dist=0, which gives 0 prob weight
-        intercept_point_weapon_0 = (ship_location if not weapon_0_intercept_info
-                                    else weapon_0_intercept_info["intercept_point"])
-        intercept_point_weapon_1 = (ship_location if not weapon_1_intercept_info
-                                    else weapon_1_intercept_info["intercept_point"])
-        dist_to_intercept_weapon_0 = float(distance(ship_location, intercept_point_weapon_0))
-        dist_to_intercept_weapon_1 = float(distance(ship_location, intercept_point_weapon_1))
+        # Weapons may not be able to intercept, in which case dist=0, which gives 0 prob weight
+        geometry = self._get_intercept_geometry(ship_threat, ship_location, ship_idx)
+        elapsed_time = geometry.elapsed_time(ship_threat["location"])
+        dist_to_intercept_weapon_0 = geometry.intercept_distance(elapsed_time, 0)
+        dist_to_intercept_weapon_1 = geometry.intercept_distance(elapsed_time, 1)
 
         ship_weapon_0_pk = get_pk(dist_to_intercept_weapon_0, 0, ship_threat["threat_type"])
         ship_weapon_1_pk = get_pk(dist_to_intercept_weapon_1, 1, ship_threat["threat_type"])
@@ -106,6 +111,12 @@ class HeuristicAgent:
         :return: (list) List of actions to take at this step.
         """
 
+        # forget the threats that are gone (destroyed, or missed their target)
+        current_threat_ids = {t["threat_id"] for ship_key in (self.ship_0_key, self.ship_1_key)
+                              for t in observation[ship_key]['threats']}
+        for threat_id in [t for t in self._intercept_cache if t not in current_threat_ids]:
+            del self._intercept_cache[threat_id]
+
         ship_0_location = observation[self.ship_0_key]['location']
         ship_1_location = observation[self.ship_1_key]['location']
 
@@ -0,0 +1,186 @@
+# Copyright 2024 The Johns Hopkins University Applied Physics Laboratory LLC
+# All rights reserved.
+#
+# Licensed under the 3-Clause BSD License (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://opensource.org/licenses/BSD-3-Clause
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from collections import Counter
+from typing import Union
+
+DEFAULT_PRECISION = 6  # decimals of the coordinates (in degrees: about 0.1 m)
+
+
+def feature_keys(features: list[dict]) -> list[str]:
+    """
+    Keys identifying the features of a map across updates: their id, numbered from the second feature with the same
+    id (e.g. the lines of the weapons targeting the same threat).
+    """
+    seen = Counter()
+    keys = []
+    for feature in features:
+        feature_id = str(feature.get("properties", {}).get("id"))
+        keys.append(feature_id if not seen[feature_id] else f"{feature_id}#{seen[feature_id]}")
+        seen[feature_id] += 1
+    return keys
+
+
+def _copy(value, precision: int = None):
+    # copy of the dicts and lists of a JSON value, with its floats rounded to <precision> decimals if set
+    if isinstance(value, dict):
+        return {key: _copy(item, precision) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_copy(item, precision) for item in value]
+    if precision is not None and isinstance(value, float):
+        return round(value, precision)
+    return value
+
+
+def quantize(feature: dict, precision: int = DEFAULT_PRECISION) -> dict:
+    """Copy of a feature with its coordinates rounded to <precision> decimals."""
+    return {
+        key: {
+            name: _copy(item, precision if name == "coordinates" else None) for name, item in value.items()
+        } if key == "geometry" and isinstance(value, dict) else _copy(value)
+        for key, value in feature.items()
+    }
+
+
+def _diff(old: dict, new: dict) -> Union[dict, None]:
+    # the values of <new> different from <old>, the dicts recursively; None if a key was removed (the feature is then
+    #   sent whole)
+    if any(key not in new for key in old):
+        return None
+    patch = {}
+    for key, value in new.items():
+        if key not in old:
+            patch[key] = value
+        elif old[key] != value:
+            if isinstance(value, dict) and isinstance(old[key], dict):
+                value = _diff(old[key], value)
+                if value is None:
+                    return None
+            patch[key] = value
+    return patch
+
+
+def _patched(feature: dict, patch: dict) -> dict:
+    # a copy of the feature with the values of the patch, the dicts recursively (the feature is left unchanged)
+    feature = dict(feature)
+    for key, value in patch.items():
+        if isinstance(value, dict) and isinstance(feature.get(key), dict):
+            value = _patched(feature[key], value)
+        feature[key] = value
+    return feature
+
+
+class MapDeltaEncoder:
+    """
+    Encoder of the successive maps of a game as deltas: every <keyframe_interval> updates, the whole map is sent (a
+    keyframe), and the updates in between only have the features added, changed or removed since the keyframe, as
+    the feature collection of a MappingMessage. Changed features are sent as patches of their changed values (e.g.
+    the coordinates and ETA of a threat), and features whose coordinates moved less than the precision are not sent.
+    As the deltas are from the keyframe rather than from the previous update, a client missing an update (e.g. a
+    message posted late, after the client read the next ones) has the map again at the next one.
+    The feature collection of an update has, besides the added (or replaced) features, a "delta" member (see
+    MapDeltaDecoder):
+        {"seq": 3, "base": 0, "keys": [keys of the features], "patches": [{"key": ..., "patch": {...}}],
+         "removed": [keys]}
+    where "base" is the sequence number of the keyframe (that of the update itself for a keyframe).
+    Clients unaware of the deltas (e.g. the Serge map) would only show the features of the updates: the deltas are
+    for games whose clients decode them (e.g. the bots of a load test, and the provenance generator).
+    Usage:
+        encoder = MapDeltaEncoder(keyframe_interval=10)
+        message["featureCollection"] = encoder.encode(features)  # each turn
+    """
+    def __init__(self, keyframe_interval: int = 10, precision: int = DEFAULT_PRECISION):
+        """
+        :param keyframe_interval: (int) Number of updates from a keyframe to the next (1 for keyframes only).
+        :param precision: (int) Decimals of the coordinates sent. Features moving less are not updated.
+        """
+        if keyframe_interval < 1:
+            raise ValueError("The keyframe interval must be at least 1")
+        self.keyframe_interval = keyframe_interval
+        self.precision = precision
+        self.seq = 0  # number of updates encoded
+        self._keyframe: dict[str, dict] = {}  # features of the last keyframe, by key
+
+    def encode(self, features: list[dict]) -> dict:
+        """
+        The next update of the map, as a feature collection (its features must not be modified, the encoder keeps
+        those of the keyframes).
+        :param features: (list[dict]) All the features of the map.
+        :return: (dict) The feature collection of the update.
+        """
+        current = {key: quantize(feature, self.precision) for key, feature in zip(feature_keys(features), features)}
+        if self.seq % self.keyframe_interval == 0:
+            self._keyframe, self._keyframe_seq = current, self.seq
+            added, patches, removed = current, [], []
+        else:
+            added, patches = {}, []
+            for key, feature in current.items():
+                old = self._keyframe.get(key)
+                if old is None:
+                    added[key] = feature
+                elif old != feature:
+                    patch = _diff(old, feature)
+                    if patch is None:
+                        added[key] = feature  # replaced
+                    else:
+                        patches.append({"key": key, "patch": patch})
+            removed = [key for key in self._keyframe if key not in current]
+        delta = {"seq": self.seq, "base": self._keyframe_seq, "keys": list(added), "patches": patches,
+                 "removed": removed}
+        self.seq += 1
+        return {"type": "FeatureCollection", "features": list(added.values()), "delta": delta}
+
+    def reset(self) -> None:
+        """Send a keyframe next (e.g. when the game restarts)."""
+        self.seq = 0
+        self._keyframe = {}
+
+
+class MapDeltaDecoder:
+    """
+    Decoder of the maps encoded by a MapDeltaEncoder, rebuilding the whole map from each update (the last keyframe
+    and the delta from it). The features are in the order of the keyframe, then of their addition. Feature
+    collections without delta (whole maps) are returned as they are.
+    """
+    def __init__(self):
+        self.keyframe: dict[str, dict] = {}  # the map of the last keyframe, by feature key
+        self.keyframe_seq: Union[int, None] = None  # sequence number of the last keyframe, None before one
+
+    def decode(self, feature_collection: dict) -> Union[list[dict], None]:
+        """
+        Rebuild the map of an update.
+        :param feature_collection: (dict) The feature collection of a MappingMessage.
+        :return: (list[dict] | None) All the features of the map, None if the keyframe of the update was missed (the
+            map is then unknown until the next keyframe).
+        """
+        delta = feature_collection.get("delta")
+        features = feature_collection.get("features", [])
+        if delta is None:
+            self.keyframe, self.keyframe_seq = {}, None
+            return features
+        if delta["base"] == delta["seq"]:
+            self.keyframe, self.keyframe_seq = dict(zip(delta["keys"], features)), delta["seq"]
+            return list(features)
+        if delta["base"] != self.keyframe_seq:
+            return None
+        removed = set(delta["removed"])
+        patches = {patch["key"]: patch["patch"] for patch in delta["patches"]}
+        features = {
+            key: _patched(feature, patches[key]) if key in patches else feature
+            for key, feature in self.keyframe.items()
+            if key not in removed
+        }
+        features.update(zip(delta["keys"], feature_collection.get("features", [])))
+        return list(features.values())
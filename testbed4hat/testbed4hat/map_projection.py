@@ -0,0 +1,78 @@
+# Copyright 2024 The Johns Hopkins University Applied Physics Laboratory LLC
+# All rights reserved.
+#
+# Licensed under the 3-Clause BSD License (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://opensource.org/licenses/BSD-3-Clause
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from typing import Sequence
+
+import numpy as np
+
+SERGE_ORIGIN = (43.21484211402448, 12.819648833091783)  # long-lat coords of (0, 0) in the sim, on the Serge map
+DEFAULT_UTM_ZONE = 31
+
+
+class MapProjection:
+    """
+    Projection of the sim coordinates (in meters from the ships' area) to the long-lat coordinates of the Serge map,
+    through a UTM projection whose transformer is built once, on the first conversion (pyproj is only imported then,
+    as it is slow to import). The points of a turn are converted in a single call (see to_long_lat), and static
+    points (e.g. the ships) are only converted once.
+    Note: the latitude and longitude of the origin are exchanged in the UTM projection, then exchanged back (as the
+    runner always did), so that the maps of the games do not change.
+    Usage:
+        projection = MapProjection()
+        coordinates = projection.to_long_lat([threat["location"] for threat in threats])  # [[long, lat], ...]
+    """
+    def __init__(self, origin: Sequence[float] = SERGE_ORIGIN, utm_zone: int = DEFAULT_UTM_ZONE):
+        """
+        :param origin: (Sequence[float]) Long-lat coordinates of (0, 0) in the sim.
+        :param utm_zone: (int) Zone of the UTM projection.
+        """
+        self.origin = tuple(origin)
+        self.utm_zone = utm_zone
+        self.utm_zero = None  # UTM coords of (0, 0) in the sim
+        self._from_utm = None  # the transformer from the UTM coords, built on the first conversion
+        self._static: dict[tuple[float, float], tuple[float, float]] = {}  # cache of the static points
+
+    def _build_transformer(self) -> None:
+        from pyproj import CRS, Transformer
+
+        crs = CRS.from_proj4(f"+proj=utm +zone={self.utm_zone} +ellps=WGS84")
+        to_utm = Transformer.from_crs(crs.geodetic_crs, crs, always_xy=True)
+        long, lat = self.origin
+        self.utm_zero = np.array(to_utm.transform(lat, long))
+        self._from_utm = Transformer.from_crs(crs, crs.geodetic_crs, always_xy=True)
+
+    def to_long_lat(self, xy) -> np.ndarray:
+        """
+        Convert sim coordinates to long-lat coordinates, all at once.
+        :param xy: (array-like) The (x, y) coordinates of the points, in meters, as an array of shape (n, 2).
+        :return: (np.ndarray) Their [long, lat] coordinates, as an array of shape (n, 2).
+        """
+        if self._from_utm is None:
+            self._build_transformer()
+        utm = np.asarray(xy, dtype=float).reshape(-1, 2) + self.utm_zero
+        lat, long = self._from_utm.transform(utm[:, 0], utm[:, 1])
+        return np.column_stack((long, lat))
+
+    def point(self, x: float, y: float) -> list[float]:
+        """
+        Long-lat coordinates of a static point (e.g. a ship), converted the first time only.
+        :param x: (float) X coordinate in the sim, in meters.
+        :param y: (float) Y coordinate in the sim, in meters.
+        :return: (list[float]) Its [long, lat] coordinates.
+        """
+        key = (float(x), float(y))
+        if key not in self._static:
+            self._static[key] = tuple(self.to_long_lat([key])[0].tolist())
+        return list(self._static[key])
@@ -0,0 +1,118 @@
+# Copyright 2024 The Johns Hopkins University Applied Physics Laboratory LLC
+# All rights reserved.
+#
+# Licensed under the 3-Clause BSD License (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://opensource.org/licenses/BSD-3-Clause
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import itertools
+import json
+from pathlib import Path
+import sqlite3
+import threading
+from typing import Iterable, Iterator, Union
+
+INITIAL_WARGAME_ID = "initial_wargame"  # the game definition, which is not a message
+
+
+class MessageJournal:
+    """
+    Local, append-only journal of the messages of Serge games, in a SQLite database. Messages are keyed by game and
+    id: appending a message already journaled is a no-op, and reads are in id order (the order of Serge), after a
+    cursor (the id of the last message read). A SergeGame given a journal only downloads the messages after the last
+    journaled one (see SergeGame.sync_journal), so a journal file can be shared by the runner of a game and the
+    provenance generator, across restarts.
+    Usage:
+        with MessageJournal("games.sqlite") as journal:
+            game = SergeGame(game_id, journal=journal)
+            game.get_messages()  # the journaled messages, and the new ones
+    """
+    def __init__(self, path: Union[str, Path] = ":memory:"):
+        """
+        :param path: (str | Path) SQLite database file, created if needed (":memory:" for a journal in memory).
+        """
+        self.path = str(path)
+        # (the connection is shared by the threads of an AsyncSergeGame, and serialized by the lock)
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._connection:
+            if self.path != ":memory:":
+                self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS messages ("
+                "game_id TEXT NOT NULL, id TEXT NOT NULL, message TEXT NOT NULL, PRIMARY KEY (game_id, id)"
+                ") WITHOUT ROWID"
+            )
+
+    def append(self, game_id: str, messages: Iterable[dict], batch_size: int = 500) -> int:
+        """
+        Add messages to the journal of a game (the game definition and the messages already journaled are ignored).
+        :param game_id: (str) The game id.
+        :param messages: (Iterable[dict]) The messages, e.g. an iterator parsing them as they are downloaded.
+        :param batch_size: (int) Number of messages committed at once (the messages of the batches committed are
+            kept if the iteration fails).
+        :return: (int) Number of messages added.
+        """
+        rows = ((game_id, m["_id"], json.dumps(m)) for m in messages if m["_id"] != INITIAL_WARGAME_ID)
+        added = 0
+        while batch := list(itertools.islice(rows, batch_size)):
+            with self._lock, self._connection:
+                before = self._connection.total_changes
+                self._connection.executemany("INSERT OR IGNORE INTO messages VALUES (?, ?, ?)", batch)
+                added += self._connection.total_changes - before
+        return added
+
+    def last_id(self, game_id: str) -> Union[str, None]:
+        """Id of the last message of a game, None if none is journaled."""
+        with self._lock:
+            row = self._connection.execute("SELECT MAX(id) FROM messages WHERE game_id = ?", (game_id,)).fetchone()
+        return row[0]
+
+    def count(self, game_id: str) -> int:
+        with self._lock:
+            row = self._connection.execute("SELECT COUNT(*) FROM messages WHERE game_id = ?", (game_id,)).fetchone()
+        return row[0]
+
+    def read(self, game_id: str, after: str = None, limit: int = None) -> list[dict]:
+        """
+        Messages of a game, in id order.
+        :param game_id: (str) The game id.
+        :param after: (str) Cursor: only the messages whose id is after this one (all of them if None).
+        :param limit: (int) Max number of messages (None for no limit).
+        :return: (list[dict]) The messages.
+        """
+        query = "SELECT message FROM messages WHERE game_id = ? AND id > ? ORDER BY id"
+        params = [game_id, "" if after is None else after]
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            rows = self._connection.execute(query, params).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def iter_messages(self, game_id: str, after: str = None, batch_size: int = 1000) -> Iterator[dict]:
+        """Messages of a game after the cursor <after>, in id order, read <batch_size> at a time."""
+        while True:
+            messages = self.read(game_id, after, batch_size)
+            yield from messages
+            if len(messages) < batch_size:
+                return
+            after = messages[-1]["_id"]
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,126 @@
+# Copyright 2024 The Johns Hopkins University Applied Physics Laboratory LLC
+# All rights reserved.
+#
+# Licensed under the 3-Clause BSD License (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://opensource.org/licenses/BSD-3-Clause
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+import threading
+import time
+from typing import Union
+
+import numpy as np
+
+from .utils import atomic_write
+
+# upper bounds of the histogram buckets, in seconds (from the send of a message to the wait for a phase)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1., 2.5, 5., 10., 30., 60., 120.)
+METRIC_NAME = "testbed4hat_phase_seconds"
+
+
+def _label_value(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+class PhaseTimers:
+    """
+    Latency histograms of the phases of the turns of a runner (e.g. "step", "map", "send"), to see where the time of
+    an adjudication phase goes. The durations are observed from any thread (e.g. the sends of an AsyncSergeGame), and
+    exported in the Prometheus text format (see <write>), e.g. for the textfile collector of the node exporter.
+    Usage:
+        timers = PhaseTimers()
+        with timers.time("step"):
+            env.step(actions)
+        timers.write("game.prom", {"game": game_id})
+    """
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        """
+        :param buckets: (tuple[float, ...]) Upper bounds of the histogram buckets, in seconds.
+        """
+        self.buckets = tuple(sorted(buckets))
+        self.durations: dict[str, list[float]] = defaultdict(list)  # of each phase, in seconds, in observation order
+        self._lock = threading.Lock()
+
+    def observe(self, phase: str, seconds: float) -> None:
+        with self._lock:
+            self.durations[phase].append(seconds)
+
+    @contextmanager
+    def time(self, phase: str):
+        """Observe the duration of the block as <phase> (even if it raises)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(phase, time.perf_counter() - start)
+
+    def histogram(self, phase: str) -> tuple[list[int], float, int]:
+        """
+        :param phase: (str) The phase.
+        :return: (tuple[list[int], float, int]) The cumulative counts of the durations of the phase in each bucket
+            (the last one being +Inf), their sum and their count.
+        """
+        with self._lock:
+            durations = list(self.durations.get(phase, ()))
+        counts = [0] * (len(self.buckets) + 1)
+        for duration in durations:
+            counts[bisect_left(self.buckets, duration)] += 1
+        return np.cumsum(counts).tolist(), float(sum(durations)), len(durations)
+
+    def summary(self) -> dict[str, dict]:
+        """The count, total and percentiles of the durations of each phase (in seconds, ms for the percentiles)."""
+        with self._lock:
+            durations = {phase: np.array(values) for phase, values in self.durations.items() if values}
+        return {
+            phase: {
+                "count": len(values),
+                "total_s": round(float(values.sum()), 3),
+                "p50_ms": round(float(np.percentile(values, 50)) * 1000, 3),
+                "p95_ms": round(float(np.percentile(values, 95)) * 1000, 3),
+                "max_ms": round(float(values.max()) * 1000, 3),
+            }
+            for phase, values in durations.items()
+        }
+
+    def to_prometheus(self, labels: dict[str, str] = None) -> str:
+        """
+        :param labels: (dict[str, str]) Labels of all the samples (e.g. the game id).
+        :return: (str) The histograms of the phases, in the Prometheus text format.
+        """
+        labels = "".join(f'{name}="{_label_value(value)}",' for name, value in (labels or {}).items())
+        lines = [
+            f"# HELP {METRIC_NAME} Duration of the phases of the turns of the Serge runner.",
+            f"# TYPE {METRIC_NAME} histogram",
+        ]
+        with self._lock:
+            phases = sorted(self.durations)
+        for phase in phases:
+            counts, total, count = self.histogram(phase)
+            phase_labels = f'{labels}phase="{_label_value(phase)}"'
+            bounds = [repr(float(bound)) for bound in self.buckets] + ["+Inf"]
+            lines += [f'{METRIC_NAME}_bucket{{{phase_labels},le="{le}"}} {n}' for le, n in zip(bounds, counts)]
+            lines.append(f"{METRIC_NAME}_sum{{{phase_labels}}} {total!r}")
+            lines.append(f"{METRIC_NAME}_count{{{phase_labels}}} {count}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: Union[str, Path], labels: dict[str, str] = None) -> None:
+        """
+        Write the histograms to a metrics file, replacing it atomically (so that a scraper never reads a partial
+        file).
+        :param path: (str | Path) The metrics file.
+        :param labels: (dict[str, str]) Labels of all the samples (see <to_prometheus>).
+        """
+        with atomic_write(path) as f:
+            f.write(self.to_prometheus(labels))
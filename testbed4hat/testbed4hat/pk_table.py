@@ -13,65 +13,69 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import numpy as np
+
+
+# Parameters of the piecewise-linear PK curves, indexed by [weapon_ind][threat_ind]: the PK plateau value, the distance
+#   where the plateau ends and the distance where the PK gets back to 0. All the PKs are 0 up to 1 km, then ramp up to
+#   the plateau at 2 km.
+PK_CURVES = (
+    ((0.9, 25000., 32500.), (0.7, 30000., 35000.)),  # weapon 0: long range defense
+    ((0.95, 8000., 17500.), (0.85, 10000., 20000.)),  # weapon 1: short range defense
+)
+PK_MIN_DISTANCE = 1000.
+PK_RAMP_END = 2000.
+_PK_PLATEAU, _PK_PLATEAU_END, _PK_ZERO_DISTANCE = np.moveaxis(np.array(PK_CURVES), -1, 0)
+
+
 def get_pk(distance: float, weapon_ind: int, threat_ind: int) -> float:
     """
     Hardcoded logic for computing probability of kill (PK) for weapons assigned to different threats, as a
-    function of distance. Weapon 0 is more effective over long ranges, while weapon 1 is more
+    function of distance (see PK_CURVES). Weapon 0 is more effective over long ranges, while weapon 1 is more
     effective over short ranges.
     :param distance: distance to threat [m]
     :param weapon_ind: 0 or 1 (currently only two weapon types)
     :param threat_ind: 0 or 1 (currently only two threat_types)
     :return: probability that defense will neutralize threat (assuming available and no other impacting factors)
     """
-    if weapon_ind == 0:  # long range defense
-        if threat_ind == 0:  # threat 0
-            if distance < 1000:
-                pk = 0.
-            elif distance < 2000:
-                pk = .9 * (distance-1000) / 1000
-            elif distance < 25000:
-                pk = 0.9
-            elif distance < 32500:
-                pk = 0.9 - .9 * (distance-25000) / 7500
-            else:
-                pk = 0.
-        else:  # threat 1
-            if distance < 1000:
-                pk = 0.
-            elif distance < 2000:
-                pk = .7 * (distance - 1000) / 1000
-            elif distance < 30000:
-                pk = 0.7
-            elif distance < 35000:
-                pk = 0.7 - .7 * (distance - 30000) / 5000
-            else:
-                pk = 0.
-    else:  # short range defense
-        if threat_ind == 0:  # threat 0
-            if distance < 1000:
-                pk = 0.
-            elif distance < 2000:
-                pk = .95 * (distance - 1000) / 1000
-            elif distance < 8000:
-                pk = 0.95
-            elif distance < 17500:
-                pk = 0.95 - .95 * (distance - 8000) / 9500
-            else:
-                pk = 0.
-        else:  # threat 1
-            if distance < 1000:
-                pk = 0.
-            elif distance < 2000:
-                pk = .85 * (distance - 1000) / 1000
-            elif distance < 10000:
-                pk = 0.85
-            elif distance < 20000:
-                pk = 0.85 - .85 * (distance - 10000) / 10000
-            else:
-                pk = 0.
+    plateau, plateau_end, zero_distance = PK_CURVES[0 if weapon_ind == 0 else 1][0 if threat_ind == 0 else 1]
+    if distance < PK_MIN_DISTANCE:
+        pk = 0.
+    elif distance < PK_RAMP_END:
+        pk = plateau * (distance - PK_MIN_DISTANCE) / (PK_RAMP_END - PK_MIN_DISTANCE)
+    elif distance < plateau_end:
+        pk = plateau
+    elif distance < zero_distance:
+        pk = plateau - plateau * (distance - plateau_end) / (zero_distance - plateau_end)
+    else:
+        pk = 0.
     return pk
 
 
+def get_pk_array(distance: np.ndarray, weapon_ind: np.ndarray, threat_ind: np.ndarray) -> np.ndarray:
+    """
+    Vectorized version of get_pk, computing the same values (bit for bit) for arrays of distances, weapon types and
+    threat types. Inputs are broadcast against each other.
+    :param distance: distance to threat [m]
+    :param weapon_ind: 0 or 1 (currently only two weapon types)
+    :param threat_ind: 0 or 1 (currently only two threat_types)
+    :return: probabilities that defense will neutralize threat
+    """
+    distance = np.asarray(distance, dtype=float)
+    weapon_ind = np.asarray(weapon_ind, dtype=int)
+    threat_ind = np.asarray(threat_ind, dtype=int)
+    plateau = _PK_PLATEAU[weapon_ind, threat_ind]
+    plateau_end = _PK_PLATEAU_END[weapon_ind, threat_ind]
+    zero_distance = _PK_ZERO_DISTANCE[weapon_ind, threat_ind]
+    distance, plateau, plateau_end, zero_distance = np.broadcast_arrays(distance, plateau, plateau_end, zero_distance)
+    return np.select(
+        [distance < PK_MIN_DISTANCE, distance < PK_RAMP_END, distance < plateau_end, distance < zero_distance],
+        [0., plateau * (distance - PK_MIN_DISTANCE) / (PK_RAMP_END - PK_MIN_DISTANCE), plateau,
+         plateau - plateau * (distance - plateau_end) / (zero_distance - plateau_end)],
+        default=0.,
+    )
+
+
 def get_pk_original(distance: float, direction: float, weapon_ind: int, threat_ind: int) -> float:
     """
     Hardcoded logic for computing probability of kill (PK) for weapons assigned to different threats, as a
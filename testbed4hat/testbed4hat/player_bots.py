@@ -0,0 +1,264 @@
+# Copyright 2024 The Johns Hopkins University Applied Physics Laboratory LLC
+# All rights reserved.
+#
+# Licensed under the 3-Clause BSD License (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://opensource.org/licenses/BSD-3-Clause
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+from copy import deepcopy
+from datetime import datetime, UTC
+import math
+import random
+from typing import Union
+
+import numpy as np
+
+from .map_delta import MapDeltaDecoder
+from .serge import MSG_WA, WA_MESSAGE, AsyncSergeGame, SergeGame
+from .wait_strategies import AdaptivePolling, ChangeFeed, WaitStrategy
+
+THREAT_FORCE = "f-militia"  # force of the threats on the map
+WEAPONS = ("Long Range", "Short Range")
+DECISIONS = ("Release", "Amend", "Reject")  # what a player does with a suggestion (as written in its feedback)
+
+# role id, role name and WA channel of the commanding officer of each ship
+SHIP_ROLES = {
+    "alpha": (SergeGame.ID_CO_A, "CO Alpha", SergeGame.TARGETING_CHANNEL_A),
+    "bravo": (SergeGame.ID_CO_B, "CO Bravo", SergeGame.TARGETING_CHANNEL_B),
+}
+
+
+class ReactionTime:
+    def __init__(self, median: float = 20., sigma: float = 0.6, min_seconds: float = 1., max_seconds: float = None):
+        """
+        Log-normal distribution of the time a player takes to react to a message.
+        :param median: (float) Median reaction time, in seconds.
+        :param sigma: (float) Standard deviation of the log of the reaction time (0 for a constant reaction time).
+        :param min_seconds: (float) Min reaction time, in seconds.
+        :param max_seconds: (float) Max reaction time, in seconds (None for no limit).
+        """
+        self.median = median
+        self.sigma = sigma
+        self.min_seconds = min_seconds
+        self.max_seconds = max_seconds
+
+    def sample(self, rng: random.Random) -> float:
+        seconds = max(self.min_seconds, self.median * math.exp(rng.gauss(0., self.sigma)))
+        return seconds if self.max_seconds is None else min(self.max_seconds, seconds)
+
+
+class BotStats:
+    def __init__(self):
+        self.suggestions = 0  # AI suggestions reviewed
+        self.released = 0
+        self.amended = 0  # released with another weapon
+        self.rejected = 0
+        self.manual = 0  # WA messages of the player (not suggested)
+        self.late = 0  # messages sent after the end of the planning phase they react to
+        self.reaction_times: list[float] = []  # in seconds (game time, see CommandingOfficerBot.time_scale)
+
+    def add(self, other: "BotStats") -> "BotStats":
+        for name, value in vars(other).items():
+            setattr(self, name, getattr(self, name) + value)
+        return self
+
+    def as_dict(self) -> dict:
+        stats = {name: value for name, value in vars(self).items() if name != "reaction_times"}
+        if self.reaction_times:
+            stats["reaction_p50_s"] = round(float(np.percentile(self.reaction_times, 50)), 3)
+            stats["reaction_p95_s"] = round(float(np.percentile(self.reaction_times, 95)), 3)
+        return stats
+
+
+class CommandingOfficerBot:
+    """
+    Scripted commanding officer of a ship, playing a Serge game alongside the SergeEnvRunner (the AI Assistant).
+    The bot reviews the WA suggestions of the AI Assistant on the WA channel of its ship: after a reaction time, it
+    releases, amends (releases with the other weapon) or rejects each of them, by posting the WA message with its
+    updated collaboration status and feedback. At the start of each planning phase, it may also assign a weapon
+    to a threat of the map by itself (a manual WA message, released right away).
+    Reaction times are game times, scaled by <time_scale> (e.g. 0.01 to play 2-minute planning phases in 1.2 s).
+    Usage:
+        bot = CommandingOfficerBot.for_ship(AsyncSergeGame(game_id, server_url), "alpha")
+        task = asyncio.create_task(bot.run())  # plays until cancelled
+    """
+    def __init__(self, game: AsyncSergeGame, role_id: str, role_name: str, channel: str,
+                 decision_weights: tuple[float, float, float] = (0.7, 0.15, 0.15),
+                 reaction_time: ReactionTime = None, manual_probability: float = 0.2,
+                 manual_reaction_time: ReactionTime = None, time_scale: float = 1., wait_strategy: WaitStrategy = None,
+                 seed: int = None):
+        """
+        :param game: (AsyncSergeGame) Interface to the game, for this player only.
+        :param role_id: (str) Role of the player.
+        :param role_name: (str) Name of the role.
+        :param channel: (str) WA channel of the ship of the player.
+        :param decision_weights: (tuple[float, float, float]) Relative frequencies of releasing, amending and
+            rejecting a suggestion.
+        :param reaction_time: (ReactionTime) Time to decide on a suggestion (default: median of 20 s).
+        :param manual_probability: (float) Probability of a manual WA message in each planning phase.
+        :param manual_reaction_time: (ReactionTime) Time from the start of the planning phase to the manual WA
+            message (default: median of 40 s).
+        :param time_scale: (float) Ratio of the real time to the game time.
+        :param wait_strategy: (WaitStrategy) How to wait for new messages (default: change feed).
+        :param seed: (int) Seed of the decisions and reaction times.
+        """
+        self.game = game
+        self.role_id = role_id
+        self.role_name = role_name
+        self.channel = channel
+        self.decision_weights = decision_weights
+        self.reaction_time = ReactionTime() if reaction_time is None else reaction_time
+        self.manual_probability = manual_probability
+        self.manual_reaction_time = ReactionTime(median=40.) if manual_reaction_time is None else manual_reaction_time
+        self.time_scale = time_scale
+        self.wait_strategy = (
+            ChangeFeed(fallback=AdaptivePolling(min_interval=0.05)) if wait_strategy is None else wait_strategy
+        )
+        self.rng = random.Random(seed)
+        self.stats = BotStats()
+
+        self.turn: int = 0
+        self.phase: Union[str, None] = None
+        self.threats: dict[str, dict] = {}  # properties of the threats on the map, by id
+        self.map = MapDeltaDecoder()  # (the map may be sent as deltas)
+        self._tasks: set[asyncio.Task] = set()
+
+    @classmethod
+    def for_ship(cls, game: AsyncSergeGame, ship: str, **params) -> "CommandingOfficerBot":
+        """
+        :param game: (AsyncSergeGame) Interface to the game, for this player only.
+        :param ship: (str) "alpha" or "bravo".
+        :param params: Other parameters of CommandingOfficerBot.
+        """
+        role_id, role_name, channel = SHIP_ROLES[ship]
+        return cls(game, role_id, role_name, channel, **params)
+
+    @property
+    def sender(self) -> dict:
+        return {**MSG_WA["details"]["from"], "roleId": self.role_id, "roleName": self.role_name}
+
+    def _feedback(self, action: str, text: str) -> dict:
+        # the action in brackets is read by the provenance pipeline (e.g. "[Amend]" -> AmendedWeaponAssignment)
+        return {
+            "fromId": self.role_id,
+            "fromName": self.role_name,
+            "date": datetime.now(UTC).isoformat(timespec="milliseconds"),
+            "feedback": f"[{action}] {text}",
+        }
+
+    def _is_suggestion(self, message: dict) -> bool:
+        details = message.get("details", {})
+        return (
+            message.get("templateId") == "WA Message"
+            and details.get("channel") == self.channel
+            and details.get("from", {}).get("roleId") == SergeGame.ID_AI
+            and details.get("collaboration", {}).get("status") == "Pending review"
+        )
+
+    def _spawn(self, coroutine) -> None:
+        task = asyncio.create_task(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def observe(self, messages: list[dict]) -> None:
+        """Update the bot with new game messages, scheduling its reactions."""
+        for message in messages:
+            message_type = message.get("messageType")
+            if message_type == "InfoMessage":
+                self.turn, self.phase = message["gameTurn"], message["phase"]
+                if self.phase == "planning" and self.rng.random() < self.manual_probability:
+                    self._spawn(self._assign_manually(self.manual_reaction_time.sample(self.rng)))
+            elif message_type == "MappingMessage":
+                features = self.map.decode(message.get("featureCollection", {}))
+                if features is None:
+                    continue  # an update was missed, the threats are known again at the next keyframe
+                self.threats = {
+                    f["properties"]["id"]: f["properties"]
+                    for f in features
+                    if f["properties"].get("force") == THREAT_FORCE and f["properties"].get("Missed") != "Yes"
+                }
+            elif message_type == "CustomMessage" and self._is_suggestion(message):
+                self.stats.suggestions += 1
+                self._spawn(self._review(message, self.reaction_time.sample(self.rng)))
+
+    @property
+    def planning_turn(self) -> int:
+        """Turn of the current planning phase, or of the next one during the adjudication."""
+        return self.turn if self.phase == "planning" else self.turn + 1
+
+    def _send(self, message: dict, turn: int) -> None:
+        # (the outcome of the posts is in the results of the game)
+        if (self.turn, self.phase) != (turn, "planning"):
+            self.stats.late += 1
+        self.game.send_message(message)
+
+    async def _review(self, suggestion: dict, reaction_time: float) -> None:
+        turn = self.planning_turn
+        await asyncio.sleep(reaction_time * self.time_scale)
+        action = self.rng.choices(DECISIONS, weights=self.decision_weights)[0]
+        message = deepcopy(suggestion)
+        collaboration = message["details"]["collaboration"]
+        if action == "Amend":
+            weapon = WEAPONS[1 - WEAPONS.index(message["message"]["Weapon"])]
+            message["message"]["Weapon"] = weapon
+            message["message"]["Title"] = f"{message['message']['Title'].rsplit(':', 1)[0]}: {weapon}"
+            feedback = self._feedback(action, f"using {weapon} instead")
+        else:
+            feedback = self._feedback(action, f"{'released' if action == 'Release' else 'rejected'} as suggested")
+        collaboration["status"] = "Rejected" if action == "Reject" else "Released"
+        collaboration["feedback"] = collaboration.get("feedback", []) + [feedback]
+        self._send(message, turn)
+        self.stats.reaction_times.append(reaction_time)
+        if action == "Release":
+            self.stats.released += 1
+        elif action == "Amend":
+            self.stats.amended += 1
+        else:
+            self.stats.rejected += 1
+
+    async def _assign_manually(self, reaction_time: float) -> None:
+        turn = self.planning_turn
+        await asyncio.sleep(reaction_time * self.time_scale)
+        if not self.threats:
+            return
+        threat_id = self.rng.choice(sorted(self.threats))
+        threat = self.threats[threat_id]
+        weapon = self.rng.choice(WEAPONS)
+        message = WA_MESSAGE()
+        message["details"]["channel"] = self.channel
+        message["details"]["from"] = self.sender
+        message["details"]["collaboration"] = {
+            "status": "Released",
+            "feedback": [self._feedback("Release", "manual assignment")],
+        }
+        message["message"] = {
+            "Threat": {
+                "Detected type": threat.get("Detected type"),
+                "Expected ETA": threat.get("Expected ETA"),
+                "ID": threat_id,
+                "Ship Targeted": threat.get("Ship Targeted"),
+                "Velocity": threat.get("Velocity"),
+            },
+            "Title": f"({turn}) {threat_id}: {weapon}",
+            "Weapon": weapon,
+        }
+        self._send(message, turn)
+        self.stats.manual += 1
+
+    async def run(self) -> None:
+        """Play until cancelled. The pending reactions are cancelled with the bot."""
+        try:
+            while True:
+                self.observe(await self.wait_strategy.next_messages_async(self.game))
+        finally:
+            for task in list(self._tasks):
+                task.cancel()
@@ -0,0 +1,129 @@
+# Copyright 2024 The Johns Hopkins University Applied Physics Laboratory LLC
+# All rights reserved.
+#
+# Licensed under the 3-Clause BSD License (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://opensource.org/licenses/BSD-3-Clause
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Union
+from warnings import warn
+
+import numpy as np
+
+from .utils import atomic_write
+
+RING_RESOLUTION = 16  # segments per quarter circle of the rings (as the buffers of shapely)
+# directory of the rings cached on disk, shared by the runners of all the games
+DEFAULT_CACHE_DIR = Path(os.environ.get("TESTBED4HAT_CACHE_DIR", Path.home() / ".cache" / "testbed4hat"))
+
+WGS84_SEMI_MAJOR_AXIS = 6378137.0  # in meters
+WGS84_FLATTENING = 1 / 298.257223563
+
+
+def great_circle_ring(lat: float, lon: float, radius: float, resolution: int = RING_RESOLUTION) -> np.ndarray:
+    """
+    Polygon of the points at a distance from a center, computed all at once: the destinations of great circles on
+    the sphere osculating the WGS84 ellipsoid east-west at the center, with the north-south offsets scaled to the
+    meridian curvature (the points are within a meter of the geodesic ring up to 50 km).
+    :param lat: (float) Latitude of the center, in degrees.
+    :param lon: (float) Longitude of the center, in degrees.
+    :param radius: (float) Radius of the ring, in meters.
+    :param resolution: (int) Number of segments per quarter circle.
+    :return: (np.ndarray) The [long, lat] coordinates of the (closed) ring, as an array of shape (4 * resolution + 1,
+        2), clockwise from the east (as geodesic_point_buffer).
+    """
+    e2 = WGS84_FLATTENING * (2 - WGS84_FLATTENING)
+    lat_0, lon_0 = np.radians(lat), np.radians(lon)
+    w = np.sqrt(1 - e2 * np.sin(lat_0) ** 2)
+    prime_vertical_radius = WGS84_SEMI_MAJOR_AXIS / w
+    meridian_radius = WGS84_SEMI_MAJOR_AXIS * (1 - e2) / w ** 3
+
+    azimuths = np.pi / 2 + np.arange(4 * resolution + 1) * np.pi / (2 * resolution)
+    angle = radius / prime_vertical_radius
+    lats = np.arcsin(np.sin(lat_0) * np.cos(angle) + np.cos(lat_0) * np.sin(angle) * np.cos(azimuths))
+    lons = lon_0 + np.arctan2(
+        np.sin(azimuths) * np.sin(angle) * np.cos(lat_0), np.cos(angle) - np.sin(lat_0) * np.sin(lats)
+    )
+    lats = lat_0 + (lats - lat_0) * prime_vertical_radius / meridian_radius
+    ring = np.degrees(np.column_stack((lons, lats)))
+    ring[-1] = ring[0]
+    return ring
+
+
+def geodesic_point_buffer(lat: float, lon: float, radius: float, resolution: int = RING_RESOLUTION) -> np.ndarray:
+    """
+    Exact polygon of the points at a distance from a center, buffering the center in its azimuthal equidistant
+    projection (this imports pyproj and shapely, which are slow to import).
+    Adapted from: https://gis.stackexchange.com/questions/121256/creating-a-circle-with-radius-in-metres
+    :param lat: (float) Latitude of the center, in degrees.
+    :param lon: (float) Longitude of the center, in degrees.
+    :param radius: (float) Radius of the ring, in meters.
+    :param resolution: (int) Number of segments per quarter circle.
+    :return: (np.ndarray) The [long, lat] coordinates of the (closed) ring, as an array of shape (4 * resolution + 1,
+        2).
+    """
+    from pyproj import CRS, Transformer
+    from shapely.geometry import Point
+
+    aeqd_proj = CRS.from_proj4(f"+proj=aeqd +lat_0={lat} +lon_0={lon} +x_0=0 +y_0=0")
+    tfmr = Transformer.from_proj(aeqd_proj, aeqd_proj.geodetic_crs)
+    buf = np.array(Point(0, 0).buffer(radius, quad_segs=resolution).exterior.coords)  # distance in metres
+    return np.column_stack(tfmr.transform(buf[:, 0], buf[:, 1]))
+
+
+def _cache_file(cache_dir: Path, key: list) -> Path:
+    return cache_dir / f"ring-{hashlib.sha1(json.dumps(key).encode()).hexdigest()[:20]}.json"
+
+
+def range_ring(
+    lat: float,
+    lon: float,
+    radius: float,
+    resolution: int = RING_RESOLUTION,
+    exact: bool = False,
+    cache_dir: Union[str, Path, None] = DEFAULT_CACHE_DIR,
+) -> list[list[float]]:
+    """
+    Polygon of a range ring, for the Serge map. Rings are cached on disk, keyed by (lat, lon, radius, resolution),
+    so that they are computed once across the games and restarts of the runners.
+    :param lat: (float) Latitude of the center, in degrees.
+    :param lon: (float) Longitude of the center, in degrees.
+    :param radius: (float) Radius of the ring, in meters.
+    :param resolution: (int) Number of segments per quarter circle.
+    :param exact: (bool) Whether to compute the ring with pyproj and shapely (see geodesic_point_buffer), rather than
+        the great circles of great_circle_ring.
+    :param cache_dir: (str | Path | None) Directory of the cached rings, None not to cache them.
+    :return: (list[list[float]]) The [long, lat] coordinates of the (closed) ring.
+    """
+    key = ["geodesic" if exact else "great_circle", float(lat), float(lon), float(radius), int(resolution)]
+    path = None if cache_dir is None else _cache_file(Path(cache_dir), key)
+    if path is not None and path.exists():
+        try:
+            cached = json.loads(path.read_text())
+            if cached["key"] == key:
+                return cached["ring"]
+        except (OSError, ValueError, KeyError):
+            pass  # (computed and cached again)
+
+    compute = geodesic_point_buffer if exact else great_circle_ring
+    ring = compute(lat, lon, radius, resolution).tolist()
+    if path is not None:
+        try:
+            # (so that concurrent runners never read a partial ring)
+            with atomic_write(path) as f:
+                json.dump({"key": key, "ring": ring}, f)
+        except OSError as e:
+            warn(f"Range ring not cached in {cache_dir}: {e}")
+    return ring
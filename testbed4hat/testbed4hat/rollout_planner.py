@@ -0,0 +1,266 @@
+# Copyright 2024 The Johns Hopkins University Applied Physics Laboratory LLC
+# All rights reserved.
+#
+# Licensed under the 3-Clause BSD License (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://opensource.org/licenses/BSD-3-Clause
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import copy
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from typing import Any, Iterator, Union
+
+import numpy as np
+
+from .agents import make_agent
+from .hat_env import HatEnv
+from .hat_env_config import HatEnvConfig, FrozenHatEnvConfig
+
+# (agent name, agent parameters) of the agents proposing the candidate actions, besides the base policy
+DEFAULT_CANDIDATE_AGENTS = (
+    ("wta", {}),
+    ("wta", {"objective": "survival"}),
+    ("heuristic", {"threshold": 0.6}),
+)
+
+# env and base policy of a worker process, set by <_init_worker>
+_worker_env: Union[HatEnv, None] = None
+_worker_policy: Any = None
+
+
+def _planning_config(config: HatEnvConfig) -> HatEnvConfig:
+    """Copy of the config for the environments used for rollouts, which never render nor print."""
+    if isinstance(config, FrozenHatEnvConfig):
+        return config.replace(render_env=False, verbose=False)
+    config = copy.copy(config)
+    config.render_env = False
+    config.verbose = False
+    return config
+
+
+def _init_worker(config: HatEnvConfig, base_policy: str, base_policy_params: dict) -> None:
+    global _worker_env, _worker_policy
+    _worker_env = HatEnv(config)
+    _worker_env.reset()
+    _worker_policy = make_agent(base_policy, config, **base_policy_params)
+
+
+def _worker_rollout(snapshot: dict, actions: list, seed: int, horizon: int) -> float:
+    return rollout(_worker_env, _worker_policy, snapshot, actions, seed, horizon)
+
+
+def rollout(env: HatEnv, policy, snapshot: dict, actions: list, seed: int, horizon: int) -> float:
+    """
+    Play <actions> from a snapshot, then follow the policy, and return the sum of the rewards.
+    :param env: (HatEnv) The environment to roll out in (its state is overwritten).
+    :param policy: The base policy, with a heuristic_action(obs) method.
+    :param snapshot: (dict) The state to start from, from HatEnv.get_state.
+    :param actions: (list) Actions of the first step.
+    :param seed: (int) Seed of all the randomness of the rollout (weapon and threat outcomes, new threats). Rollouts of
+        different candidates with the same seed use common random numbers, so their returns can be compared with much
+        fewer seeds.
+    :param horizon: (int) Number of steps of the rollout, the first one included.
+    :return: (float) The return of the rollout.
+    """
+    env.set_state(snapshot)
+    np.random.seed(seed)
+    env.rng.seed(seed)  # shared by the ships and weapons
+    env.generator.rng = np.random.default_rng(seed)
+
+    total_reward = 0.
+    for _ in range(horizon):
+        obs, reward, terminated, truncated, info = env.step(actions)
+        total_reward += float(reward)
+        if terminated or truncated:
+            break
+        actions = policy.heuristic_action(obs)
+    return total_reward
+
+
+class PlanResult:
+    def __init__(self, actions: list, candidates: list[list], mean_returns: list[Union[float, None]],
+                 num_rollouts: int, completed: float, elapsed_time: float):
+        """
+        Result of a planning step.
+        :param actions: (list) The best candidate actions.
+        :param candidates: (list[list]) The candidate actions evaluated, the base policy actions first.
+        :param mean_returns: (list) Mean return of each candidate over the seeds rolled out for all candidates (None
+            for all candidates if no seed completed within the budget).
+        :param num_rollouts: (int) Number of rollouts completed.
+        :param completed: (float) Fraction of the rollouts completed.
+        :param elapsed_time: (float) Wall-clock planning time, in seconds.
+        """
+        self.actions = actions
+        self.candidates = candidates
+        self.mean_returns = mean_returns
+        self.num_rollouts = num_rollouts
+        self.completed = completed
+        self.elapsed_time = elapsed_time
+
+
+class RolloutPlanner:
+    """
+    Lookahead planner for the HAT environment. Candidate action sets for the current step are proposed by several
+    agents (plus holding fire), and each one is evaluated by rolling it out from a snapshot of the environment for
+    <horizon> steps under a base policy, averaged over seeds with common random numbers. The rollouts run in a
+    persistent process pool, and planning returns the best candidate found within a wall-clock budget (falling back on
+    the base policy actions).
+    """
+    def __init__(self, config: HatEnvConfig, base_policy: str = "heuristic", base_policy_params: dict = None,
+                 candidate_agents=DEFAULT_CANDIDATE_AGENTS, horizon: int = 3, num_seeds: int = 8,
+                 time_budget: float = 3.0, max_workers: int = None, seed: int = 0):
+        """
+        :param config: (HatEnvConfig) Config of the environment to plan in.
+        :param base_policy: (str) Name of the registered agent followed after the first step of the rollouts.
+        :param base_policy_params: (dict) Parameters of the base policy.
+        :param candidate_agents: (Iterable) (name, parameters) of the registered agents proposing candidate actions,
+            besides the base policy.
+        :param horizon: (int) Number of steps of each rollout.
+        :param num_seeds: (int) Number of rollouts of each candidate.
+        :param time_budget: (float) Default wall-clock planning budget, in seconds.
+        :param max_workers: (int) Number of worker processes. None uses one per CPU, 0 runs the rollouts in this
+            process.
+        :param seed: (int) Seed of the rollout seeds.
+        """
+        self.config = _planning_config(config)
+        self.base_policy_name = base_policy
+        self.base_policy_params = base_policy_params or {}
+        self.base_policy = make_agent(base_policy, self.config, **self.base_policy_params)
+        self.candidate_agents = [make_agent(name, self.config, **params) for name, params in candidate_agents]
+        self.horizon = horizon
+        self.num_seeds = num_seeds
+        self.time_budget = time_budget
+        self.max_workers = max_workers
+        self.rng = np.random.default_rng(seed)
+
+        self._env = None
+        self._executor = None
+        if self.max_workers == 0:
+            self._env = HatEnv(self.config)
+            self._env.reset()
+            self._rollout_policy = make_agent(base_policy, self.config, **self.base_policy_params)
+        else:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_worker,
+                                                 initargs=(self.config, base_policy, self.base_policy_params))
+
+    def candidates(self, observation: dict) -> list[list]:
+        """Get the distinct candidate actions for an observation: base policy first, then other agents, then none."""
+        candidates = [self.base_policy.heuristic_action(observation)]
+        candidates += [agent.heuristic_action(observation) for agent in self.candidate_agents]
+        candidates.append([])  # hold fire
+        unique = []
+        for actions in candidates:
+            actions = [(int(s), int(w), str(t)) for s, w, t in actions]
+            if actions not in unique:
+                unique.append(actions)
+        return unique
+
+    def plan(self, env: HatEnv, observation: dict, time_budget: float = None) -> PlanResult:
+        """
+        Choose the actions of the current step.
+        :param env: (HatEnv) The environment, in the state <observation> was observed in. It is not modified.
+        :param observation: (dict) The current observation.
+        :param time_budget: (float) Wall-clock budget in seconds (default: the planner's <time_budget>).
+        :return: (PlanResult) The best actions and the planning statistics.
+        """
+        deadline = time.perf_counter() + (self.time_budget if time_budget is None else time_budget)
+        result = None
+        for result in self.iter_plan(env, observation, deadline):
+            pass
+        return result
+
+    def iter_plan(self, env: HatEnv, observation: dict, deadline: float = None) -> Iterator[PlanResult]:
+        """
+        Plan the actions of the current step, yielding the best-known result each time rollouts complete, starting
+        with the base policy actions before any rollout.
+        :param env: (HatEnv) The environment, in the state <observation> was observed in. It is not modified.
+        :param observation: (dict) The current observation.
+        :param deadline: (float) time.perf_counter() value after which no more rollouts are started (None to run all
+            the rollouts).
+        :return: (Iterator[PlanResult]) The successive results.
+        """
+        start = time.perf_counter()
+        candidates = self.candidates(observation)
+        snapshot = env.get_state()
+        seeds = [int(s) for s in self.rng.integers(0, 2 ** 31 - 1, size=self.num_seeds)]
+        returns = np.full((len(candidates), len(seeds)), np.nan)
+        yield self._result(candidates, returns, start)
+        if len(candidates) == 1:
+            return
+
+        if self._executor is None:
+            batches = self._rollouts_in_process(snapshot, candidates, seeds, deadline)
+        else:
+            batches = self._rollouts_in_pool(snapshot, candidates, seeds, deadline)
+        try:
+            for batch in batches:
+                for index, value in batch:
+                    returns[index] = value
+                yield self._result(candidates, returns, start)
+        finally:
+            batches.close()
+
+    @staticmethod
+    def _result(candidates: list[list], returns: np.ndarray, start: float) -> PlanResult:
+        # compare candidates on the seeds all of them were rolled out with (common random numbers)
+        common_seeds = ~np.any(np.isnan(returns), axis=0)
+        if np.any(common_seeds):
+            mean_returns = returns[:, common_seeds].mean(axis=1)
+            best = int(np.argmax(mean_returns))  # ties go to the base policy, which is first
+            mean_returns = [float(r) for r in mean_returns]
+        else:
+            best = 0
+            mean_returns = [None] * len(candidates)
+        num_rollouts = int(np.sum(~np.isnan(returns)))
+        completed = 1. if len(candidates) == 1 else num_rollouts / returns.size
+        return PlanResult(candidates[best], candidates, mean_returns, num_rollouts, completed,
+                          time.perf_counter() - start)
+
+    def _rollouts_in_process(self, snapshot, candidates, seeds, deadline) -> Iterator[list]:
+        for j, seed in enumerate(seeds):
+            for i, actions in enumerate(candidates):
+                if deadline is not None and time.perf_counter() >= deadline:
+                    return
+                # the rollouts reseed the global numpy generator, which the real environment also uses
+                np_random_state = np.random.get_state()
+                try:
+                    value = rollout(self._env, self._rollout_policy, snapshot, actions, seed, self.horizon)
+                finally:
+                    np.random.set_state(np_random_state)
+                yield [((i, j), value)]
+
+    def _rollouts_in_pool(self, snapshot, candidates, seeds, deadline) -> Iterator[list]:
+        # submitted seed by seed, so that the completed rollouts cover the same seeds for all candidates
+        futures = {self._executor.submit(_worker_rollout, snapshot, actions, seed, self.horizon): (i, j)
+                   for j, seed in enumerate(seeds) for i, actions in enumerate(candidates)}
+        pending = set(futures)
+        try:
+            while pending:
+                remaining = None if deadline is None else deadline - time.perf_counter()
+                if remaining is not None and remaining <= 0:
+                    break
+                done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+                yield [(futures[future], future.result()) for future in done]
+        finally:
+            for future in pending:
+                future.cancel()  # rollouts already running finish in the background and are ignored
+
+    def close(self) -> None:
+        """Shut down the worker processes."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -1,10 +1,364 @@
+from collections import Counter
+from contextlib import contextmanager
 from datetime import date, datetime, time, timedelta, UTC
+import asyncio
+import codecs
+from concurrent.futures import ThreadPoolExecutor
 import json
+import math
+import random
+import threading
+import time as clock
+from typing import TYPE_CHECKING, Iterable, Iterator
+from warnings import warn
+
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
 
+if TYPE_CHECKING:
+    from .message_journal import MessageJournal
+    from .phase_timers import PhaseTimers
 
 # Time to wait for a request to Serge to complete
 TIMEOUT = 15  # seconds
+CONNECT_TIMEOUT = 3.05  # seconds, slightly above a multiple of the 3-second TCP retransmission window
+# Time a change feed request waits for new messages, below the 30-second request timeout of the Heroku routers
+CHANGE_FEED_TIMEOUT = 25  # seconds
+# Max number of messages posted in one bulk request
+MAX_BULK_SIZE = 50
+# HTTP status codes worth retrying (the server is overloaded or restarting, e.g. a Heroku dyno waking up)
+RETRY_STATUS_CODES = frozenset({429, 502, 503, 504})
+# Size of the chunks of the responses parsed as they arrive
+STREAM_CHUNK_SIZE = 64 * 1024  # bytes
+JSON_WHITESPACE = " \t\n\r"
+JSON_NUMBER_CHARACTERS = "0123456789+-.eE"
+
+
+class _JSONStreamReader:
+    """Incremental reader of JSON values from a stream of text or UTF-8 chunks."""
+    _decoder = json.JSONDecoder()
+
+    def __init__(self, chunks: Iterable[bytes | str]):
+        self._chunks = iter(chunks)
+        self._decode = codecs.getincrementaldecoder("utf-8")().decode
+        self.buffer = ""
+        self.pos = 0  # position of the next character to parse in the buffer
+        self.exhausted = False
+
+    def _read(self) -> bool:
+        if self.exhausted:
+            return False
+        chunk = next(self._chunks, None)
+        if self.pos >= len(self.buffer) // 2:
+            # drop the parsed text (at most as much as is kept, so that the copies take linear time overall)
+            self.buffer, self.pos = self.buffer[self.pos:], 0
+        if chunk is None:
+            self.exhausted = True
+            self.buffer += self._decode(b"", final=True)
+            return False
+        self.buffer += self._decode(chunk) if isinstance(chunk, bytes) else chunk
+        return True
+
+    def _read_more(self) -> bool:
+        # read until the text left to parse doubled, so that a value spanning many chunks is parsed in linear time
+        wanted = 2 * (len(self.buffer) - self.pos) + 1
+        read = False
+        while len(self.buffer) - self.pos < wanted and self._read():
+            read = True
+        return read
+
+    def peek(self) -> str:
+        """Next non-whitespace character ("" at the end of the stream)."""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in JSON_WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._read():
+                return ""
+
+    def expect(self, characters: str) -> str:
+        character = self.peek()
+        if not character or character not in characters:
+            raise ValueError(f"Expected one of {characters!r} in the JSON stream, got {character!r}")
+        self.pos += 1
+        return character
+
+    def value(self):
+        """Parse the next JSON value."""
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if not self._read_more():
+                    raise
+                continue
+            if isinstance(value, (int, float)) and not self.buffer[end:].strip(JSON_NUMBER_CHARACTERS):
+                if self._read_more():
+                    continue  # the number may go on in the next chunk
+            self.pos = end
+            return value
+
+
+def iter_json_items(chunks: Iterable[bytes | str], key: str | None = "data") -> Iterator:
+    """
+    Parse the items of a JSON array one at a time, as the chunks of the document arrive, so that neither the whole
+    document nor the whole array is held in memory.
+    :param chunks: (Iterable[bytes | str]) The document, in chunks of text or UTF-8 bytes.
+    :param key: (str | None) Key of the array in the top-level object (e.g. the "data" of the responses of Serge),
+        None if the array is the document.
+    :return: (Iterator) The items of the array (none if the key is missing or its value is null).
+    :raises ValueError: if the document is not valid JSON, or of another structure.
+    """
+    reader = _JSONStreamReader(chunks)
+    if key is not None:
+        reader.expect("{")
+        while True:
+            if reader.peek() == "}":
+                return  # no such key
+            name = reader.value()
+            reader.expect(":")
+            if name == key:
+                break
+            reader.value()  # skip the other values
+            if reader.expect(",}") == "}":
+                return
+        if reader.peek() != "[":
+            if reader.value() is None:
+                return
+            raise ValueError(f"The value of {key!r} in the JSON stream is not an array")
+    reader.expect("[")
+    if reader.peek() == "]":
+        return
+    while True:
+        yield reader.value()
+        if reader.expect(",]") == "]":
+            return
+
+
+def content_key(message: dict) -> str:
+    """The content of a message, without the metadata set when it is sent (id, revision, timestamps, turn number)."""
+    details = {k: v for k, v in message.get("details", {}).items() if k not in ("timestamp", "turnNumber")}
+    if "collaboration" in details:
+        details["collaboration"] = {k: v for k, v in details["collaboration"].items() if k != "lastUpdated"}
+    content = {k: v for k, v in message.items() if k not in ("_id", "_rev")}
+    content["details"] = details
+    return json.dumps(content, sort_keys=True)
+
+
+class DocumentTemplate:
+    """
+    Template of the JSON documents posted to Serge (messages, map features), compiled into a function building a
+    fresh copy of it: the template as a Python literal, so that a copy is built by the interpreter directly, without
+    the type dispatch and memo of deepcopy (an order of magnitude faster). The copies share nothing with the template
+    or with each other, and may be modified freely.
+    Usage:
+        THREAT_FEATURE = DocumentTemplate(THREAT_TEMPLATE)
+        feature = THREAT_FEATURE()  # as deepcopy(THREAT_TEMPLATE)
+    """
+    def __init__(self, template: dict):
+        """
+        :param template: (dict) The template, of JSON types (dict with str keys, list, tuple, str, int, float, bool
+            and None). It is compiled as is: later changes to it are not reflected in the copies.
+        """
+        self.template = template
+        self.build = eval(f"lambda: {self._literal(template)}", {})  # a function, so that the literal is compiled once
+
+    @classmethod
+    def _literal(cls, value) -> str:
+        if isinstance(value, dict):
+            if not all(isinstance(key, str) for key in value):
+                raise TypeError("Document templates must have str keys")
+            return "{" + ", ".join(f"{key!r}: {cls._literal(item)}" for key, item in value.items()) + "}"
+        if isinstance(value, list):
+            return "[" + ", ".join(cls._literal(item) for item in value) + "]"
+        if isinstance(value, tuple):
+            return "(" + "".join(f"{cls._literal(item)}, " for item in value) + ")"
+        if isinstance(value, float) and not math.isfinite(value):
+            raise ValueError(f"Document templates must have finite numbers, not {value}")
+        if value is None or type(value) in (str, int, float, bool):
+            return repr(value)
+        raise TypeError(f"Unsupported type in a document template: {type(value).__name__}")
+
+    def __call__(self) -> dict:
+        return self.build()
+
+
+class TransportMetrics:
+    def __init__(self):
+        """Counters of the HTTP traffic of a SergeTransport."""
+        self.requests = 0  # calls to SergeTransport.request
+        self.attempts = 0  # HTTP requests sent, including retries
+        self.retries = 0
+        self.failures = 0  # calls that failed after all the retries
+        self.new_connections = 0  # connections opened by the pool (the other attempts reused a kept-alive one)
+        self.total_time = 0.  # seconds spent in requests, including the backoff
+
+    @property
+    def reused_connections(self) -> int:
+        return max(0, self.attempts - self.new_connections)
+
+    @property
+    def reuse_ratio(self) -> float:
+        """Fraction of the HTTP requests sent over a kept-alive connection."""
+        return self.reused_connections / self.attempts if self.attempts else 0.
+
+    def as_dict(self) -> dict:
+        return {
+            "requests": self.requests,
+            "attempts": self.attempts,
+            "retries": self.retries,
+            "failures": self.failures,
+            "new_connections": self.new_connections,
+            "reused_connections": self.reused_connections,
+            "total_time": round(self.total_time, 4),
+        }
+
+    def __str__(self):
+        return (f"{self.requests} requests ({self.retries} retries, {self.failures} failures), "
+                f"{self.new_connections} connections opened, {self.reuse_ratio:.0%} reused, {self.total_time:.2f} s")
+
+
+class SergeTransport:
+    """
+    HTTP transport to a Serge server: a pooled, kept-alive requests.Session, with per-call timeouts and retries with
+    jittered exponential backoff.
+    Idempotent calls (GET) are retried on connection errors, timeouts and RETRY_STATUS_CODES. Other calls are only
+    retried when the connection could not be established, i.e. when the server never received the request.
+    """
+    def __init__(self, pool_size: int = 10, max_retries: int = 3, backoff_factor: float = 0.25,
+                 backoff_max: float = 4., timeout: float = TIMEOUT, connect_timeout: float = CONNECT_TIMEOUT,
+                 seed: int = None):
+        """
+        :param pool_size: (int) Max number of kept-alive connections per host.
+        :param max_retries: (int) Max number of retries of a call.
+        :param backoff_factor: (float) The n-th retry waits a random time in [0, backoff_factor * 2 ** n] seconds.
+        :param backoff_max: (float) Max wait between two attempts, in seconds.
+        :param timeout: (float) Default time to wait for the server to respond, in seconds.
+        :param connect_timeout: (float) Time to wait for a connection to be established, in seconds.
+        :param seed: (int) Seed of the backoff jitter.
+        """
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.metrics = TransportMetrics()
+        self._lock = threading.Lock()
+        self._rng = random.Random(seed)
+
+        # retries are handled by <request>, so that they are jittered and counted
+        self._adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session = requests.Session()
+        self.session.mount("http://", self._adapter)
+        self.session.mount("https://", self._adapter)
+        self.session.headers.update({"Connection": "keep-alive"})
+
+    def backoff_time(self, retry: int) -> float:
+        """Time to wait before the <retry>-th retry (0-based), with full jitter."""
+        return self._rng.uniform(0., min(self.backoff_max, self.backoff_factor * 2 ** retry))
+
+    @staticmethod
+    def _not_sent(error: requests.exceptions.RequestException) -> bool:
+        """Whether the request failed before reaching the server, i.e. no connection could be established."""
+        if isinstance(error, requests.exceptions.ConnectTimeout):
+            return True
+        reason = getattr(error.args[0], "reason", None) if error.args else None
+        return isinstance(reason, NewConnectionError)
+
+    def _record(self, **increments) -> None:
+        # the transport may be shared by several threads (see AsyncSergeGame)
+        with self._lock:
+            for name, value in increments.items():
+                setattr(self.metrics, name, getattr(self.metrics, name) + value)
+
+    def _count_connections(self) -> int:
+        pools = self._adapter.poolmanager.pools
+        return sum(pools[key].num_connections for key in pools.keys())
+
+    def request(self, method: str, url: str, idempotent: bool = None, timeout: float = None,
+                **kwargs) -> requests.Response:
+        """
+        Send an HTTP request, retrying it on transient failures.
+        :param method: (str) The HTTP method.
+        :param url: (str) The URL.
+        :param idempotent: (bool) Whether the call can be safely repeated (default: True for GET requests only).
+        :param timeout: (float) Time to wait for the server to respond, in seconds (default: self.timeout).
+        :param kwargs: Arguments of requests.Session.request.
+        :return: (requests.Response) The last response, whose status is not checked.
+        :raises requests.exceptions.RequestException: if the last attempt failed to get a response.
+        """
+        if idempotent is None:
+            idempotent = method.upper() == "GET"
+        timeout = (self.connect_timeout, self.timeout if timeout is None else timeout)
+        self._record(requests=1)
+        start = clock.perf_counter()
+        try:
+            for retry in range(self.max_retries + 1):
+                last_attempt = retry == self.max_retries
+                self._record(attempts=1)
+                try:
+                    response = self.session.request(method, url, timeout=timeout, **kwargs)
+                except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                    if last_attempt or not (idempotent or self._not_sent(e)):
+                        raise
+                else:
+                    if not idempotent or last_attempt or response.status_code not in RETRY_STATUS_CODES:
+                        return response
+                    response.close()
+                self._record(retries=1)
+                clock.sleep(self.backoff_time(retry))
+        except requests.exceptions.RequestException:
+            self._record(failures=1)
+            raise
+        finally:
+            self._record(total_time=clock.perf_counter() - start)
+            with self._lock:
+                self.metrics.new_connections = self._count_connections()
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def put(self, url: str, **kwargs) -> requests.Response:
+        return self.request("PUT", url, **kwargs)
+
+    def close(self) -> None:
+        self.session.close()
+
+
+class SergeOutbox:
+    def __init__(self, game: "SergeGame", max_batch_size: int = MAX_BULK_SIZE):
+        """
+        Messages of a SergeGame waiting to be posted together (see SergeGame.batch).
+        :param game: (SergeGame) The game the messages are posted to.
+        :param max_batch_size: (int) Max number of messages per bulk request.
+        """
+        self.game = game
+        self.max_batch_size = max_batch_size
+        self.ids: list[str] = []
+        self.documents: list[str] = []  # messages serialized when queued, later changes to them are not sent
+        self.channels: set[str] = set()  # channels of the queued messages
+        self.results: dict[str, bool] = {}  # whether each flushed message was accepted, by message id
+
+    def __len__(self):
+        return len(self.documents)
+
+    def add(self, msg_id: str, data: str, channel: str = None) -> None:
+        self.ids.append(msg_id)
+        self.documents.append(data)
+        self.channels.add(channel)
+
+    def flush(self) -> list[bool]:
+        """Post the queued messages, and return whether each of them was accepted."""
+        results = []
+        for i in range(0, len(self.documents), self.max_batch_size):
+            results += self.game._send_prepared(self.ids[i:i + self.max_batch_size],
+                                                self.documents[i:i + self.max_batch_size])
+        self.results.update(zip(self.ids, results))
+        self.ids, self.documents, self.channels = [], [], set()
+        return results
 
 
 class SergeGame:
@@ -25,11 +379,36 @@ class SergeGame:
     }
     MAPPING_WEAPON = {0: "None", 1: "Short Range", 2: "Long Range"}
 
-    def __init__(self, game_id: str, server_url: str = "https://serge-inet.herokuapp.com"):
+    def __init__(self, game_id: str, server_url: str = "https://serge-inet.herokuapp.com",
+                 transport: SergeTransport = None, journal: "MessageJournal" = None):
+        """
+        :param game_id: (str) The game id.
+        :param server_url: (str) The Serge server URL.
+        :param transport: (SergeTransport) The HTTP transport (default: a new one). A transport given is shared, e.g.
+            by the games of a GameHost, and not closed with the game.
+        :param journal: (MessageJournal) Local journal of the game messages, so that none is downloaded twice (see
+            <sync_journal>). None to download the messages on each request.
+        """
         self.url = server_url
         self.game_id = game_id
         self.last_msg_id = None
         self.api_endpoint = f"{self.url}/{self.game_id}"
+        # all the requests to the server share a pool of kept-alive connections
+        self.transport = SergeTransport() if transport is None else transport
+        self._owns_transport = transport is None
+        self.journal = journal
+        self._sync_lock = threading.Lock()
+
+        self.bulk_endpoint = f"{self.url}/bulkDocs/{self.game_id}"
+        self.bulk_supported = True  # set to False when the server has no bulk endpoint
+        self.changes_supported = True  # set to False when the server has no change feed
+        self._outbox: SergeOutbox | None = None
+        self._last_timestamp: datetime | None = None
+        self._timestamp_lock = threading.Lock()  # (the messages of an AsyncSergeGame are stamped by its threads)
+        # observes the time to post each message or bulk request as "send" (e.g. the timers of a runner), if set
+        self.timers: "PhaseTimers | None" = None
+        # content of the messages sent before (e.g. by a crashed client), not sent again (see skip_sent)
+        self.sent_before: Counter[str] = Counter()
 
         # initialize the game state
         self.turn_number: int = 0
@@ -38,25 +417,93 @@ class SergeGame:
 
     def get_new_messages(self) -> list[dict]:
         new_messages = self.get_messages(since_msg_id=self.last_msg_id)
+        self._update_last_message(new_messages)
+        return new_messages
+
+    def _update_last_message(self, new_messages: list[dict]) -> None:
         if new_messages:
             self.last_msg_id = new_messages[-1]["_id"]
             self._update_game_turn(new_messages)
+
+    def wait_for_messages(self, timeout: float = CHANGE_FEED_TIMEOUT) -> list[dict] | None:
+        """
+        Wait for new messages on the change feed of the game: GET {game}/changes?since=<last id>&timeout=<ms> responds
+        as soon as there are messages newer than the last one received, or with none after the timeout. Servers
+        without a change feed respond 404, after which <changes_supported> is False.
+        Note: the change feed is not part of the Serge API (see serge-api), only the stand-in serves it (see
+        serge_server.py).
+        :param timeout: (float) Max time the server waits for new messages, in seconds.
+        :return: (list[dict] | None) The new messages, None if the request failed (or its response has no messages).
+        """
+        if self.journal is not None:
+            # messages already journaled (e.g. by <get_messages>) are not requested again
+            journaled = self.journal.read(self.game_id, after=self.last_msg_id)
+            if journaled:
+                self._update_last_message(journaled)
+                return journaled
+        params = {"timeout": int(timeout * 1000)}
+        if self.last_msg_id:
+            params["since"] = self.last_msg_id
+        url = f"{self.api_endpoint}/changes"
+        try:
+            response = self.transport.get(url, params=params, timeout=timeout + TIMEOUT)
+        except requests.exceptions.RequestException as e:
+            print(f"Request to {url} failed: {e}")
+            return None
+        if response.status_code == 404:
+            self.changes_supported = False
+            return None
+        if not response.ok:
+            print(f"Request to {url} failed: {response.status_code}")
+            return None
+        try:
+            data = response.json()["data"]
+        except (requests.exceptions.RequestException, ValueError, KeyError, TypeError) as e:
+            print(f"Request to {url} failed: unexpected response ({e!r})")
+            return None
+        if not isinstance(data, list):
+            print(f"Request to {url} failed: no messages in the response")
+            return None
+        new_messages = [m for m in data if m["_id"] != "initial_wargame"]
+        if self.journal is not None:
+            self.journal.append(self.game_id, new_messages)
+        self._update_last_message(new_messages)
         return new_messages
 
     def get_messages(self, since_msg_id: str = None) -> list[dict]:
         """
-        Retrieve new messages from the game server.
+        Retrieve new messages from the game server (from the journal, if any, for those already downloaded).
         Note: the "initial_wargame" message will be discarded (last in the list).
         """
-        if since_msg_id:
-            # Get the last document or documents since a specific ID
-            messages = self._get_messages_since_id(since_msg_id)
-        else:
-            # Retrieve all message documents for the specified wargame.
-            messages = self._get_wargame()
-        if messages and messages[-1]["_id"] == "initial_wargame":
-            messages = messages[:-1]  # remove the initial war game definition message
-        return messages
+        if self.journal is not None:
+            self.sync_journal()
+            return self.journal.read(self.game_id, after=since_msg_id)
+        return list(self._stream_messages(since_msg_id))
+
+    def iter_messages(self, since_msg_id: str = None) -> Iterator[dict]:
+        """
+        Streaming version of <get_messages>: the messages are parsed one at a time as they are downloaded (or read
+        from the journal, after syncing it), for consumers processing them in order (e.g. long game histories).
+        """
+        if self.journal is not None:
+            self.sync_journal()
+            return self.journal.iter_messages(self.game_id, after=since_msg_id)
+        return self._stream_messages(since_msg_id)
+
+    def sync_journal(self) -> int:
+        """
+        Download the messages after the last one of the journal (all of them if it is empty), and journal them as
+        they arrive. If the download fails midway, the next sync resumes after the last message received.
+        :return: (int) The number of messages journaled.
+        """
+        with self._sync_lock:  # concurrent syncs would download the same messages
+            return self.journal.append(self.game_id, self._stream_messages(self.journal.last_id(self.game_id)))
+
+    def _stream_messages(self, since_msg_id: str = None) -> Iterator[dict]:
+        # the documents since a specific ID, or all the documents of the game
+        url = f"{self.api_endpoint}/lastDoc/{since_msg_id}" if since_msg_id else self.api_endpoint
+        # (the initial war game definition is not a message)
+        return (message for message in self._stream_data(url) if message["_id"] != "initial_wargame")
 
     def _update_game_turn(self, messages: list[dict]):
         # Sync the game's turn number and phase with the last InfoMessage received
@@ -65,57 +512,208 @@ class SergeGame:
             self.turn_number = info_messages[-1]["gameTurn"]
             self.phase = info_messages[-1]["phase"]
 
-    def _get_wargame(self) -> list[dict] | None:
+    def _get_data(self, url: str) -> list[dict] | None:
         try:
-            response = requests.get(self.api_endpoint, timeout=TIMEOUT)
+            response = self.transport.get(url)
             response.raise_for_status()
             return response.json()["data"]
         except requests.exceptions.RequestException as e:
-            print(f"Request to {self.api_endpoint} failed: {e}")
-            return []  # return an empty list if the request fails
+            print(f"Request to {url} failed: {e}")
+            return None
 
-    def _get_messages_since_id(self, last_id: str) -> list[dict] | None:
+    def _stream_data(self, url: str) -> Iterator[dict]:
+        """The items of the data of the response, parsed as they arrive (they stop where the request fails)."""
         try:
-            response = requests.get(f"{self.api_endpoint}/lastDoc/{last_id}", timeout=TIMEOUT)
-            response.raise_for_status()
-            return response.json()["data"]
+            response = self.transport.get(url, stream=True)
         except requests.exceptions.RequestException as e:
-            print(f"Request to {self.api_endpoint} failed: {e}")
-            return []  # return an empty list if the request fails
+            print(f"Request to {url} failed: {e}")
+            return
+        with response:
+            if not response.ok:
+                print(f"Request to {url} failed: {response.status_code}")
+                return
+            try:
+                yield from iter_json_items(response.iter_content(STREAM_CHUNK_SIZE))
+            except (requests.exceptions.RequestException, ValueError) as e:
+                print(f"Request to {url} failed: {e}")
 
     def get_wargame_last(self) -> dict | None:
-        try:
-            response = requests.get(f"{self.api_endpoint}/last", timeout=TIMEOUT)
-            response.raise_for_status()
-            messages = response.json()["data"]
-            return messages[0]  # there should only be once message in the returned list
-        except requests.exceptions.RequestException as e:
-            print(f"Request to {self.api_endpoint} failed: {e}")
-            return None
+        messages = self._get_data(f"{self.api_endpoint}/last")
+        return messages[0] if messages else None  # there should only be once message in the returned list
 
-    def send_message(self, message: dict):
-        # remove _rev if present
-        if "_rev" in message:
-            del message["_rev"]
-        # setting the message metadata
-        timestamp_str = datetime.now(UTC).isoformat(timespec="milliseconds").replace("+00:00", "Z")
+    def _next_timestamp(self) -> str:
+        # message ids are millisecond timestamps: they must be unique and increasing for the messages to be ordered
+        with self._timestamp_lock:
+            now = datetime.now(UTC)
+            now = now.replace(microsecond=now.microsecond // 1000 * 1000)
+            if self._last_timestamp is not None and now <= self._last_timestamp:
+                now = self._last_timestamp + timedelta(milliseconds=1)
+            self._last_timestamp = now
+        return now.isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+    def _stamp(self, message: dict) -> None:
+        # setting the message id and timestamps
+        timestamp_str = self._next_timestamp()
         message["details"].update({"timestamp": timestamp_str})
         if "collaboration" in message["details"]:
             # applies to WA messages only
             message["details"]["collaboration"]["lastUpdated"] = timestamp_str
-        message["details"].update({"turnNumber": self.turn_number})
         message["_id"] = timestamp_str
 
-        # posting the message to the game
-        response = requests.put(self.api_endpoint, json.dumps(message), headers={"Content-Type": "application/json"})
+    def _prepare_message(self, message: dict) -> str:
+        # remove _rev if present
+        if "_rev" in message:
+            del message["_rev"]
+        # setting the message metadata
+        self._stamp(message)
+        message["details"].update({"turnNumber": self.turn_number})
+        return json.dumps(message)
+
+    def _restamp(self, data: str) -> tuple[str, str]:
+        """New id and timestamps, as of now, for a prepared message. :return: (tuple[str, str]) Its id and data."""
+        message = json.loads(data)
+        self._stamp(message)
+        return message["_id"], json.dumps(message)
+
+    def _put(self, url: str, data: str, description: str, warn_conflict: bool = True) -> bool | None:
+        """
+        PUT JSON data, warning about failures.
+        :return: (bool | None) Whether the server accepted the data, None if it rejected it as a conflict (a document
+            with the same id exists).
+        """
+        try:
+            response = self.transport.put(url, data=data, headers={"Content-Type": "application/json"})
+        except requests.exceptions.RequestException as e:
+            warn(f"Sending {description} to {url} failed: {e}")
+            return False
         if not response.ok:
-            print(response.status_code)
-            print(response.json())
+            if response.status_code == 404 and url == self.bulk_endpoint:
+                self.bulk_supported = False
+            if response.status_code != 409 or warn_conflict:
+                warn(f"Sending {description} to {url} failed: {response.status_code} {response.text[:200]}")
+            return None if response.status_code == 409 else False
+        return True
+
+    def skip_sent(self, messages: Iterable[dict]) -> None:
+        """
+        Do not send again the messages of the same content (see content_key) as <messages>, e.g. the messages of the
+        game since the checkpoint of a crashed client, which processes the same turns again: each message given skips
+        one message sent. Clear <sent_before> to send them all again.
+        :param messages: (Iterable[dict]) The messages already sent.
+        """
+        self.sent_before.update(map(content_key, messages))
+
+    def _already_sent(self, message: dict) -> bool:
+        if not self.sent_before:
+            return False
+        key = content_key(message)
+        if not self.sent_before[key]:
+            return False
+        self.sent_before[key] -= 1
+        if not self.sent_before[key]:
+            del self.sent_before[key]
+        return True
+
+    def send_message(self, message: dict) -> bool:
+        """
+        Post a message to the game, or queue it if a batch is open (see <batch>). Messages already sent (see
+        <skip_sent>) are skipped.
+        :param message: (dict) The message, whose metadata (id, timestamp, turn number) is set here.
+        :return: (bool) Whether the server accepted the message (a warning is issued otherwise). Always True for a
+            queued message, whose result is given by the batch flush, and for a skipped one.
+        """
+        if self._already_sent(message):
+            return True
+        data = self._prepare_message(message)
+        if self._outbox is not None:
+            self._outbox.add(message["_id"], data, message["details"].get("channel"))
+            return True
+        return self._send_prepared([message["_id"]], [data])[0]
+
+    def _put_document(self, msg_id: str, data: str, after_bulk: bool = False) -> bool:
+        sent = self._put(self.api_endpoint, data, f"message {msg_id}", warn_conflict=False)
+        if sent is None:
+            if after_bulk and self._is_stored(msg_id, data):
+                return True  # the failed bulk request applied it
+            # another document has the same id (e.g. posted by another client in the same millisecond): new id
+            msg_id, data = self._restamp(data)
+            sent = self._put(self.api_endpoint, data, f"message {msg_id}")
+        return bool(sent)
 
-    def send_chat_message(self, text_msg: str):
-        msg_chat = MSG_CHAT.copy()
+    def _is_stored(self, msg_id: str, data: str) -> bool:
+        """Whether the game has the document <data> at its id <msg_id> (e.g. applied by a failed bulk request)."""
+        before = datetime.fromisoformat(msg_id.replace("Z", "+00:00")) - timedelta(milliseconds=1)
+        before_id = before.isoformat(timespec="milliseconds").replace("+00:00", "Z")
+        # the documents after the previous millisecond, read until the id
+        documents = self._stream_data(f"{self.api_endpoint}/lastDoc/{before_id}")
+        try:
+            stored = next((d for d in documents if d["_id"] >= msg_id), None)
+        finally:
+            documents.close()
+        if stored is None or stored["_id"] != msg_id:
+            return False
+        return {key: value for key, value in stored.items() if key != "_rev"} == json.loads(data)
+
+    def _send_prepared(self, ids: list[str], documents: list[str]) -> list[bool]:
+        if self.timers is None:
+            return self._post_prepared(ids, documents)
+        with self.timers.time("send"):
+            return self._post_prepared(ids, documents)
+
+    def _post_prepared(self, ids: list[str], documents: list[str]) -> list[bool]:
+        if len(documents) > 1 and self.bulk_supported:
+            bulk_data = "[" + ",".join(documents) + "]"
+            if self._put(self.bulk_endpoint, bulk_data, f"{len(documents)} messages ({ids[0]} to {ids[-1]})"):
+                return [True] * len(documents)
+            # the bulk response does not say which documents were rejected, posting them one by one tells (the
+            #   documents conflicting with those the bulk request applied are not posted again, see _put_document)
+            warn("Bulk request failed, sending the messages one by one")
+            return [self._put_document(msg_id, data, after_bulk=True) for msg_id, data in zip(ids, documents)]
+        return [self._put_document(msg_id, data) for msg_id, data in zip(ids, documents)]
+
+    @contextmanager
+    def batch(self, max_batch_size: int = MAX_BULK_SIZE):
+        """
+        Queue the messages sent in the block, and post them at its end, in order, in bulk requests of at most
+        <max_batch_size> messages. If a bulk request fails, its messages are posted one by one, so that each of them
+        is reported (some may then be rejected as duplicates if the bulk request was partially applied).
+        Usage:
+            with game.batch() as outbox:
+                game.send_chat_message(...)
+                ...
+            outbox.results  # whether each message was accepted
+        :param max_batch_size: (int) Max number of messages per bulk request.
+        :return: (SergeOutbox) The outbox, whose results are set when the block exits.
+        """
+        if self._outbox is not None:
+            # nested batches are flushed with the outer one
+            yield self._outbox
+            return
+        self._outbox = SergeOutbox(self, max_batch_size)
+        try:
+            yield self._outbox
+        finally:
+            outbox, self._outbox = self._outbox, None
+            self._flush_outbox(outbox)
+
+    def _flush_outbox(self, outbox: SergeOutbox) -> None:
+        outbox.flush()
+
+    def close(self) -> None:
+        """Close the connections to the server (unless the transport is shared)."""
+        if self._owns_transport:
+            self.transport.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def send_chat_message(self, text_msg: str) -> bool:
+        msg_chat = CHAT_MESSAGE()
         msg_chat["message"]["content"] = text_msg
-        self.send_message(msg_chat)
+        return self.send_message(msg_chat)
 
     def send_WA_message(
         self,
@@ -126,8 +724,8 @@ class SergeGame:
         eta_minute: int,
         velocity: int,
         target: int,
-    ):
-        msg_wa = MSG_WA.copy()
+    ) -> bool:
+        msg_wa = WA_MESSAGE()
         content = msg_wa["message"]
         content["Title"] = threat_id
         content["Weapon"] = self.MAPPING_WEAPON[weapon_id]
@@ -144,7 +742,130 @@ class SergeGame:
         # update the target channel
         msg_wa["details"]["channel"] = self.MAPPING_CHANNEL[channel]
 
-        self.send_message(msg_wa)
+        return self.send_message(msg_wa)
+
+
+class AsyncSergeGame(SergeGame):
+    """
+    SergeGame whose messages are posted in the background, on a thread pool over the pooled transport, so that the
+    caller (e.g. the next poll of the game) does not wait for them. At most <max_in_flight> requests run at once, and
+    the messages of a channel are posted in the order they were sent.
+    The sending methods must be called from the thread running the asyncio event loop. They return as soon as the
+    message is scheduled (see <drain> and <results> for the outcome).
+    """
+    def __init__(self, game_id: str, server_url: str = "https://serge-inet.herokuapp.com",
+                 transport: SergeTransport = None, max_in_flight: int = 4, journal: "MessageJournal" = None):
+        """
+        :param game_id: (str) The game id.
+        :param server_url: (str) The Serge server URL.
+        :param transport: (SergeTransport) The HTTP transport, whose pool size should be at least <max_in_flight>.
+        :param max_in_flight: (int) Max number of concurrent requests.
+        :param journal: (MessageJournal) Local journal of the game messages (see SergeGame).
+        """
+        super().__init__(game_id, server_url=server_url, transport=transport, journal=journal)
+        self.max_in_flight = max_in_flight
+        # whether each posted message was accepted, and the id it was posted with, by message id (the id set by
+        #   <send_message>, see <_send_documents>)
+        self.results: dict[str, bool] = {}
+        self.posted_ids: dict[str, str] = {}
+        self._executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="serge")
+        self._channel_tails: dict[str, asyncio.Task] = {}  # last send scheduled on each channel
+        self._pending: set[asyncio.Task] = set()
+        self._poll_lock: asyncio.Lock | None = None
+
+    async def _run(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, function, *args)
+
+    async def poll_new_messages(self) -> list[dict]:
+        """Retrieve the messages since the last poll, concurrently with the pending sends."""
+        if self._poll_lock is None:
+            self._poll_lock = asyncio.Lock()
+        async with self._poll_lock:  # polls update the last message id
+            return await self._run(self.get_new_messages)
+
+    async def poll_changes(self, timeout: float = CHANGE_FEED_TIMEOUT) -> list[dict] | None:
+        """Asynchronous version of <wait_for_messages>."""
+        if self._poll_lock is None:
+            self._poll_lock = asyncio.Lock()
+        async with self._poll_lock:
+            return await self._run(self.wait_for_messages, timeout)
+
+    async def fetch_messages(self, since_msg_id: str = None) -> list[dict]:
+        """Asynchronous version of <get_messages>."""
+        return await self._run(self.get_messages, since_msg_id)
+
+    def _send_documents(self, ids: list[str], documents: list[str], max_batch_size: int = MAX_BULK_SIZE) -> list[bool]:
+        # the messages are stamped again as they are posted: messages stamped when scheduled would land after the
+        #   messages stamped later but posted sooner (e.g. by other clients), and be missed by the clients already
+        #   past them (see SergeGame.sync_journal). The results are still keyed by the ids the caller saw.
+        posted_ids, documents = map(list, zip(*map(self._restamp, documents))) if documents else ([], [])
+        results = []
+        for i in range(0, len(documents), max_batch_size):
+            results += self._send_prepared(posted_ids[i:i + max_batch_size], documents[i:i + max_batch_size])
+        self.posted_ids.update(zip(ids, posted_ids))
+        self.results.update(zip(ids, results))
+        return results
+
+    async def _send_after(self, previous: set[asyncio.Task], *args) -> list[bool]:
+        if previous:
+            await asyncio.wait(previous)
+        return await self._run(self._send_documents, *args)
+
+    def _schedule(self, channels: set[str], *args) -> asyncio.Task:
+        # the send waits for the previous sends of its channels
+        previous = {self._channel_tails[c] for c in channels if c in self._channel_tails}
+        task = asyncio.get_running_loop().create_task(self._send_after(previous, *args))
+        for channel in channels:
+            self._channel_tails[channel] = task
+        self._pending.add(task)
+        task.add_done_callback(self._on_sent)
+        return task
+
+    def _on_sent(self, task: asyncio.Task) -> None:
+        self._pending.discard(task)
+        for channel in [c for c, t in self._channel_tails.items() if t is task]:
+            del self._channel_tails[channel]
+
+    def send_message(self, message: dict) -> bool:
+        """
+        Schedule the posting of a message, or queue it if a batch is open (see <batch>). Messages already sent (see
+        <skip_sent>) are skipped.
+        :param message: (dict) The message, whose metadata (id, timestamp, turn number) is set here. The message
+            posted has a new id and timestamp, of the time it is posted (see <posted_ids>), but its result (see
+            <results>) is keyed by the id set here.
+        :return: (bool) True, the message is posted in the background.
+        """
+        if self._outbox is not None:
+            return super().send_message(message)
+        if self._already_sent(message):
+            return True
+        data = self._prepare_message(message)
+        self._schedule({message["details"].get("channel")}, [message["_id"]], [data])
+        return True
+
+    def _flush_outbox(self, outbox: SergeOutbox) -> None:
+        # a batch spanning several channels is ordered after the previous sends of all of them
+        self._schedule(outbox.channels, outbox.ids, outbox.documents, outbox.max_batch_size)
+        outbox.ids, outbox.documents, outbox.channels = [], [], set()
+
+    @property
+    def in_flight(self) -> int:
+        """Number of scheduled sends not completed yet."""
+        return len(self._pending)
+
+    async def drain(self) -> dict[str, bool]:
+        """
+        Wait for all the scheduled sends to complete, and return whether each message was accepted, by the id set by
+        <send_message> (see <results>).
+        """
+        while self._pending:
+            await asyncio.wait(set(self._pending))
+        return self.results
+
+    def close(self) -> None:
+        """Wait for the requests being sent, and close the connections to the server."""
+        self._executor.shutdown(wait=True)
+        super().close()
 
 
 # Below are the various JSON message templates that are used to communicate with Serge
@@ -333,3 +1054,7 @@ MSG_WA = {  # a weapon assignment message
         "Weapon": "Long Range",
     },
 }
+
+# builders of fresh messages from the templates
+CHAT_MESSAGE = DocumentTemplate(MSG_CHAT)
+WA_MESSAGE = DocumentTemplate(MSG_WA)
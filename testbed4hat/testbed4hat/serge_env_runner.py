@@ -1,31 +1,52 @@
-from collections import defaultdict, namedtuple
-from copy import deepcopy
+import asyncio
+from collections import Counter, defaultdict, namedtuple
+import contextlib
+import copy
+from datetime import UTC, datetime
 import itertools
+import json
+import os
+import pickle
 import time
-from typing import Tuple
+from typing import Iterable, Tuple
 from warnings import warn
 
 import click
 import numpy as np
-import pyproj
-from pyproj import CRS, Transformer
-from shapely.geometry import Point
-from shapely.ops import transform
 
-from serge import MSG_MAPPING_SHIPS, SergeGame
+from serge import MSG_MAPPING_SHIPS, AsyncSergeGame, DocumentTemplate, SergeGame, SergeTransport
 from testbed4hat.testbed4hat.messages import (
     ShipDestroyedMessage,
     ThreatMissMessage,
     WeaponEndMessage,
     WeaponMissMessage,
 )
+from testbed4hat.testbed4hat.anytime import AnytimeAgent
 from testbed4hat.testbed4hat.hat_env import HatEnv
 from testbed4hat.testbed4hat.hat_env_config import HatEnvConfig
 from testbed4hat.testbed4hat.heuristic_agent import HeuristicAgent
-from testbed4hat.testbed4hat.utils import compute_pk_ring_radii
+from testbed4hat.testbed4hat.map_delta import MapDeltaEncoder
+from testbed4hat.testbed4hat.map_projection import MapProjection
+from testbed4hat.testbed4hat.message_journal import MessageJournal
+from testbed4hat.testbed4hat.phase_timers import PhaseTimers
+from testbed4hat.testbed4hat.range_rings import range_ring
+from testbed4hat.testbed4hat.serge_server import SergeStandIn
+from testbed4hat.testbed4hat.utils import atomic_write, compute_pk_ring_radii
+from testbed4hat.testbed4hat.wait_strategies import (
+    AdaptivePolling,
+    FixedPolling,
+    WaitStrategy,
+    WAIT_STRATEGIES,
+)
 
 SHIP_NAMES = ["Alpha", "Bravo"]
 LaunchTuple = namedtuple("LaunchTuple", ["ship_id", "weapon_id", "target_id"])
+# the outcome of an adjudication phase computed during the planning phase, for the actions released then (see
+#   SergeEnvRunner._speculate)
+Speculation = namedtuple(
+    "Speculation", ["turn", "actions", "env_state", "attributes", "map_message", "suggested_actions"]
+)
+CHECKPOINT_VERSION = 1  # of the format of the checkpoints of the runner (see SergeEnvRunner._save_checkpoint)
 
 THREAT_TEMPLATE = {
     "geometry": {"coordinates": [43.21484211402448, 12.819648833091783], "type": "Point"},
@@ -101,6 +122,17 @@ SUGGESTED_ACTION_TEMPLATE = {  # a weapon assignment message
     },
 }
 
+# builders of fresh features and messages from the templates (see DocumentTemplate)
+THREAT_FEATURE = DocumentTemplate(THREAT_TEMPLATE)
+WEAPON_FEATURE = DocumentTemplate(WEAPON_TEMPLATE)
+SUGGESTED_ACTION_MESSAGE = DocumentTemplate(SUGGESTED_ACTION_TEMPLATE)
+SHIPS_MAPPING_MESSAGE = DocumentTemplate(MSG_MAPPING_SHIPS)
+RANGE_FEATURE = DocumentTemplate(MSG_MAPPING_SHIPS["featureCollection"]["features"][2])
+# (the features of the map messages are built each turn)
+MAPPING_MESSAGE = DocumentTemplate(
+    {**MSG_MAPPING_SHIPS, "featureCollection": {**MSG_MAPPING_SHIPS["featureCollection"], "features": []}}
+)
+
 ICONS = {
     "Weapon0": "30030220001100000815",  # "Long Range"
     "Weapon1": "30030200001100000812",  # "Short Range"
@@ -113,61 +145,43 @@ ICONS = {
 }
 
 
-def geodesic_point_buffer(lat, lon, m):
-    # Azimuthal equidistant projection
-    # Adapted from: https://gis.stackexchange.com/questions/121256/creating-a-circle-with-radius-in-metres
-    aeqd_proj = CRS.from_proj4(f"+proj=aeqd +lat_0={lat} +lon_0={lon} +x_0=0 +y_0=0")
-    tfmr = Transformer.from_proj(aeqd_proj, aeqd_proj.geodetic_crs)
-    buf = Point(0, 0).buffer(m)  # distance in metres
-    return transform(tfmr.transform, buf).exterior.coords[:]
-
-
 def get_pd_polygons(lat, lon):
-    low_pk_ring_radius, short_weapon_pk_radius, long_weapon_pk_radius = compute_pk_ring_radii()
-    low_pk_ring = geodesic_point_buffer(lat, lon, low_pk_ring_radius)  # in meters
-    short_weapon_pk_ring = geodesic_point_buffer(lat, lon, short_weapon_pk_radius)  # in meters
-    long_weapon_pk_ring = geodesic_point_buffer(lat, lon, long_weapon_pk_radius)  # in meters
-
-    # convert to serge format
-    low_pk_ring = [list(coord) for coord in low_pk_ring]
-    short_weapon_pk_ring = [list(coord) for coord in short_weapon_pk_ring]
-    long_weapon_pk_ring = [list(coord) for coord in long_weapon_pk_ring]
-    return low_pk_ring, short_weapon_pk_ring, long_weapon_pk_ring
+    # the rings are cached on disk (see range_ring), in Serge format (long-lat)
+    return tuple(range_ring(lat, lon, radius) for radius in compute_pk_ring_radii())  # radii in meters
 
 
 class SergeEnvRunner:
     WEAPON_STR_TO_INT = {"Long Range": 0, "Short Range": 1}
     WEAPON_INT_TO_STR = {0: "Long Range", 1: "Short Range"}
     WAIT_TIME_BETWEEN_POLLS = 3
+    # max time to compute the AI suggestions, so that a slow agent never stalls the adjudication phase
+    SUGGESTION_DEADLINE_SECONDS = 2.0
 
-    def __init__(self, game_id: str, server_url: str = "https://serge-inet.herokuapp.com", max_game_minutes: int = 20):
+    def __init__(
+        self,
+        game_id: str,
+        server_url: str = "https://serge-inet.herokuapp.com",
+        max_game_minutes: int = 20,
+        wait_strategy: WaitStrategy = None,
+        journal: MessageJournal = None,
+        map_keyframe_interval: int = None,
+        transport: SergeTransport = None,
+        projection: MapProjection = None,
+        metrics_file: str = None,
+        checkpoint_file: str = None,
+        catch_up: bool = True,
+        speculate: bool = True,
+    ):
         # todo: log game to local storage?
 
-        # long-lat coords in Serge: [43.21484211402448, 12.819648833091783]
-        lat_long_zero = [12.819648833091783, 43.21484211402448]  # The lat-long coordinates of (0, 0) in the sim
-
-        # Note: not confident I know how this works
-        self.coordinate_projector = pyproj.Proj(proj="utm", zone=31, ellps="WGS84", preserve_units=True)
-
-        self.cartesian_zero = self.coordinate_projector(*lat_long_zero)
+        # converts the sim coordinates to the long-lat coordinates of the Serge map (the ships' are converted once,
+        #   on the first map); shared by the games of a GameHost
+        self.projection = MapProjection() if projection is None else projection
+        lat_long_zero = self.projection.origin[::-1]  # The lat-long coordinates of (0, 0) in the sim
 
         self.hard_ship_0_location = [-250, -200]
         self.hard_ship_1_location = [250, 150]  # verify okay with Dong
 
-        ship_0_loc_adjusted = [
-            self.cartesian_zero[0] + self.hard_ship_0_location[0],
-            self.cartesian_zero[1] + self.hard_ship_0_location[1],
-        ]
-        ship_1_loc_adjusted = [
-            self.cartesian_zero[0] + self.hard_ship_1_location[0],
-            self.cartesian_zero[1] + self.hard_ship_1_location[1],
-        ]
-
-        self.ship_0_lat_long = self.coordinate_projector(*ship_0_loc_adjusted, inverse=True)
-        self.ship_1_lat_long = self.coordinate_projector(*ship_1_loc_adjusted, inverse=True)
-        self.ship_0_long_lat = [self.ship_0_lat_long[1], self.ship_0_lat_long[0]]
-        self.ship_1_long_lat = [self.ship_1_lat_long[1], self.ship_1_lat_long[0]]
-
         config = HatEnvConfig()
         # set hard-coded game parameters
         config.set_parameter("hard_ship_0_location", self.hard_ship_0_location)
@@ -217,7 +231,8 @@ class SergeEnvRunner:
 
         config.set_parameter("seed", 1337)
 
-        out = get_pd_polygons(*lat_long_zero)
+        # the range polygons are shared by all runners using the same config, so they are only computed once
+        out = config.derived.memoize(("pd_polygons", *lat_long_zero), lambda: get_pd_polygons(*lat_long_zero))
         self.low_pk_range_polygon, self.short_weapon_range_polygon, self.long_weapon_range_polygon = out
 
         self.env_config = config
@@ -231,20 +246,57 @@ class SergeEnvRunner:
         self.turn_actions = None
         self.ship_features = None
         self.heuristic_agent = None
+        self.suggestion_agent: AnytimeAgent | None = None
         self.turns_processed = None
 
         # serge setup vars
         self.game_id = game_id
         self.url = server_url
-        self.serge_game = SergeGame(game_id=game_id, server_url=server_url)  # interface to Serge
+        # the messages are journaled as they are received, so that those of a turn are not downloaded again to be
+        #   processed (use a journal file to share them with the provenance generator)
+        self.journal = MessageJournal() if journal is None else journal
+        # the HTTP transport to Serge, shared by the games of a GameHost (None for one per game)
+        self.transport = transport
+        self.serge_game = SergeGame(  # interface to Serge
+            game_id=game_id, server_url=server_url, transport=transport, journal=self.journal
+        )
+        # latency histograms of the phases of the turns, written to <metrics_file> after each adjudication phase (in
+        #   the Prometheus text format) if set, and summarized at the end of the game
+        self.timers = PhaseTimers()
+        self.serge_game.timers = self.timers
+        self.metrics_file = metrics_file
+        # the state of the game is saved to <checkpoint_file> after each adjudication phase if set, for a restarted
+        #   runner to resume the game from it (see _start_game)
+        self.checkpoint_file = checkpoint_file
+        # when several adjudication phases passed (e.g. after a network outage), only the last one is published, with
+        #   a summary of the events of the others (see _catch_up_turn), rather than the stale updates of each of them
+        self.catch_up = catch_up
+        self.suggestions_sent = False  # whether the AI suggestions of this turn were sent before a restart
+        self.condensed_turns: list[dict] = []  # events of the turns caught up with, not published yet
+        # the adjudication phase is computed in advance during the planning phase, with the actions released so far,
+        #   and published as soon as it starts if no other action was released (see _speculate)
+        self.speculate = speculate
+        self.speculation: Speculation | None = None
+        self.speculation_outcomes: Counter[str] = Counter()  # speculations "used" or "discarded" at adjudication
         self.ship_0_channel_id = None
         self.ship_1_channel_id = None
         self.ship_0_serge_name = "Alpha"
         self.ship_1_serge_name = "Bravo"
         self.last_adjudication_msg_id: str | None = None
+        # how to wait for the next messages: by polling more often near the expected end of the phase (the Serge API
+        #   has no change feed, see ChangeFeed for the stand-in)
+        self.wait_strategy = AdaptivePolling() if wait_strategy is None else wait_strategy
+        # the map is sent whole each turn (as the Serge map needs), or as deltas with a keyframe every
+        #   <map_keyframe_interval> turns for clients decoding them (see MapDeltaEncoder)
+        self.map_encoder = None if map_keyframe_interval is None else MapDeltaEncoder(map_keyframe_interval)
+        # limits the number of games of a GameHost processing an adjudication phase at once (set by the host)
+        self.adjudication_slots: asyncio.Semaphore | None = None
 
         ## statistics
         self.launches: list[LaunchTuple] = []  # remember the interceptor launches
+        self.turn_processing_times: list[float] = []  # time to process each adjudication phase, in seconds
+        # time from the start of each adjudication phase (its message id) to the end of its processing, in seconds
+        self.adjudication_lags: list[float] = []
         self.no_threats_eliminated: int = 0
 
     def _reset_env(self):
@@ -260,6 +312,11 @@ class SergeEnvRunner:
             threshold=0.5,  # arbitrary choice, update as needed for desired performance
             max_actions=4,
         )
+        # (the heuristic is fast and can't be interrupted, so its suggestions are computed at once: the deadline only
+        #   matters for a searching agent with a fallback, e.g. AnytimeAgent.from_planner)
+        self.suggestion_agent = AnytimeAgent.from_agent(self.heuristic_agent, fallback=self.heuristic_agent)
+        if self.map_encoder is not None:
+            self.map_encoder.reset()  # the map of a new game starts with a keyframe
 
     @staticmethod
     def _sim_threat_id_to_serge_id(threat_id: str) -> str:
@@ -278,33 +335,36 @@ class SergeEnvRunner:
         threat_id = self._serge_threat_id_to_sim_id(wa_message["message"]["Threat"]["ID"])
         return ship_number, weapon_type, threat_id
 
-    def _process_action_msg(self, message) -> None:
+    def _released_action(self, message) -> Tuple[int, int, str] | None:
         # Only action on a "Released" WA message
         if message["details"]["collaboration"]["status"] != "Released":
-            return
+            return None
+        return self._convert_wa_message_to_action(message)
 
-        action = self._convert_wa_message_to_action(message)
+    def _process_action_msg(self, message) -> None:
+        action = self._released_action(message)
+        if action is None:
+            return
 
         # We will action messages on a rolling basis, so just add it to the list of actions to send to the env, until
         #   the turn is over.
         self.turn_actions.append(action)
 
     def _step_environment(self) -> None:
+        # the suggestions of the last turn are stale, and observations share their arrays with the environment
+        self.suggestion_agent.stop()
         self.obs, self.reward, self.terminated, self.truncated, self.info = self.env.step(self.turn_actions)
         self.turn_actions = []
         self.turn += 1
-
-    def _sim_xy_to_lat_long(self, x, y):
-        # convert to map xy coordinates
-        x_adjusted = x + self.cartesian_zero[0]
-        y_adjusted = y + self.cartesian_zero[1]
-
-        # convert to Lat-Long
-        lat, long = self.coordinate_projector(x_adjusted, y_adjusted, inverse=True)
-        return lat, long
+        # collecting the stats
+        for launch in self.obs["launched"]:
+            self.launches.append(LaunchTuple(launch["ship_id"], launch["weapon_type"], launch["threat_id"]))
+        self.no_threats_eliminated += sum(
+            isinstance(message, WeaponEndMessage) and message.destroyed_target for message in self.obs["messages"]
+        )
 
     def _make_suggested_action_message(self, action_tuple: tuple) -> dict:
-        WA_MSG = deepcopy(SUGGESTED_ACTION_TEMPLATE)
+        WA_MSG = SUGGESTED_ACTION_MESSAGE()
         # Message 'id' is specified in serge_game.send_message()
         # Message 'details.timestamp` specified in serge_game.send_massage()
         # todo: how to specify 'details.collaboration.lastUpdated'?
@@ -341,19 +401,29 @@ class SergeEnvRunner:
         WA_MSG["message"]["Weapon"] = weapon_name
         return WA_MSG
 
-    def _send_suggested_actions(self) -> None:
-        action = self.heuristic_agent.heuristic_action(self.obs)
-        for a in action:
+    def _get_suggested_actions(self) -> list:
+        with self.timers.time("suggest"):
+            return self._suggest()
+
+    def _suggest(self) -> list:
+        decision = self.suggestion_agent.act(self.obs, self.SUGGESTION_DEADLINE_SECONDS)
+        if not decision.final:
+            warn(f"AI suggestions not final by the deadline ({decision.completed:.0%} of the search completed)")
+        return decision.actions
+
+    def _send_suggested_actions(self, actions: list = None) -> None:
+        if self.suggestions_sent:
+            return  # (before a restart, see _start_game)
+        if actions is None:
+            actions = self._get_suggested_actions()
+        for a in actions:
             action_msg = self._make_suggested_action_message(a)
             self.serge_game.send_message(action_msg)
 
-    def _make_threat_dict(self, threat: dict, missed: bool = False) -> dict:
-        threat_dict = deepcopy(THREAT_TEMPLATE)
-        threat_x, threat_y = threat["location"]
-
-        # convert to Lat-Long
-        threat_lat, threat_long = self._sim_xy_to_lat_long(threat_x, threat_y)
-        threat_dict["geometry"]["coordinates"] = [threat_long, threat_lat]  # Serge wants long-lat
+    def _make_threat_dict(self, threat: dict, long_lat: list[float], missed: bool = False) -> dict:
+        # (the long-lat coordinates of the features of a turn are converted all at once, see _build_map_message)
+        threat_dict = THREAT_FEATURE()
+        threat_dict["geometry"]["coordinates"] = long_lat  # Serge wants long-lat
 
         threat_dict["properties"]["id"] = self._sim_threat_id_to_serge_id(threat["threat_id"])
         threat_dict["properties"]["label"] = "Threat " + self._sim_threat_id_to_serge_id(threat["threat_id"])
@@ -380,17 +450,14 @@ class SergeEnvRunner:
     def _make_weapon_dict(
         self,
         weapon: dict,
+        long_lat: list[float],
         status: str = None,
     ) -> dict:
-        weapon_dict = deepcopy(WEAPON_TEMPLATE)
+        weapon_dict = WEAPON_FEATURE()
 
         ship_id = weapon["ship_id"]
         serge_ship_id = self.ship_0_serge_name if ship_id == 0 else self.ship_1_serge_name
-        weapon_x, weapon_y = weapon["location"]
-
-        # convert to Lat-Long
-        weapon_lat, weapon_long = self._sim_xy_to_lat_long(weapon_x, weapon_y)
-        weapon_dict["geometry"]["coordinates"] = [weapon_long, weapon_lat]  # serge wants long-lat
+        weapon_dict["geometry"]["coordinates"] = long_lat  # serge wants long-lat
         weapon_dict["properties"]["id"] = weapon["weapon_id"]
         weapon_dict["properties"]["label"] = weapon["weapon_id"]
         weapon_dict["properties"]["turn"] = self.turn + 1
@@ -416,9 +483,11 @@ class SergeEnvRunner:
 
     def _build_ship_features(self):
         # constructing the mapping message from the template
-        message = deepcopy(MSG_MAPPING_SHIPS)
-        message["featureCollection"]["features"][0]["geometry"]["coordinates"] = self.ship_0_long_lat
-        message["featureCollection"]["features"][1]["geometry"]["coordinates"] = self.ship_1_long_lat
+        message = SHIPS_MAPPING_MESSAGE()
+        ship_0_long_lat = self.projection.point(*self.hard_ship_0_location)
+        ship_1_long_lat = self.projection.point(*self.hard_ship_1_location)
+        message["featureCollection"]["features"][0]["geometry"]["coordinates"] = ship_0_long_lat
+        message["featureCollection"]["features"][1]["geometry"]["coordinates"] = ship_1_long_lat
 
         ship_0_weapon_0_inventory = self.obs["ship_0"]["inventory"]["weapon_0_inventory"]
         ship_0_weapon_1_inventory = self.obs["ship_0"]["inventory"]["weapon_1_inventory"]
@@ -430,18 +499,17 @@ class SergeEnvRunner:
         message["featureCollection"]["features"][1]["properties"]["SR ammo"] = ship_1_weapon_1_inventory
 
         # make range polygon features
-        range_dict = message["featureCollection"]["features"][2]
-        low_range_dict = deepcopy(range_dict)
+        low_range_dict = RANGE_FEATURE()
         low_range_dict["properties"]["label"] = "Low Range"
         low_range_dict["properties"]["id"] = "feature-range-low"
         low_range_dict["properties"]["color"] = "#777"
         low_range_dict["geometry"]["coordinates"] = self.low_pk_range_polygon
-        short_range_dict = deepcopy(range_dict)
+        short_range_dict = RANGE_FEATURE()
         short_range_dict["properties"]["label"] = "Short Range"
         short_range_dict["properties"]["id"] = "feature-range-short"
         short_range_dict["properties"]["color"] = "#666"
         short_range_dict["geometry"]["coordinates"] = self.short_weapon_range_polygon
-        long_range_dict = deepcopy(range_dict)
+        long_range_dict = RANGE_FEATURE()
         long_range_dict["properties"]["label"] = "Long Range"
         long_range_dict["properties"]["id"] = "feature-range-long"
         long_range_dict["properties"]["color"] = "#555"
@@ -470,60 +538,20 @@ class SergeEnvRunner:
             "type": "Feature",
         }
 
-    def _build_map_message(self) -> dict:
-        # Generate map objects for Serge from the current game observations
-
-        # generating threat features
-        threat_features_map: dict[str, dict] = dict()
-        for threat in itertools.chain(self.obs["ship_0"]["threats"], self.obs["ship_1"]["threats"]):
-            threat_id = threat["threat_id"]
-            if threat_id not in threat_features_map:  # ensuring no duplicate
-                threat_dict = self._make_threat_dict(threat)
-                threat_features_map[threat_id] = threat_dict
-
-        # generating weapon features
-        weapon_features: list[dict] = []
-        line_features: list[dict] = []
-        weapon_ids: set[str] = set()
-        for weapon in itertools.chain(self.obs["ship_0"]["weapons"], self.obs["ship_1"]["weapons"]):
-            # (both ships see weapons launched by each other)
-            weapon_id = weapon["weapon_id"]
-            if weapon_id not in weapon_ids:  # ensuring no duplicate
-                weapon_ids.add(weapon["weapon_id"])
-                weapon_dict = self._make_weapon_dict(weapon)
-                weapon_features.append(weapon_dict)
-
-                # create a line feature to connect the weapon to the targeted threat
-                target_id = weapon["target_id"]
-                if target_id in threat_features_map:
-                    geojson_line = self._build_geojson_line(
-                        weapon_dict["geometry"]["coordinates"],
-                        threat_features_map[target_id]["geometry"]["coordinates"],
-                    )
-                    geojson_line["properties"]["id"] += target_id
-                    line_features.append(geojson_line)
+    def _update_ship_features(self) -> None:
+        """
+        Update the ship features with the current game observations: their weapon inventories, and the ships destroyed
+        (which stay so on the next maps). Done for every turn, including those caught up with (see _catch_up_turn).
+        """
+        if not self.ship_features:
+            # should only occur once, on the first step
+            self._build_ship_features()  # generating the ships
 
-        # process game events captured in messages
         for message in self.obs["messages"]:
-            if isinstance(message, (WeaponEndMessage, WeaponMissMessage)):
-                missed = isinstance(message, WeaponMissMessage)
-                weapon_dict = self._make_weapon_dict(
-                    message.weapon, "Missed" if missed else ("Hit" if message.destroyed_target else "Wasted")
-                )
-                weapon_features.append(weapon_dict)
-            elif isinstance(message, ShipDestroyedMessage):
+            if isinstance(message, ShipDestroyedMessage):
                 self.ship_features[message.ship_id]["properties"]["sidc"] = ICONS["ShipDestroyed"]
                 # self.ship_features[message.ship_id]["properties"]["health"] = 0
                 self.ship_features[message.ship_id]["properties"]["Destroyed By"] = message.threat_id
-            elif isinstance(message, ThreatMissMessage):
-                threat_dict = self._make_threat_dict(message.threat_obs, missed=True)
-                threat_features_map[message.threat_obs["threat_id"]] = threat_dict
-
-        step_message = deepcopy(MSG_MAPPING_SHIPS)
-
-        if not self.ship_features:
-            # should only occur once, on the first step
-            self._build_ship_features()  # generating the ships
 
         # update ship weapon inventories
         ship_features = self.ship_features
@@ -538,18 +566,87 @@ class SergeEnvRunner:
         ship_features[1]["properties"]["LR ammo"] = ship_1_weapon_0_inventory
         ship_features[1]["properties"]["SR ammo"] = ship_1_weapon_1_inventory
 
-        step_message["featureCollection"]["features"] = (
-            ship_features + list(threat_features_map.values()) + weapon_features + line_features
-        )
+    def _build_map_message(self) -> dict:
+        # Generate map objects for Serge from the current game observations
+
+        # the threats and weapons observed (without duplicate: both ships see all of them), and those of the events
+        threats: dict[str, dict] = dict()
+        for threat in itertools.chain(self.obs["ship_0"]["threats"], self.obs["ship_1"]["threats"]):
+            threats.setdefault(threat["threat_id"], threat)
+        weapons: dict[str, dict] = dict()
+        for weapon in itertools.chain(self.obs["ship_0"]["weapons"], self.obs["ship_1"]["weapons"]):
+            weapons.setdefault(weapon["weapon_id"], weapon)
+        events = [
+            message for message in self.obs["messages"]
+            if isinstance(message, (WeaponEndMessage, WeaponMissMessage, ShipDestroyedMessage, ThreatMissMessage))
+        ]
+
+        # converting all their coordinates to long-lat at once
+        locations = [threat["location"] for threat in threats.values()]
+        locations += [weapon["location"] for weapon in weapons.values()]
+        for message in events:
+            if isinstance(message, (WeaponEndMessage, WeaponMissMessage)):
+                locations.append(message.weapon["location"])
+            elif isinstance(message, ThreatMissMessage):
+                locations.append(message.threat_obs["location"])
+        long_lats = iter(self.projection.to_long_lat(locations).tolist() if locations else [])
+
+        # generating threat features
+        threat_features_map: dict[str, dict] = {
+            threat_id: self._make_threat_dict(threat, next(long_lats)) for threat_id, threat in threats.items()
+        }
+
+        # generating weapon features
+        weapon_features: list[dict] = []
+        line_features: list[dict] = []
+        for weapon in weapons.values():
+            weapon_dict = self._make_weapon_dict(weapon, next(long_lats))
+            weapon_features.append(weapon_dict)
+
+            # create a line feature to connect the weapon to the targeted threat
+            target_id = weapon["target_id"]
+            if target_id in threat_features_map:
+                geojson_line = self._build_geojson_line(
+                    weapon_dict["geometry"]["coordinates"],
+                    threat_features_map[target_id]["geometry"]["coordinates"],
+                )
+                geojson_line["properties"]["id"] += target_id
+                line_features.append(geojson_line)
+
+        # process game events captured in messages
+        for message in events:
+            if isinstance(message, (WeaponEndMessage, WeaponMissMessage)):
+                missed = isinstance(message, WeaponMissMessage)
+                weapon_dict = self._make_weapon_dict(
+                    message.weapon,
+                    next(long_lats),
+                    "Missed" if missed else ("Hit" if message.destroyed_target else "Wasted"),
+                )
+                weapon_features.append(weapon_dict)
+            elif isinstance(message, ThreatMissMessage):
+                threat_dict = self._make_threat_dict(message.threat_obs, next(long_lats), missed=True)
+                threat_features_map[message.threat_obs["threat_id"]] = threat_dict
+
+        step_message = MAPPING_MESSAGE()
+
+        self._update_ship_features()
+        features = self.ship_features + list(threat_features_map.values()) + weapon_features + line_features
+        if self.map_encoder is None:
+            step_message["featureCollection"]["features"] = features
+        else:
+            step_message["featureCollection"] = self.map_encoder.encode(features)
 
         return step_message
 
-    def _update_serge_state_of_the_world(self) -> None:
+    def _update_serge_state_of_the_world(self, mapping_msg: dict = None) -> None:
         """
         Send a message to the serge server to update the serge state. (Separate from sim update, which occurs when
         entering planning phase).
+        :param mapping_msg: (dict) The map message, if already built (see _speculate).
         """
-        mapping_msg = self._build_map_message()
+        if mapping_msg is None:
+            with self.timers.time("map"):
+                mapping_msg = self._build_map_message()
         self.serge_game.send_message(mapping_msg)
 
     def _process_custom_message(self, message: dict) -> None:
@@ -568,7 +665,6 @@ class SergeEnvRunner:
         # Send launched messages
         for launch in launch_messages:
             text = f"Weapon Launched! {SHIP_NAMES[launch['ship_id']]} fired {launch['weapon_id']} ({self.WEAPON_INT_TO_STR[launch['weapon_type']]}) at {launch['threat_id']}."
-            self.launches.append(LaunchTuple(launch["ship_id"], launch["weapon_type"], launch["threat_id"]))
             self.serge_game.send_chat_message(text)
         # Send failed messages
         for fail in fail_messages:
@@ -579,9 +675,28 @@ class SergeEnvRunner:
         # Send the rest of the messages
         for other in other_messages:
             self.serge_game.send_chat_message(other.to_string())
-            # collecting the stats
-            if isinstance(other, WeaponEndMessage) and other.destroyed_target:
-                self.no_threats_eliminated += 1
+
+    def _send_catch_up_summary(self) -> None:
+        # the events of the turns processed in catch-up mode (see _catch_up_turn), condensed in one message
+        if not self.condensed_turns:
+            return
+        turns = [turn["turn"] for turn in self.condensed_turns]
+        messages = [message for turn in self.condensed_turns for message in turn["messages"]]
+        counts = {
+            "Interceptors launched": sum(len(turn["launched"]) for turn in self.condensed_turns),
+            "Failed launches": sum(len(turn["failed"]) for turn in self.condensed_turns),
+            "Threats destroyed": sum(isinstance(m, WeaponEndMessage) and m.destroyed_target for m in messages),
+            "Interceptors wasted": sum(isinstance(m, WeaponEndMessage) and not m.destroyed_target for m in messages),
+            "Interceptors missed": sum(isinstance(m, WeaponMissMessage) for m in messages),
+            "Threats that missed their target": sum(isinstance(m, ThreatMissMessage) for m in messages),
+        }
+        lines = [f"{event}: {count}" for event, count in counts.items() if count]
+        # (the ships destroyed are always told)
+        lines += [m.to_string() for m in messages if isinstance(m, ShipDestroyedMessage)]
+        span = f"Turn {turns[0]} was" if len(turns) == 1 else f"Turns {turns[0]} to {turns[-1]} were"
+        text = f"{span} adjudicated late, here is their summary:\n" + ("\n".join(lines) or "No events.")
+        self.serge_game.send_chat_message(text)
+        self.condensed_turns = []
 
     def _send_stats_messages(self):
         self.serge_game.send_chat_message("Here is the wargame's summary...")
@@ -601,19 +716,153 @@ class SergeEnvRunner:
                 f"Your taskforce managed to eliminate {self.no_threats_eliminated} threats."
             )
 
+    def _send_adjudication_messages(self, mapping_msg: dict = None) -> None:
+        # (the messages of steps 3 and 4 are posted together)
+        with self.serge_game.batch():
+            # 3. Send serge the new sim state (and what happened in the turns caught up with, if any)
+            self._update_serge_state_of_the_world(mapping_msg)
+            self._send_catch_up_summary()
+            # 4. Send serge sim-generated messages
+            with self.timers.time("obs"):
+                self._send_obs_messages()
+
+    def _step_and_build_map(self) -> dict:
+        """Execute the queued actions, and build the map message of the new state of the game."""
+        with self.timers.time("step"):
+            self._step_environment()
+        with self.timers.time("map"):
+            return self._build_map_message()
+
     def _process_adjudication_phase(self) -> None:
         """
         Processes all the actions that were sent during the turn
         """
         # 1. Generate the array of actions from WA messages (already done in self.process_custom_message)
-        # 2. Execute the queued actions and get the new observations
-        self._step_environment()
-        # 3. Send serge the new sim state
-        self._update_serge_state_of_the_world()
-        # 4. Send serge sim-generated messages
-        self._send_obs_messages()
+        # 2. Execute the queued actions and get the new observations (unless computed during the planning phase)
+        speculation = self._use_speculation()
+        mapping_msg = self._step_and_build_map() if speculation is None else speculation.map_message
+        self._send_adjudication_messages(mapping_msg)
         # 5. Generate and send new WA messages from AI
-        self._send_suggested_actions()
+        with self.serge_game.batch(), self.timers.time("suggestions"):
+            self._send_suggested_actions(None if speculation is None else speculation.suggested_actions)
+
+    async def _process_adjudication_phase_async(self) -> None:
+        """
+        Asynchronous version of <_process_adjudication_phase>: the messages are posted in the background while the AI
+        suggestions are computed, and the suggestions while the next messages are polled.
+        """
+        speculation = self._use_speculation()
+        if speculation is None:
+            # (the turn is computed in a worker thread, for the event loop to go on with the other games of a GameHost)
+            mapping_msg = await asyncio.to_thread(self._step_and_build_map)
+            self._send_adjudication_messages(mapping_msg)
+            actions = await asyncio.to_thread(self._get_suggested_actions)
+        else:
+            self._send_adjudication_messages(speculation.map_message)
+            actions = speculation.suggested_actions
+        with self.serge_game.batch(), self.timers.time("suggestions"):
+            self._send_suggested_actions(actions)
+
+    def _released_actions(self) -> list[Tuple[int, int, str]]:
+        # the actions released since the last adjudication phase, as <_process_turn_messages> will queue them, from the
+        #   messages received while waiting for the next one (and journaled)
+        actions = []
+        for message in self.journal.iter_messages(self.game_id, after=self.last_adjudication_msg_id):
+            message_type = message["messageType"]
+            if message_type == "InfoMessage" and message["phase"] == "adjudication":
+                if message["_id"] != self.last_adjudication_msg_id:
+                    break
+            elif message_type == "CustomMessage" and message["templateId"] == "WA Message":
+                action = self._released_action(message)
+                if action is not None:
+                    actions.append(action)
+        return actions
+
+    @property
+    def _owns_global_rng(self) -> bool:
+        # the threat outcomes are drawn from the global numpy random generator (see HatEnv.get_state), shared by the
+        #   games of a GameHost: only a runner alone in its process may roll it back, e.g. so that a speculation draws
+        #   the same outcomes as the adjudication (the hosted games draw afresh, rather than replay each other's draws)
+        return self.adjudication_slots is None
+
+    def _speculate(self, actions: list[Tuple[int, int, str]]) -> None:
+        """
+        Compute the next adjudication phase in advance, as if the actions released so far were the last ones: step the
+        environment, build the map message and compute the AI suggestions, on a copy of the runner (whose environment
+        is then restored). The result is kept in <speculation>, and used at the adjudication if the actions released
+        are the same (see _use_speculation).
+        :param actions: (list[Tuple[int, int, str]]) The actions released so far.
+        """
+        # (a shallow copy, sharing the environment, the Serge client, the agents... but not the attributes the turn
+        #   changes in place)
+        runner = copy.copy(self)
+        runner.turn_actions = list(actions)
+        runner.ship_features = copy.deepcopy(self.ship_features)
+        runner.map_encoder = copy.deepcopy(self.map_encoder)
+        runner.launches = list(self.launches)
+        env_state = self.env.get_state(self._owns_global_rng)
+        try:
+            runner._step_environment()
+            map_message = runner._build_map_message()
+            suggested_actions = runner._suggest()
+            self.suggestion_agent.stop()  # (before the environment is restored)
+            self.speculation = Speculation(
+                turn=self.turn,
+                actions=list(actions),
+                env_state=self.env.get_state(self._owns_global_rng),
+                # (whichever attributes the turn set)
+                attributes={name: value for name, value in vars(runner).items() if value is not vars(self).get(name)},
+                map_message=map_message,
+                suggested_actions=suggested_actions,
+            )
+        finally:
+            self.env.set_state(env_state, self._owns_global_rng)
+
+    def _refresh_speculation(self) -> None:
+        # speculate again while waiting for the adjudication phase, whenever the actions released change
+        if not self.speculate or self.terminated or self.truncated:
+            return
+        actions = self._released_actions()
+        if self.speculation is None or (self.speculation.turn, self.speculation.actions) != (self.turn, actions):
+            with self.timers.time("speculate"):
+                self._speculate(actions)
+
+    def _use_speculation(self) -> Speculation | None:
+        """
+        Take the outcome of the adjudication phase computed in advance, if it was for the actions queued this turn:
+        the state of the game is then set to it.
+        :return: (Speculation | None) The speculation used, None to process the adjudication phase.
+        """
+        speculation, self.speculation = self.speculation, None
+        if speculation is None:
+            return None
+        if (speculation.turn, speculation.actions) != (self.turn, self.turn_actions):
+            self.speculation_outcomes["discarded"] += 1
+            return None
+        self.speculation_outcomes["used"] += 1
+        self.suggestion_agent.stop()
+        self.env.set_state(speculation.env_state, self._owns_global_rng)
+        for name, value in speculation.attributes.items():
+            setattr(self, name, value)
+        return speculation
+
+    def _catch_up_turn(self) -> None:
+        """
+        Processes an adjudication phase already followed by others: its actions are executed, but its map, chat
+        messages and AI suggestions, stale by now, are not sent. Its events are summarized with the next turn
+        published instead (see _send_catch_up_summary), or at the end of the game if it ended with it.
+        """
+        if self._use_speculation() is None:
+            with self.timers.time("step"):
+                self._step_environment()
+            # the ships destroyed this turn stay so on the next map (as with a speculation, whose map updated them)
+            self._update_ship_features()
+        self.condensed_turns.append({
+            "turn": self.turn,
+            "launched": self.obs["launched"],
+            "failed": self.obs["failed"],
+            "messages": self.obs["messages"],
+        })
 
     def _read_serge_game_settings(self):
         game_message = self.serge_game.get_wargame_last()
@@ -626,28 +875,243 @@ class SergeEnvRunner:
                 if channel["name"] == self.ship_1_serge_name:
                     self.ship_1_channel_id = channel["uniqid"]
 
+    @staticmethod
+    def _find_adjudication_message(new_messages: list[dict]) -> str | None:
+        # looking for an InfoMessage with phase == "adjudication"
+        for message in new_messages:
+            if message["messageType"] == "InfoMessage" and message["phase"] == "adjudication":
+                print("\n")
+                return message["_id"]  # return the message ID to mark where this turn ends
+        return None
+
     def _wait_until_next_adjudication_phase(self) -> str:
+        with self.timers.time("wait"):
+            return self._wait_for_adjudication_message()
+
+    def _wait_for_adjudication_message(self) -> str:
         while True:
-            # Retrieve new messages from the server
-            new_messages = self.serge_game.get_new_messages()
+            self._refresh_speculation()
+            # Wait for and retrieve new messages from the server
+            adjudication_msg_id = self._find_adjudication_message(self.wait_strategy.next_messages(self.serge_game))
+            if adjudication_msg_id:
+                return adjudication_msg_id
+            print(".", end="", flush=True)
 
-            # looking for an InfoMessage with phase == "adjudication"
-            for message in new_messages:
-                if message["messageType"] == "InfoMessage" and message["phase"] == "adjudication":
-                    print("\n")
-                    return message["_id"]  # return the message ID to mark where this turn ends
+    async def _wait_until_next_adjudication_phase_async(self) -> str:
+        with self.timers.time("wait"):
+            return await self._wait_for_adjudication_message_async()
 
-            # Wait for a few seconds before checking for new messages again
+    async def _wait_for_adjudication_message_async(self) -> str:
+        while True:
+            await asyncio.to_thread(self._refresh_speculation)
+            new_messages = await self.wait_strategy.next_messages_async(self.serge_game)
+            adjudication_msg_id = self._find_adjudication_message(new_messages)
+            if adjudication_msg_id:
+                return adjudication_msg_id
             print(".", end="", flush=True)
-            time.sleep(self.WAIT_TIME_BETWEEN_POLLS)
+
+    def _record_turn(self, start: float) -> None:
+        # statistics of an adjudication phase processed since <start> (a time.perf_counter() value)
+        self.turns_processed.add(self.turn)
+        self.turn_processing_times.append(time.perf_counter() - start)
+        self.timers.observe("adjudication", self.turn_processing_times[-1])
+        try:
+            # (the ids are the timestamps of the messages, on the clock of the server)
+            started = datetime.fromisoformat(self.last_adjudication_msg_id)
+        except (TypeError, ValueError):
+            started = None
+        if started is not None:
+            self.adjudication_lags.append((datetime.now(UTC) - started).total_seconds())
+            self.timers.observe("lag", self.adjudication_lags[-1])
+        self._write_metrics()
+
+    def _write_metrics(self) -> None:
+        if self.metrics_file is None:
+            return
+        try:
+            self.timers.write(self.metrics_file, {"game": self.game_id})
+        except OSError as e:
+            warn(f"Metrics not written to {self.metrics_file}: {e}")
+
+    def _report_latencies(self) -> None:
+        # summary of the phase timers at the end of the game
+        print("Turn phases:")
+        for phase, summary in self.timers.summary().items():
+            print(f"  {phase}: {summary['count']} x, p50 {summary['p50_ms']:.1f} ms, p95 {summary['p95_ms']:.1f} ms, "
+                  f"max {summary['max_ms']:.1f} ms, total {summary['total_s']:.2f} s")
+        self._write_metrics()
 
     def _process_messages_in_the_last_turn(self, adjudication_msg_id: str) -> str | None:
-        # Retrieved messages afresh from Serge since the last turn
-        new_messages = self.serge_game.get_messages(since_msg_id=self.last_adjudication_msg_id)
+        # Retrieved messages afresh from Serge since the last turn (processed as they are parsed)
+        with self.timers.time("fetch"):
+            new_messages = self.serge_game.iter_messages(since_msg_id=self.last_adjudication_msg_id)
+            adjudicate, next_adjudication_msg_id = self._process_turn_messages(new_messages)
+        if adjudicate:
+            start = time.perf_counter()
+            if self.catch_up and next_adjudication_msg_id is not None:
+                self._catch_up_turn()
+            else:
+                self._process_adjudication_phase()
+            self._record_turn(start)
+            self._end_turn()
+        return next_adjudication_msg_id
+
+    async def _process_messages_in_the_last_turn_async(self, adjudication_msg_id: str) -> str | None:
+        with self.timers.time("fetch"):
+            new_messages = await self.serge_game.fetch_messages(since_msg_id=self.last_adjudication_msg_id)
+            adjudicate, next_adjudication_msg_id = self._process_turn_messages(new_messages)
+        if adjudicate:
+            start = time.perf_counter()
+            # (the games of a GameHost wait for a slot in turn)
+            async with self.adjudication_slots or contextlib.nullcontext():
+                if self.adjudication_slots is not None:
+                    self.timers.observe("slot", time.perf_counter() - start)
+                if self.catch_up and next_adjudication_msg_id is not None:
+                    await asyncio.to_thread(self._catch_up_turn)
+                else:
+                    await self._process_adjudication_phase_async()
+            self._record_turn(start)
+            if self.checkpoint_file is not None:
+                await self.serge_game.drain()  # (the checkpoint is saved once the messages of the turn are posted)
+            self._end_turn()
+        return next_adjudication_msg_id
+
+    def _end_turn(self) -> None:
+        # the messages of the runner processing this turn before a restart were skipped, the next ones are new
+        self.serge_game.sent_before.clear()
+        self.suggestions_sent = False
+        if self.checkpoint_file is not None:
+            self._save_checkpoint()
+
+    def _save_checkpoint(self) -> None:
+        """
+        Save the state of the game to the checkpoint file: the simulation state (including its random generators, the
+        global numpy one among them), where the game is in the Serge messages, and the statistics of the game (see
+        _load_checkpoint). The file is replaced atomically, so that a crash leaves the previous checkpoint.
+        """
+        checkpoint = {
+            "version": CHECKPOINT_VERSION,
+            "game_id": self.game_id,
+            "env": self.env.get_state(),
+            "step": (self.obs, self.reward, self.terminated, self.truncated, self.info),
+            "turn": self.turn,
+            "turns_processed": self.turns_processed,
+            "last_adjudication_msg_id": self.last_adjudication_msg_id,
+            "serge_turn": (self.serge_game.turn_number, self.serge_game.phase),
+            "ship_features": self.ship_features,  # (marked when a ship is destroyed)
+            "map_encoder": self.map_encoder,
+            "condensed_turns": self.condensed_turns,
+            "launches": [tuple(launch) for launch in self.launches],
+            "no_threats_eliminated": self.no_threats_eliminated,
+        }
+        try:
+            with atomic_write(self.checkpoint_file, "wb") as f:
+                pickle.dump(checkpoint, f, protocol=pickle.HIGHEST_PROTOCOL)
+        except OSError as e:
+            warn(f"Checkpoint not saved to {self.checkpoint_file}: {e}")
 
-        while new_messages:
+    def _load_checkpoint(self) -> bool:
+        """
+        Restore the state of the game from the checkpoint file, if any (see _save_checkpoint). The state of the global
+        numpy random generator is restored only by a runner alone in its process: the games of a GameHost share it, so
+        a resumed hosted game draws its threat outcomes afresh, rather than reset the generator of the other games.
+        :return: (bool) Whether the state was restored.
+        """
+        if self.checkpoint_file is None or not os.path.exists(self.checkpoint_file):
+            return False
+        try:
+            with open(self.checkpoint_file, "rb") as f:
+                checkpoint = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError) as e:
+            warn(f"Checkpoint {self.checkpoint_file} not loaded, starting the game again: {e}")
+            return False
+        if checkpoint.get("version") != CHECKPOINT_VERSION or checkpoint.get("game_id") != self.game_id:
+            warn(f"Checkpoint {self.checkpoint_file} is not one of game {self.game_id}, starting the game again")
+            return False
+
+        self.env.set_state(checkpoint["env"], self._owns_global_rng)
+        self.obs, self.reward, self.terminated, self.truncated, self.info = checkpoint["step"]
+        self.turn = checkpoint["turn"]
+        self.turns_processed = checkpoint["turns_processed"]
+        self.last_adjudication_msg_id = checkpoint["last_adjudication_msg_id"]
+        # the next messages are those after the last adjudication message processed
+        self.serge_game.last_msg_id = self.last_adjudication_msg_id
+        self.serge_game.turn_number, self.serge_game.phase = checkpoint["serge_turn"]
+        # (the encoder goes on from the last map sent, so that the maps sent again are skipped too)
+        self.ship_features = checkpoint["ship_features"]
+        self.map_encoder = checkpoint["map_encoder"]
+        self.condensed_turns = checkpoint["condensed_turns"]
+        self.launches = [LaunchTuple(*launch) for launch in checkpoint["launches"]]
+        self.no_threats_eliminated = checkpoint["no_threats_eliminated"]
+        return True
+
+    def _start_game(self) -> bool:
+        """
+        Start the game, or resume it from the checkpoint file if any. The runner then processes the turns after the
+        checkpoint, without sending again the messages it sent before crashing (see SergeGame.skip_sent), nor other AI
+        suggestions for the turn it was processing.
+        :return: (bool) Whether the game was resumed.
+        """
+        self.env = HatEnv(self.env_config)
+        self._reset_env()
+        self._read_serge_game_settings()
+        resumed = self._load_checkpoint()
+        if self.checkpoint_file is not None:
+            sent = self._messages_sent_since_checkpoint()
+            self.serge_game.skip_sent(sent)
+            # the suggestions depend on the agent (e.g. on the deadline of a search), so they may differ from those
+            #   sent before the restart: those of the turn are not sent again if any was (they are sent in one batch)
+            self.suggestions_sent = any(
+                message["messageType"] == "CustomMessage" and message["templateId"] == "WA Message"
+                and message["details"]["from"].get("roleId") == SUGGESTED_ACTION_TEMPLATE["details"]["from"]["roleId"]
+                for message in sent
+            )
+        if resumed:
+            print(f"Resuming game {self.game_id} at turn {self.turn}")
+        else:
+            self._update_serge_state_of_the_world()
+        return resumed
+
+    def _messages_sent_since_checkpoint(self) -> list[dict]:
+        # the messages of the game after the adjudication message of the turn following the checkpoint, i.e. those the
+        #   runner may have sent processing it before crashing (not those of the turn of the checkpoint, sent before),
+        #   or all of them before the first turn (e.g. the first map)
+        messages = self.serge_game.get_messages(since_msg_id=self.last_adjudication_msg_id)
+        if self.last_adjudication_msg_id is None:
+            return messages
+        for i, message in enumerate(messages):
+            if message["messageType"] == "InfoMessage" and message["phase"] == "adjudication":
+                if message["_id"] != self.last_adjudication_msg_id:
+                    return messages[i + 1:]
+        return []
+
+    def _end_game(self) -> None:
+        with self.serge_game.batch():
+            if self.condensed_turns:
+                # the game ended in a turn caught up with (see _catch_up_turn): its final state is published now
+                self._update_serge_state_of_the_world()
+                self._send_catch_up_summary()
+            self.serge_game.send_chat_message("Wargame ended!")
+            self._send_stats_messages()
+
+    def _remove_checkpoint(self) -> None:
+        # the game ended, a restarted runner has nothing to resume
+        if self.checkpoint_file is not None:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(self.checkpoint_file)
+
+    def _process_turn_messages(self, new_messages: Iterable[dict]) -> tuple[bool, str | None]:
+        """
+        Process the messages of a turn, up to its adjudication message.
+        :param new_messages: (Iterable[dict]) The messages since the last turn, in order (e.g. an iterator parsing
+            them as they are downloaded).
+        :return: (tuple[bool, str | None]) Whether the adjudication phase of the turn must be processed, and the id of
+            the next adjudication message if any.
+        """
+        adjudicate = False
+        new_messages = iter(new_messages)
+        for message in new_messages:
             # Process one message at a time
-            message = new_messages.pop(0)
             message_type = message["messageType"]
             if message_type == "CustomMessage":
                 # Process custom messages (Chat, WA)
@@ -662,9 +1126,7 @@ class SergeEnvRunner:
 
                     # process the adjudication phase
                     self.last_adjudication_msg_id = msg_id  # remember where we are
-                    if msg_turn_number not in self.turns_processed:
-                        self._process_adjudication_phase()
-                        self.turns_processed.add(self.turn)
+                    adjudicate = msg_turn_number not in self.turns_processed
                     # we've done with this turn, stop processing any more messages
                     break
             elif message_type == "MappingMessage":
@@ -677,31 +1139,115 @@ class SergeEnvRunner:
         adjudication_messages = filter(
             lambda m: m["messageType"] == "InfoMessage" and m["phase"] == "adjudication", new_messages
         )
-        try:
-            return next(adjudication_messages)["_id"]  # we will process until this adjudication message the next time
-        except StopIteration:
-            return None
+        # we will process until the next adjudication message the next time
+        return adjudicate, next((m["_id"] for m in adjudication_messages), None)
 
     def run(self):
-        self.env = HatEnv(self.env_config)
-        running = True
-
-        # initialize a new game
-        self._reset_env()
-        self._read_serge_game_settings()
-        self._update_serge_state_of_the_world()
+        # initialize a new game, or resume it
+        if not self._start_game() and self.checkpoint_file is not None:
+            self._save_checkpoint()
+        running = not (self.terminated or self.truncated)
 
         while running:
             adjudication_msg_id = self._wait_until_next_adjudication_phase()
-            while adjudication_msg_id:
-                # more than one turn may have passed, we keep processing until seeing no more adjudication messages
+            while adjudication_msg_id and not (self.terminated or self.truncated):
+                # more than one turn may have passed, we keep processing until seeing no more adjudication messages (or
+                #   until the end of the game)
                 adjudication_msg_id = self._process_messages_in_the_last_turn(adjudication_msg_id)
 
             if self.terminated or self.truncated:
                 running = False
-                self.serge_game.send_chat_message("Wargame ended!")
 
-        self._send_stats_messages()
+        self._end_game()
+        self._remove_checkpoint()
+        print(f"Serge traffic: {self.serge_game.transport.metrics}")
+        self.serge_game.close()
+        self._report_latencies()
+
+    async def run_async(self, max_in_flight: int = 4):
+        """
+        Run the game with an AsyncSergeGame: the messages are posted in the background, while the AI suggestions are
+        computed and the next messages are polled.
+        :param max_in_flight: (int) Max number of concurrent requests to Serge.
+        """
+        self.serge_game = AsyncSergeGame(
+            game_id=self.game_id,
+            server_url=self.url,
+            transport=self.transport,
+            max_in_flight=max_in_flight,
+            journal=self.journal,
+        )
+        self.serge_game.timers = self.timers
+        # initialize a new game, or resume it
+        if not self._start_game() and self.checkpoint_file is not None:
+            await self.serge_game.drain()
+            self._save_checkpoint()
+        running = not (self.terminated or self.truncated)
+
+        while running:
+            adjudication_msg_id = await self._wait_until_next_adjudication_phase_async()
+            while adjudication_msg_id and not (self.terminated or self.truncated):
+                # more than one turn may have passed, we keep processing until seeing no more adjudication messages (or
+                #   until the end of the game)
+                adjudication_msg_id = await self._process_messages_in_the_last_turn_async(adjudication_msg_id)
+
+            if self.terminated or self.truncated:
+                running = False
+
+        self._end_game()
+        await self.serge_game.drain()
+        self._remove_checkpoint()
+        print(f"Serge traffic: {self.serge_game.transport.metrics}")
+        self.serge_game.close()
+        self._report_latencies()
+
+
+def run_local_game(
+    max_game_minutes: int = 20,
+    planning_seconds: float = 0.1,
+    use_async: bool = False,
+    wait: str = "changes",
+    map_keyframe_interval: int = None,
+) -> dict:
+    """
+    Run a whole game against an in-process Serge stand-in (no network), and measure it.
+    :param max_game_minutes: (int) Truncating the game at the specified max game minutes.
+    :param planning_seconds: (float) Duration of the planning phases, in seconds.
+    :param use_async: (bool) Use the async run loop.
+    :param wait: (str) Name of the wait strategy (the stand-in serves a change feed).
+    :param map_keyframe_interval: (int) Send the map as deltas, with a keyframe every this many turns (None to send
+        it whole each turn).
+    :return: (dict) The game duration, turn processing times, durations of the phases of the turns (see PhaseTimers),
+        outcomes of the speculations, and the Serge traffic (client and server sides).
+    """
+    server = SergeStandIn(planning_seconds=planning_seconds)
+    runner = SergeEnvRunner(
+        game_id="wargame-local",
+        server_url=server.url,
+        max_game_minutes=max_game_minutes,
+        wait_strategy=WAIT_STRATEGIES[wait](),
+        map_keyframe_interval=map_keyframe_interval,
+    )
+    # the game stops advancing at the last turn of the simulation, so a runner falling behind catches up
+    server.max_turns = -(-max_game_minutes * 60 // runner.env_config.seconds_per_timestep)
+    with server:
+        start = time.perf_counter()
+        if use_async:
+            asyncio.run(runner.run_async())
+        else:
+            runner.run()
+        duration = time.perf_counter() - start
+        turn_times = np.array(runner.turn_processing_times) * 1000
+        return {
+            "duration_s": round(duration, 3),
+            "turns": len(turn_times),
+            "turn_p50_ms": round(float(np.percentile(turn_times, 50)), 3) if len(turn_times) else None,
+            "turn_max_ms": round(float(turn_times.max()), 3) if len(turn_times) else None,
+            "phases": runner.timers.summary(),
+            "speculations": dict(runner.speculation_outcomes),
+            "client": runner.serge_game.transport.metrics.as_dict(),
+            "server": server.stats(),
+        }
 
 
 @click.command()
@@ -714,9 +1260,114 @@ class SergeEnvRunner:
     type=int,
     help="Truncating the game at the specified max game minutes",
 )
-def main(game_id: str, max_game_minutes: int):
-    runner = SergeEnvRunner(game_id=game_id, max_game_minutes=max_game_minutes)
-    runner.run()
+@click.option(
+    "-w",
+    "--wait",
+    required=False,
+    default="adaptive",
+    type=click.Choice(sorted(WAIT_STRATEGIES)),
+    help="How to wait for new messages: adaptive or fixed polling, or change feed (served by the local stand-in only, "
+    "falling back to adaptive polling)",
+)
+@click.option(
+    "--async/--sync",
+    "use_async",
+    default=False,
+    help="Post the messages to Serge in the background, overlapping them with the polls",
+)
+@click.option("-u", "--server-url", default="https://serge-inet.herokuapp.com", help="URL of the Serge server")
+@click.option(
+    "-j",
+    "--journal",
+    default=None,
+    type=click.Path(dir_okay=False),
+    help="SQLite file journaling the game messages (e.g. for provenance/generate.py), kept in memory if not set",
+)
+@click.option(
+    "--local",
+    is_flag=True,
+    help="Run a whole game against an in-process Serge stand-in (GAME_ID is ignored), and print its measurements",
+)
+@click.option(
+    "--planning-seconds",
+    default=0.1,
+    type=float,
+    help="Duration of the planning phases of the local Serge stand-in, in seconds",
+)
+@click.option(
+    "--map-keyframes",
+    "map_keyframe_interval",
+    default=None,
+    type=click.IntRange(min=1),
+    help="Send the map as deltas, with the whole map every N turns (for clients decoding them, not the Serge map)",
+)
+@click.option(
+    "--metrics-file",
+    default=None,
+    type=click.Path(dir_okay=False),
+    help="File of the latency histograms of the phases of the turns, in the Prometheus text format",
+)
+@click.option(
+    "-c",
+    "--checkpoint",
+    "checkpoint_file",
+    default=None,
+    type=click.Path(dir_okay=False),
+    help="File of the state of the game, saved after each turn, to resume the game from it after a restart",
+)
+@click.option(
+    "--catch-up/--no-catch-up",
+    default=True,
+    help="When several turns were adjudicated meanwhile, publish only the last one, with a summary of the others",
+)
+@click.option(
+    "--speculate/--no-speculate",
+    default=True,
+    help="Compute the next turn during the planning phase, to publish it as soon as it is adjudicated",
+)
+def main(
+    game_id: str,
+    max_game_minutes: int,
+    wait: str,
+    use_async: bool,
+    server_url: str,
+    journal: str,
+    local: bool,
+    planning_seconds: float,
+    map_keyframe_interval: int,
+    metrics_file: str,
+    checkpoint_file: str,
+    catch_up: bool,
+    speculate: bool,
+):
+    if local:
+        print(
+            json.dumps(
+                run_local_game(max_game_minutes, planning_seconds, use_async, wait, map_keyframe_interval), indent=2
+            )
+        )
+        return
+
+    if wait == "fixed":
+        wait_strategy = FixedPolling(SergeEnvRunner.WAIT_TIME_BETWEEN_POLLS)
+    else:
+        wait_strategy = WAIT_STRATEGIES[wait]()
+    runner = SergeEnvRunner(
+        game_id=game_id,
+        server_url=server_url,
+        max_game_minutes=max_game_minutes,
+        wait_strategy=wait_strategy,
+        journal=None if journal is None else MessageJournal(journal),
+        map_keyframe_interval=map_keyframe_interval,
+        metrics_file=metrics_file,
+        checkpoint_file=checkpoint_file,
+        catch_up=catch_up,
+        speculate=speculate,
+    )
+    if use_async:
+        asyncio.run(runner.run_async())
+    else:
+        runner.run()
 
 
 if __name__ == "__main__":
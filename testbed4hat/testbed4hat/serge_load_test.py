@@ -0,0 +1,229 @@
+# Copyright 2024 The Johns Hopkins University Applied Physics Laboratory LLC
+# All rights reserved.
+#
+# Licensed under the 3-Clause BSD License (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://opensource.org/licenses/BSD-3-Clause
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+from collections import Counter
+import contextlib
+import io
+import json
+import re
+import sys
+import time
+import warnings
+
+import click
+import numpy as np
+
+from game_host import GameHost
+from serge import AsyncSergeGame
+from serge_env_runner import SergeEnvRunner
+from testbed4hat.provenance.generate import ShipDefenceWorld
+from testbed4hat.testbed4hat.phase_timers import PhaseTimers
+from testbed4hat.testbed4hat.player_bots import BotStats, CommandingOfficerBot, ReactionTime
+from testbed4hat.testbed4hat.serge_server import SergeStandIn
+from testbed4hat.testbed4hat.wait_strategies import AdaptivePolling, ChangeFeed
+
+BOT_CHANGE_FEED_TIMEOUT = 5.  # seconds, so that the bots of a finished game stop waiting soon
+
+
+def _percentiles(values: list[float], scale: float = 1.) -> dict:
+    if not values:
+        return {}
+    values = np.array(values) * scale
+    return {name: round(float(np.percentile(values, q)), 3) for name, q in (("p50", 50), ("p95", 95), ("max", 100))}
+
+
+class LoadTest:
+    """
+    Many concurrent games against an in-process Serge stand-in: in each of them, a SergeEnvRunner (the AI Assistant)
+    and, optionally, the two commanding officers played by bots (see CommandingOfficerBot). The runners are hosted by
+    a GameHost, on the asyncio event loop of the bots.
+    """
+    def __init__(self, num_games: int = 100, max_game_minutes: int = 10, planning_seconds: float = 2.,
+                 bots: bool = True, decision_weights: tuple[float, float, float] = (0.7, 0.15, 0.15),
+                 reaction_time: ReactionTime = None, manual_probability: float = 0.2, max_in_flight: int = 4,
+                 provenance: bool = False, map_keyframe_interval: int = None, max_adjudications: int = 1,
+                 seed: int = 0):
+        """
+        :param num_games: (int) Number of concurrent games.
+        :param max_game_minutes: (int) Truncating the games at the specified max game minutes.
+        :param planning_seconds: (float) Duration of the planning phases, in seconds. The reaction times of the bots
+            are scaled so that a planning phase lasts a game step.
+        :param bots: (bool) Play the commanding officers with bots (or else, the AI suggestions are never released).
+        :param decision_weights: (tuple[float, float, float]) Relative frequencies of releasing, amending and
+            rejecting a suggestion.
+        :param reaction_time: (ReactionTime) Time the bots take to decide on a suggestion, in game seconds.
+        :param manual_probability: (float) Probability of a manual WA message of each bot in each planning phase.
+        :param max_in_flight: (int) Max number of concurrent requests of each client.
+        :param provenance: (bool) Generate the provenance of each game at its end (see provenance/generate.py).
+        :param map_keyframe_interval: (int) Send the maps as deltas, with a keyframe every this many turns (None to
+            send them whole each turn).
+        :param max_adjudications: (int) Max number of games processing an adjudication phase at once (see GameHost).
+        :param seed: (int) Seed of the bots.
+        """
+        self.num_games = num_games
+        self.max_game_minutes = max_game_minutes
+        self.planning_seconds = planning_seconds
+        self.bots = bots
+        self.decision_weights = decision_weights
+        self.reaction_time = reaction_time
+        self.manual_probability = manual_probability
+        self.max_in_flight = max_in_flight
+        self.provenance = provenance
+        self.map_keyframe_interval = map_keyframe_interval
+        self.max_adjudications = max_adjudications
+        self.seed = seed
+
+    def _make_bots(self, server_url: str, game_id: str, index: int, time_scale: float) -> list[CommandingOfficerBot]:
+        if not self.bots:
+            return []
+        return [
+            CommandingOfficerBot.for_ship(
+                AsyncSergeGame(game_id, server_url=server_url, max_in_flight=2),
+                ship,
+                decision_weights=self.decision_weights,
+                reaction_time=self.reaction_time,
+                manual_probability=self.manual_probability,
+                time_scale=time_scale,
+                wait_strategy=ChangeFeed(BOT_CHANGE_FEED_TIMEOUT, fallback=AdaptivePolling(min_interval=0.05)),
+                seed=(self.seed * self.num_games + index) * 2 + s,
+            )
+            for s, ship in enumerate(("alpha", "bravo"))
+        ]
+
+    async def _play_all(self, host: GameHost, server: SergeStandIn) -> list[CommandingOfficerBot]:
+        bots = []
+        for i in range(self.num_games):
+            game_id = f"wargame-load-{i:04d}"
+            # (the stand-in serves a change feed)
+            runner = host.add_game(game_id, max_game_minutes=self.max_game_minutes,
+                                   map_keyframe_interval=self.map_keyframe_interval,
+                                   wait_strategy=ChangeFeed(fallback=AdaptivePolling()))
+            # the games stop advancing at the last turn of the simulation, so that runners falling behind catch up
+            server.max_turns = -(-self.max_game_minutes * 60 // runner.env_config.seconds_per_timestep)
+            bots += self._make_bots(
+                server.url, game_id, i, self.planning_seconds / runner.env_config.seconds_per_timestep
+            )
+        bot_tasks = [asyncio.create_task(bot.run()) for bot in bots]
+        try:
+            await host.run()
+            return bots
+        finally:
+            for task in bot_tasks:
+                task.cancel()
+            await asyncio.gather(*bot_tasks, return_exceptions=True)
+            for bot in bots:
+                await bot.game.drain()
+            # (closing waits for the last change feed request of the bots)
+            await asyncio.gather(*(asyncio.to_thread(bot.game.close) for bot in bots))
+
+    def run(self, quiet: bool = True) -> dict:
+        """
+        Play all the games, and measure them.
+        :param quiet: (bool) Hide the output of the runners.
+        :return: (dict) The outcome of the games, the turn processing times of the runners, the bot decisions, the
+            warnings issued, the Serge traffic (client and server sides), and the provenance generation if enabled.
+        """
+        server = SergeStandIn(planning_seconds=self.planning_seconds)
+        with server, warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always")
+            with contextlib.redirect_stdout(io.StringIO() if quiet else sys.stdout), \
+                    GameHost(server.url, self.max_adjudications, self.max_in_flight) as host:
+                start = time.perf_counter()
+                bots = asyncio.run(self._play_all(host, server))
+                duration = time.perf_counter() - start
+            server_stats = server.stats()
+            runners = [game.runner for game in host.games.values()]
+            provenance = self._generate_provenance(server, runners) if self.provenance else None
+
+        errors = Counter(repr(game.error) for game in host.games.values() if game.error is not None)
+        game_durations = [game.ended - game.started for game in host.games.values() if game.error is None]
+        turn_times = [t for runner in runners for t in runner.turn_processing_times]
+        phases = PhaseTimers()  # the phases of the turns of all the games
+        for runner in runners:
+            for phase, durations in runner.timers.durations.items():
+                phases.durations[phase] += durations
+        clients = [runner.serge_game for runner in runners] + [bot.game for bot in bots]
+        traffic = Counter()
+        for transport in {id(client.transport): client.transport for client in clients}.values():
+            traffic.update(transport.metrics.as_dict())
+        bot_stats = BotStats()
+        for bot in bots:
+            bot_stats.add(bot.stats)
+        return {
+            "games": self.num_games,
+            "completed": len(game_durations),
+            "errors": dict(errors.most_common(5)),
+            "duration_s": round(duration, 3),
+            "game_duration_s": _percentiles(game_durations),
+            "turns": len(turn_times),
+            "turn_processing_ms": _percentiles(turn_times, 1000),
+            "adjudication_lag_s": _percentiles([lag for runner in runners for lag in runner.adjudication_lags]),
+            "phases": phases.summary(),
+            "speculations": dict(sum((runner.speculation_outcomes for runner in runners), Counter())),
+            "rejected_messages": sum(not ok for client in clients for ok in client.results.values()),
+            "warnings": dict(Counter(re.sub(r"\d+", "#", str(w.message))[:100] for w in caught).most_common(5)),
+            "bots": bot_stats.as_dict(),
+            "client": {name: round(value, 3) for name, value in traffic.items()},
+            "server": server_stats,
+            **({"provenance": provenance} if provenance is not None else {}),
+        }
+
+    @staticmethod
+    def _generate_provenance(server: SergeStandIn, runners: list[SergeEnvRunner]) -> dict:
+        # the provenance of each game, generated from its messages as at the end of an exercise (from the journal of
+        #   its runner, so only the messages posted since the runner's last poll are downloaded)
+        times, bindings, errors = [], 0, Counter()
+        for runner in runners:
+            world = ShipDefenceWorld(runner.game_id, server_url=server.url, journal=runner.journal)
+            start = time.perf_counter()
+            try:
+                world.process_messages(world.serge.iter_messages())
+            except Exception as e:
+                errors[repr(e)[:80]] += 1
+            else:
+                times.append(time.perf_counter() - start)
+                bindings += len(world.bindings)
+            world.serge.close()
+        return {"games": len(times), "errors": dict(errors.most_common(5)), "bindings": bindings,
+                "game_ms": _percentiles(times, 1000)}
+
+
+@click.command()
+@click.option("-n", "--games", default=100, type=int, help="Number of concurrent games")
+@click.option("-m", "--max-game-minutes", default=10, type=int, help="Truncating the games at the specified minutes")
+@click.option("--planning-seconds", default=2., type=float, help="Duration of the planning phases, in seconds")
+@click.option("--bots/--no-bots", default=True, help="Play the commanding officers with bots")
+@click.option("--reaction-median", default=20., type=float, help="Median reaction time of the bots, in game seconds")
+@click.option("--manual-probability", default=0.2, type=float, help="Probability of a manual WA message per phase")
+@click.option("--provenance", is_flag=True, help="Generate the provenance of each game, and measure it")
+@click.option("--map-keyframes", "map_keyframe_interval", default=None, type=click.IntRange(min=1),
+              help="Send the maps as deltas, with the whole map every N turns")
+@click.option("-a", "--max-adjudications", default=1, type=click.IntRange(min=1),
+              help="Max number of games processing an adjudication phase at once")
+@click.option("--seed", default=0, type=int, help="Seed of the bots")
+def main(games: int, max_game_minutes: int, planning_seconds: float, bots: bool, reaction_median: float,
+         manual_probability: float, provenance: bool, map_keyframe_interval: int, max_adjudications: int,
+         seed: int):
+    """Load test of SergeEnvRunner: many concurrent games against an in-process Serge stand-in."""
+    load_test = LoadTest(games, max_game_minutes, planning_seconds, bots=bots,
+                         reaction_time=ReactionTime(median=reaction_median), manual_probability=manual_probability,
+                         provenance=provenance, map_keyframe_interval=map_keyframe_interval,
+                         max_adjudications=max_adjudications, seed=seed)
+    print(json.dumps(load_test.run(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+# Copyright 2024 The Johns Hopkins University Applied Physics Laboratory LLC
+# All rights reserved.
+#
+# Licensed under the 3-Clause BSD License (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://opensource.org/licenses/BSD-3-Clause
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import contextlib
+from copy import deepcopy
+from functools import partial
+import io
+import json
+import time
+
+import click
+import numpy as np
+
+from serge import MSG_MAPPING_SHIPS
+from serge_env_runner import (
+    MAPPING_MESSAGE,
+    SUGGESTED_ACTION_MESSAGE,
+    SUGGESTED_ACTION_TEMPLATE,
+    THREAT_FEATURE,
+    THREAT_TEMPLATE,
+    WEAPON_FEATURE,
+    WEAPON_TEMPLATE,
+    SergeEnvRunner,
+)
+from testbed4hat.testbed4hat.agent_benchmark import synthetic_observation
+
+DEFAULT_RAID_SIZES = (10, 100, 500)
+
+# the templates the runner deep-copied for each feature and message, before they were compiled
+DEEPCOPY_TEMPLATES = {
+    THREAT_FEATURE: THREAT_TEMPLATE,
+    WEAPON_FEATURE: WEAPON_TEMPLATE,
+    SUGGESTED_ACTION_MESSAGE: SUGGESTED_ACTION_TEMPLATE,
+    MAPPING_MESSAGE: MSG_MAPPING_SHIPS,
+}
+
+
+@contextlib.contextmanager
+def deepcopy_templates():
+    """Build the runner documents by deep-copying their templates, as before they were compiled."""
+    builders = {template: template.build for template in DEEPCOPY_TEMPLATES}
+    try:
+        for template, source in DEEPCOPY_TEMPLATES.items():
+            template.build = partial(deepcopy, source)
+        yield
+    finally:
+        for template, build in builders.items():
+            template.build = build
+
+
+def _build_turn_documents(runner: SergeEnvRunner, actions: list) -> list[dict]:
+    # the documents a runner builds at each adjudication: the map and the AI suggestions
+    return [runner._build_map_message()] + [runner._make_suggested_action_message(a) for a in actions]
+
+
+def _time_calls(function, repeats: int) -> np.ndarray:
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return np.array(times) * 1000
+
+
+def benchmark_message_builders(raid_sizes=DEFAULT_RAID_SIZES, repeats: int = 50, seed: int = 0) -> list[dict]:
+    """
+    Time the documents a runner builds at each adjudication (the map message and a suggestion per threat) on synthetic
+    observations, with the compiled templates and with the deepcopy of the templates.
+    :param raid_sizes: (Iterable[int]) Numbers of threats of the observations.
+    :param repeats: (int) Number of timed turns per raid size and builder.
+    :param seed: (int) Seed of the synthetic observations.
+    :return: (list[dict]) Latency of each builder (p50 and p99, in milliseconds) and speedup, per raid size.
+    """
+    runner = SergeEnvRunner("wargame-benchmark", server_url="http://localhost")
+    runner.turn = 0
+    results = []
+    for num_threats in raid_sizes:
+        with contextlib.redirect_stdout(io.StringIO()):  # (the environment prints its config)
+            runner.obs = synthetic_observation(runner.env_config, num_threats, seed=seed)
+        runner.ship_features = None
+        threats = runner.obs["ship_0"]["threats"]
+        actions = [(i % 2, (i // 2) % 2, threat["threat_id"]) for i, threat in enumerate(threats)]
+
+        documents = _build_turn_documents(runner, actions)
+        with deepcopy_templates():
+            if _build_turn_documents(runner, actions) != documents:
+                raise AssertionError("The compiled templates do not build the same documents as deepcopy")
+            deepcopy_times = _time_calls(partial(_build_turn_documents, runner, actions), repeats)
+        compiled_times = _time_calls(partial(_build_turn_documents, runner, actions), repeats)
+        result = {"num_threats": num_threats, "num_features": len(documents[0]["featureCollection"]["features"])}
+        for name, times in (("deepcopy", deepcopy_times), ("compiled", compiled_times)):
+            result[name] = {"p50_ms": round(float(np.percentile(times, 50)), 4),
+                            "p99_ms": round(float(np.percentile(times, 99)), 4)}
+        result["speedup"] = round(float(np.median(deepcopy_times) / np.median(compiled_times)), 2)
+        results.append(result)
+    runner.serge_game.close()
+    return results
+
+
+@click.command()
+@click.option("-n", "--num-threats", "raid_sizes", multiple=True, type=int,
+              help=f"Number of threats in the observations (repeatable, default: {DEFAULT_RAID_SIZES}).")
+@click.option("-r", "--repeats", default=50, type=int, help="Number of timed turns per raid size and builder.")
+@click.option("-s", "--seed", default=0, type=int, help="Seed of the synthetic observations.")
+def main(raid_sizes: tuple, repeats: int, seed: int):
+    """Time the Serge documents built by the runner each turn, with compiled templates and with deepcopy."""
+    print(json.dumps(benchmark_message_builders(raid_sizes or DEFAULT_RAID_SIZES, repeats, seed), indent=2))
+
+
+if __name__ == "__main__":
+    main()
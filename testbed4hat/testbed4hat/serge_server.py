@@ -0,0 +1,348 @@
+# Copyright 2024 The Johns Hopkins University Applied Physics Laboratory LLC
+# All rights reserved.
+#
+# Licensed under the 3-Clause BSD License (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://opensource.org/licenses/BSD-3-Clause
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import bisect
+from collections import Counter
+from copy import deepcopy
+from datetime import datetime, timedelta, UTC
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+from pathlib import Path
+import threading
+import time
+from typing import Union
+from urllib.parse import parse_qs, unquote, urlsplit
+
+DEFAULT_TEMPLATE_PATH = Path(__file__).resolve().parents[2] / "serge-data" / "initial-game-template.json"
+INITIAL_WARGAME_ID = "initial_wargame"
+
+
+class LocalGame:
+    def __init__(self, game_id: str, template: dict, planning_seconds: float, adjudication_seconds: float,
+                 auto_advance: bool = True, max_turns: int = None):
+        """
+        A wargame of the stand-in server: its documents (sorted by id, as in Serge) and its phase clock.
+        :param game_id: (str) The game id.
+        :param template: (dict) The game definition (the "initial_wargame" document).
+        :param planning_seconds: (float) Duration of the planning phases, in seconds.
+        :param adjudication_seconds: (float) Duration of the adjudication phases, in seconds.
+        :param auto_advance: (bool) Advance the phases on the clock, or only with <advance_phase>.
+        :param max_turns: (int) Stop advancing after the adjudication of this turn (None for no limit).
+        """
+        self.game_id = game_id
+        self.template = template
+        self.planning_seconds = planning_seconds
+        self.adjudication_seconds = adjudication_seconds
+        self.auto_advance = auto_advance
+        self.max_turns = max_turns
+        self.docs: dict[str, dict] = {}
+        self.ids: list[str] = []  # sorted document ids
+        self.changed = threading.Condition()
+        self._last_timestamp: Union[datetime, None] = None
+
+        self.turn = template.get("gameTurn", 0)
+        self.phase = template.get("phase", "adjudication")
+        self._insert(INITIAL_WARGAME_ID, template)
+        self._post_info_message()
+
+    def _new_id(self) -> str:
+        # ids are timestamps, as set by the clients (see SergeGame._next_timestamp), but with microseconds so that
+        #   they never conflict with the (millisecond) ids of the clients
+        now = datetime.now(UTC)
+        if self._last_timestamp is not None and now <= self._last_timestamp:
+            now = self._last_timestamp + timedelta(microseconds=1)
+        if now.microsecond % 1000 == 0:
+            now += timedelta(microseconds=1)
+        self._last_timestamp = now
+        return now.isoformat(timespec="microseconds").replace("+00:00", "Z")
+
+    def _insert(self, doc_id: str, doc: dict) -> bool:
+        # must hold the <changed> lock
+        if doc_id in self.docs:
+            return False
+        self.docs[doc_id] = doc
+        bisect.insort(self.ids, doc_id)
+        return True
+
+    def _post_info_message(self) -> None:
+        with self.changed:
+            message = {key: value for key, value in self.template.items() if key != "_rev"}
+            message.update({
+                "_id": self._new_id(),
+                "messageType": "InfoMessage",
+                "wargameInitiated": True,
+                "gameTurn": self.turn,
+                "phase": self.phase,
+            })
+            if self.phase == "adjudication":
+                message["adjudicationStartTime"] = datetime.now(UTC).isoformat(timespec="seconds")
+            self._insert(message["_id"], message)
+            self.last_info_id = message["_id"]
+            self.phase_end = time.monotonic() + (
+                self.planning_seconds if self.phase == "planning" else self.adjudication_seconds
+            )
+            self.changed.notify_all()
+
+    @property
+    def finished(self) -> bool:
+        return self.max_turns is not None and self.turn >= self.max_turns and self.phase == "adjudication"
+
+    def advance_phase(self) -> None:
+        """End the current phase: planning goes to adjudication, and adjudication to the planning of the next turn."""
+        with self.changed:
+            if self.phase == "planning":
+                self.phase = "adjudication"
+            else:
+                self.turn += 1
+                self.phase = "planning"
+            self._post_info_message()
+
+    def tick(self) -> None:
+        if self.auto_advance and not self.finished and time.monotonic() >= self.phase_end:
+            self.advance_phase()
+
+    def put(self, docs: list[dict]) -> list[str]:
+        """Add documents, and return the ids of those rejected because their id already exists."""
+        with self.changed:
+            conflicts = [doc["_id"] for doc in docs if not self._insert(doc["_id"], doc)]
+            self.changed.notify_all()
+        return conflicts
+
+    def since(self, doc_id: str = None) -> list[dict]:
+        """Documents whose id is after <doc_id> (all of them if None), sorted by id."""
+        with self.changed:
+            start = 0 if doc_id is None else bisect.bisect_right(self.ids, doc_id)
+            return [self.docs[i] for i in self.ids[start:]]
+
+    def wait_since(self, doc_id: Union[str, None], timeout: float) -> list[dict]:
+        """Wait (at most <timeout> seconds) for documents after <doc_id>, excluding the game definition."""
+        def new_docs():
+            return [doc for doc in self.since(doc_id) if doc["_id"] != INITIAL_WARGAME_ID]
+
+        with self.changed:
+            self.changed.wait_for(new_docs, timeout)
+            return new_docs()
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep the connections alive
+    server: "_StandInHTTPServer"
+
+    def _respond(self, status: int, payload: dict) -> None:
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        self.server.stand_in.count(self.command, self._route, len(body))
+
+    def _parse(self) -> tuple[list[str], dict]:
+        url = urlsplit(self.path)
+        return [unquote(p) for p in url.path.split("/") if p], parse_qs(url.query)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length)) if length else None
+
+    def do_GET(self):
+        parts, query = self._parse()
+        stand_in = self.server.stand_in
+        self._route = "/".join(["{wargame}"] + parts[1:2]) if parts else ""
+        if parts == ["wargameList"]:
+            self._route = "wargameList"
+            return self._respond(200, {"msg": "ok", "data": [{"name": name} for name in stand_in.games]})
+        if len(parts) == 3 and parts[0] == "get":
+            self._route = "get"
+            game = stand_in.get_game(parts[1])
+            doc = game.docs.get(parts[2]) if game else None
+            return self._respond(200 if doc else 404, {"msg": "ok" if doc else "not found", "data": doc})
+
+        game = stand_in.get_game(parts[0]) if parts else None
+        if game is None:
+            return self._respond(404, {"msg": "not found"})
+        if len(parts) == 1:
+            return self._respond(200, {"msg": "ok", "data": game.since()})
+        if parts[1:] == ["last"]:
+            return self._respond(200, {"msg": "ok", "data": [game.docs[game.last_info_id]]})
+        if len(parts) == 3 and parts[1] == "lastDoc":
+            return self._respond(200, {"msg": "ok", "data": game.since(parts[2])})
+        if parts[1:] == ["changes"] and stand_in.change_feed:
+            since = query.get("since", [None])[0]
+            timeout = min(float(query.get("timeout", ["25000"])[0]) / 1000, stand_in.max_change_feed_timeout)
+            return self._respond(200, {"msg": "ok", "data": game.wait_since(since, timeout)})
+        return self._respond(404, {"msg": "not found"})
+
+    def do_PUT(self):
+        parts, query = self._parse()
+        stand_in = self.server.stand_in
+        try:
+            body = self._read_json()
+        except ValueError:
+            self._route = "invalid"
+            return self._respond(400, {"msg": "invalid JSON"})
+
+        if len(parts) == 2 and parts[0] == "bulkDocs" and stand_in.bulk_docs:
+            self._route = "bulkDocs"
+            game = stand_in.get_game(parts[1])
+            if game is None or not isinstance(body, list) or not all("_id" in doc for doc in body):
+                return self._respond(400, {"msg": "err"})
+            stand_in.received_docs += len(body)
+            conflicts = game.put(body)
+            if conflicts:
+                return self._respond(409, {"msg": f"conflict: {conflicts}"})
+            return self._respond(200, {"msg": "ok"})
+
+        self._route = "{wargame}"
+        game = stand_in.get_game(parts[0]) if len(parts) == 1 else None
+        if game is None:
+            return self._respond(404, {"msg": "not found"})
+        if not isinstance(body, dict) or "_id" not in body:
+            return self._respond(400, {"msg": "err"})
+        stand_in.received_docs += 1
+        if game.put([body]):
+            return self._respond(409, {"msg": "conflict"})
+        return self._respond(200, {"msg": "ok", "data": body})
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _StandInHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    stand_in: "SergeStandIn"
+
+
+class SergeStandIn:
+    """
+    In-process stand-in of a Serge server, for offline end-to-end runs and load tests. It serves the endpoints used
+    by SergeGame and serge_client (GET /{wargame}, /{wargame}/last, /{wargame}/lastDoc/{id}, /get/{wargame}/{id},
+    /wargameList, PUT /{wargame} and /bulkDocs/{wargame}), plus the change feed of SergeGame.wait_for_messages.
+    Games are created from a game definition (serge-data/initial-game-template.json by default), and their phases
+    alternate on a clock: planning for <planning_seconds>, then adjudication for <adjudication_seconds>.
+    Usage:
+        with SergeStandIn(planning_seconds=0.1) as server:
+            game = SergeGame("wargame-local", server_url=server.url)
+    """
+    def __init__(self, template_path: Union[str, Path] = DEFAULT_TEMPLATE_PATH, planning_seconds: float = 120.,
+                 adjudication_seconds: float = 0., auto_advance: bool = True, max_turns: int = None,
+                 auto_create: bool = True, change_feed: bool = True, bulk_docs: bool = True,
+                 host: str = "127.0.0.1", port: int = 0):
+        """
+        :param template_path: (str | Path) JSON file of the game definition.
+        :param planning_seconds: (float) Duration of the planning phases, in seconds.
+        :param adjudication_seconds: (float) Duration of the adjudication phases, in seconds.
+        :param auto_advance: (bool) Advance the phases on the clock, or only with <advance_phase>.
+        :param max_turns: (int) Stop advancing the games after the adjudication of this turn (None for no limit).
+        :param auto_create: (bool) Create a game on the first request to its id (or else only with <create_game>).
+        :param change_feed: (bool) Serve the change feed (GET /{wargame}/changes).
+        :param bulk_docs: (bool) Serve the bulk endpoint (PUT /bulkDocs/{wargame}).
+        :param host: (str) Host to listen on.
+        :param port: (int) Port to listen on (0 for any free port).
+        """
+        with open(template_path) as f:
+            self.template = json.load(f)
+        self.planning_seconds = planning_seconds
+        self.adjudication_seconds = adjudication_seconds
+        self.auto_advance = auto_advance
+        self.max_turns = max_turns
+        self.auto_create = auto_create
+        self.change_feed = change_feed
+        self.bulk_docs = bulk_docs
+        self.max_change_feed_timeout = 30.
+        self.games: dict[str, LocalGame] = {}
+        self.requests: Counter = Counter()  # number of requests, by method and route
+        self.sent_bytes = 0
+        self.received_docs = 0
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+
+        self._httpd = _StandInHTTPServer((host, port), StandInHandler)
+        self._httpd.stand_in = self
+        self._threads: list[threading.Thread] = []
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def create_game(self, game_id: str, **params) -> LocalGame:
+        """
+        Create a game (its phase clock starts now).
+        :param game_id: (str) The game id.
+        :param params: Parameters of LocalGame overriding those of the server.
+        :return: (LocalGame) The game.
+        """
+        kwargs = dict(planning_seconds=self.planning_seconds, adjudication_seconds=self.adjudication_seconds,
+                      auto_advance=self.auto_advance, max_turns=self.max_turns)
+        kwargs.update(params)
+        game = LocalGame(game_id, deepcopy(self.template), **kwargs)
+        with self._lock:
+            self.games[game_id] = game
+        return game
+
+    def get_game(self, game_id: str) -> Union[LocalGame, None]:
+        with self._lock:
+            game = self.games.get(game_id)
+        if game is None and self.auto_create:
+            game = self.create_game(game_id)
+        return game
+
+    def count(self, method: str, route: str, num_bytes: int) -> None:
+        with self._lock:
+            self.requests[f"{method} {route}"] += 1
+            self.sent_bytes += num_bytes
+
+    def stats(self) -> dict:
+        """Traffic served so far: requests by route, documents received and bytes sent."""
+        with self._lock:
+            return {
+                "requests": sum(self.requests.values()),
+                "requests_by_route": dict(self.requests),
+                "received_docs": self.received_docs,
+                "sent_bytes": self.sent_bytes,
+                "games": len(self.games),
+            }
+
+    def _run_clock(self) -> None:
+        tick = max(0.001, min(0.05, (self.planning_seconds + self.adjudication_seconds) / 20))
+        while not self._stop_event.wait(tick):
+            with self._lock:
+                games = list(self.games.values())
+            for game in games:
+                game.tick()
+
+    def start(self) -> "SergeStandIn":
+        """Start serving, and advancing the phases of the games, in background threads."""
+        self._stop_event.clear()
+        self._threads = [threading.Thread(target=self._httpd.serve_forever, daemon=True),
+                         threading.Thread(target=self._run_clock, daemon=True)]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
@@ -0,0 +1,267 @@
+# Copyright 2024 The Johns Hopkins University Applied Physics Laboratory LLC
+# All rights reserved.
+#
+# Licensed under the 3-Clause BSD License (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://opensource.org/licenses/BSD-3-Clause
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import itertools
+import json
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Iterable, Iterator, Union
+
+import numpy as np
+
+from .agents import make_agent, policy_id
+from .hat_env import HatEnv
+from .hat_env_config import HatEnvConfig, FrozenHatEnvConfig
+from .messages import ShipDestroyedMessage, WeaponEndMessage
+
+
+class SweepCell:
+    """One episode of a parameter sweep: a config, a seed and a policy (agent name and parameters)."""
+    def __init__(self, config: FrozenHatEnvConfig, overrides: dict, seed: int, agent: str, agent_params: dict):
+        """
+        :param config: (FrozenHatEnvConfig) The environment config of the episode, seed included.
+        :param overrides: (dict) The config parameters changed from the base config by the design (for reporting).
+        :param seed: (int) The episode seed.
+        :param agent: (str) The name of a registered agent.
+        :param agent_params: (dict) The agent parameters.
+        """
+        self.config = config
+        self.overrides = overrides
+        self.seed = seed
+        self.agent = agent
+        self.agent_params = agent_params
+        self.policy_id = policy_id(agent, agent_params)
+
+    @property
+    def key(self) -> tuple[str, int, str]:
+        return self.config.config_hash, self.seed, self.policy_id
+
+
+def _sweep_base_config(base_config: Union[HatEnvConfig, dict, None]) -> FrozenHatEnvConfig:
+    if base_config is None or isinstance(base_config, (dict, str)):
+        base_config = HatEnvConfig(base_config)
+    # sweeps never render, and printing from hundreds of worker episodes is useless
+    return base_config.freeze().replace(render_env=False, verbose=False)
+
+
+def _make_cells(base: FrozenHatEnvConfig, config_points: Iterable[dict], agent: str, agent_points: Iterable[dict],
+                seeds: Iterable[int]) -> list[SweepCell]:
+    agent_points = list(agent_points)
+    seeds = list(seeds)
+    cells = []
+    for overrides in config_points:
+        config = base.replace(**overrides)
+        for agent_params in agent_points:
+            for seed in seeds:
+                cells.append(SweepCell(config.replace(seed=seed), overrides, seed, agent, agent_params))
+    return cells
+
+
+def _grid_points(grid: dict) -> Iterator[dict]:
+    names = list(grid)
+    for values in itertools.product(*(grid[name] for name in names)):
+        yield dict(zip(names, values))
+
+
+def grid_design(base_config: Union[HatEnvConfig, dict, None], config_grid: dict[str, list], seeds: Iterable[int],
+                agent: str = "heuristic", agent_grid: dict[str, list] = None) -> list[SweepCell]:
+    """
+    Expand a full-factorial grid over HatEnvConfig parameters and agent parameters.
+    :param base_config: The config the grid is applied to (None for the default config).
+    :param config_grid: (dict) Config parameter name -> list of values, e.g. {"weapon_0_reload_time": [5, 10, 15]}.
+    :param seeds: (Iterable[int]) Seeds to run for every grid point.
+    :param agent: (str) The name of a registered agent.
+    :param agent_grid: (dict) Agent parameter name -> list of values, e.g. {"threshold": [0.35, 0.5]}.
+    :return: (list) The sweep cells.
+    """
+    return _make_cells(_sweep_base_config(base_config), _grid_points(config_grid), agent,
+                       _grid_points(agent_grid or {}), seeds)
+
+
+def _is_int(value) -> bool:
+    return isinstance(value, (int, np.integer)) and not isinstance(value, bool)
+
+
+def _sample(rng: np.random.Generator, space: Union[tuple, list], base_value=None):
+    if isinstance(space, list):
+        return space[rng.integers(len(space))]  # categorical
+    low, high = space
+    value = rng.uniform(low, high)
+    # integer parameters are those with an integer default, or (for agent parameters, which have no default here)
+    #   those whose range bounds are both integers
+    is_int = _is_int(base_value) if base_value is not None else _is_int(low) and _is_int(high)
+    return int(round(value)) if is_int else float(value)
+
+
+def random_design(base_config: Union[HatEnvConfig, dict, None], config_space: dict[str, Union[tuple, list]],
+                  num_points: int, seeds: Iterable[int], agent: str = "heuristic",
+                  agent_space: dict[str, Union[tuple, list]] = None, design_seed: int = 0) -> list[SweepCell]:
+    """
+    Sample a random design over HatEnvConfig parameters and agent parameters.
+    :param base_config: The config the design is applied to (None for the default config).
+    :param config_space: (dict) Config parameter name -> (low, high) range sampled uniformly (rounded for integer
+        parameters), or list of values sampled uniformly.
+    :param num_points: (int) Number of points to sample.
+    :param seeds: (Iterable[int]) Seeds to run for every point.
+    :param agent: (str) The name of a registered agent.
+    :param agent_space: (dict) Agent parameter name -> (low, high) range or list of values. Ranges with integer
+        bounds are sampled as integers (rounded), e.g. {"max_actions": (2, 10)}, so float parameters need float
+        bounds, e.g. {"threshold": (0., 1.)}.
+    :param design_seed: (int) Seed of the sampling of the design (not of the episodes).
+    :return: (list) The sweep cells.
+    """
+    base = _sweep_base_config(base_config)
+    base_values = base.to_dict()
+    agent_space = agent_space or {}
+    rng = np.random.default_rng(design_seed)
+    seeds = list(seeds)
+    cells = []
+    for _ in range(num_points):
+        overrides = {name: _sample(rng, space, base_values[name]) for name, space in config_space.items()}
+        agent_params = {name: _sample(rng, space) for name, space in agent_space.items()}
+        cells.extend(_make_cells(base, [overrides], agent, [agent_params], seeds))
+    return cells
+
+
+def run_episode(cell: SweepCell) -> dict:
+    """
+    Run one episode of a sweep cell.
+    :param cell: (SweepCell) The cell.
+    :return: (dict) The episode results, keyed by the cell key.
+    """
+    start = time.perf_counter()
+    # ship placement and threat outcomes use the global numpy generator, so seed it as well
+    np.random.seed(cell.seed)
+    env = HatEnv(cell.config)
+    agent = make_agent(cell.agent, cell.config, **cell.agent_params)
+    max_steps = math.ceil(cell.config.max_episode_time_in_seconds / cell.config.seconds_per_timestep) + 1
+
+    obs, info = env.reset()
+    total_reward = 0.0
+    steps = launches = threats_eliminated = wasted_weapons = 0
+    ship_destroyed = terminated = truncated = False
+    while not (terminated or truncated) and steps < max_steps:
+        obs, reward, terminated, truncated, info = env.step(agent.heuristic_action(obs))
+        steps += 1
+        total_reward += float(reward)
+        launches += len(obs["launched"])
+        for message in obs["messages"]:
+            if isinstance(message, WeaponEndMessage):
+                if message.destroyed_target:
+                    threats_eliminated += 1
+                else:
+                    wasted_weapons += 1
+            elif isinstance(message, ShipDestroyedMessage):
+                ship_destroyed = True
+
+    return {
+        "config_hash": cell.config.config_hash,
+        "seed": cell.seed,
+        "policy_id": cell.policy_id,
+        "overrides": cell.overrides,
+        "agent": cell.agent,
+        "agent_params": cell.agent_params,
+        "total_reward": total_reward,
+        "steps": steps,
+        "terminated": bool(terminated),
+        "truncated": bool(truncated),
+        "ship_destroyed": ship_destroyed,
+        "launches": launches,
+        "threats_eliminated": threats_eliminated,
+        "wasted_weapons": wasted_weapons,
+        "wall_time_s": time.perf_counter() - start,
+    }
+
+
+class ResultsTable:
+    """
+    Append-only table of sweep results, stored as JSON lines and keyed by (config hash, seed, policy id). Rows are
+    written as soon as an episode finishes, so an interrupted sweep keeps everything computed so far.
+    """
+    def __init__(self, path: str):
+        """
+        :param path: (str) Path to the JSON lines file. Existing results are loaded.
+        """
+        self.path = path
+        self.rows: dict[tuple[str, int, str], dict] = dict()
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                for line in f:
+                    line = line.strip()
+                    if line:
+                        row = json.loads(line)
+                        self.rows[self._key(row)] = row
+
+    @staticmethod
+    def _key(row: dict) -> tuple[str, int, str]:
+        return row["config_hash"], row["seed"], row["policy_id"]
+
+    def __contains__(self, key: tuple[str, int, str]) -> bool:
+        return key in self.rows
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def append(self, row: dict) -> None:
+        self.rows[self._key(row)] = row
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(row) + "\n")
+
+
+class ParameterSweep:
+    """Run sweep cells across a process pool, skipping the cells already in the results table."""
+    def __init__(self, results: Union[ResultsTable, str], max_workers: int = None):
+        """
+        :param results: (Union[ResultsTable, str]) The results table, or a path to its JSON lines file.
+        :param max_workers: (int) Number of worker processes. None uses one per CPU, 0 runs the episodes in this
+            process (useful for debugging).
+        """
+        self.results = results if isinstance(results, ResultsTable) else ResultsTable(results)
+        self.max_workers = max_workers
+
+    def pending(self, cells: Iterable[SweepCell]) -> list[SweepCell]:
+        """Get the cells that still need to be computed (deduplicated)."""
+        pending = {}
+        for cell in cells:
+            if cell.key not in self.results and cell.key not in pending:
+                pending[cell.key] = cell
+        return list(pending.values())
+
+    def run(self, cells: Iterable[SweepCell], progress: bool = False) -> ResultsTable:
+        """
+        Run all the cells not computed yet, streaming their results into the results table.
+        :param cells: (Iterable[SweepCell]) The cells of the sweep.
+        :param progress: (bool) Print a line for each finished episode.
+        :return: (ResultsTable) The results table.
+        """
+        todo = self.pending(cells)
+        if self.max_workers == 0:
+            for i, cell in enumerate(todo):
+                self._record(run_episode(cell), i, len(todo), progress)
+            return self.results
+
+        with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [executor.submit(run_episode, cell) for cell in todo]
+            for i, future in enumerate(as_completed(futures)):
+                self._record(future.result(), i, len(todo), progress)
+        return self.results
+
+    def _record(self, row: dict, i: int, total: int, progress: bool) -> None:
+        self.results.append(row)
+        if progress:
+            print(f"[{i + 1}/{total}] {row['policy_id']} seed={row['seed']} {row['overrides']}: "
+                  f"reward={row['total_reward']:.2f}")
@@ -13,13 +13,46 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from typing import Union, Tuple
+from contextlib import contextmanager
+import math
+from functools import lru_cache
+import os
+from pathlib import Path
+import tempfile
+from typing import IO, Iterator, Union, Tuple
 
 import numpy as np
 
 from .pk_table import get_pk
 
 
+@contextmanager
+def atomic_write(path: Union[str, Path], mode: str = "w") -> Iterator[IO]:
+    """
+    Write a file through a temporary file next to it, which replaces it atomically once written: readers never see a
+    partial file, and a failed write leaves the previous one (and no temporary file).
+    Usage:
+        with atomic_write(path) as f:
+            json.dump(data, f)
+    :param path: (str | Path) The file, whose directory is created if needed.
+    :param mode: (str) Mode of the temporary file ("w" or "wb").
+    :return: (Iterator[IO]) The temporary file, open for writing.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    f = tempfile.NamedTemporaryFile(mode, dir=path.parent, suffix=".tmp", delete=False)
+    try:
+        with f:
+            yield f
+        os.replace(f.name, path)
+    except BaseException:
+        try:
+            os.remove(f.name)
+        except OSError:
+            pass
+        raise
+
+
 def distance(p1: Tuple[float, float], p2: Tuple[float, float]) -> np.float64:
     return np.linalg.norm(np.array(p1) - np.array(p2))
 
@@ -52,6 +85,105 @@ def get_weapon_launch_info(threat_location: np.ndarray, ship_location: np.ndarra
             "time_to_intercept": time_to_intercept}
 
 
+def get_intercept_times(relative_location: np.ndarray, threat_velocity: np.ndarray,
+                        weapon_speed: Union[float, np.ndarray]) -> np.ndarray:
+    """
+    Vectorized time to intercept, i.e. the smallest positive root of the same quadratic solved by
+    get_weapon_launch_info, in closed form.
+    :param relative_location: (..., 2) threat locations relative to the launching ship.
+    :param threat_velocity: (..., 2) threat velocities.
+    :param weapon_speed: weapon speed(s), broadcast against the leading dimensions of the locations.
+    :return: (...) times to intercept, NaN where the weapon can't intercept the threat.
+    """
+    a = np.sum(threat_velocity * threat_velocity, axis=-1) - np.asarray(weapon_speed) ** 2
+    b = 2 * np.sum(relative_location * threat_velocity, axis=-1)
+    c = np.sum(relative_location * relative_location, axis=-1)
+    a, b, c = np.broadcast_arrays(a, b, c)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        discriminant = b * b - 4 * a * c
+        sqrt_discriminant = np.sqrt(np.where(discriminant >= 0, discriminant, np.nan))
+        root_1 = (-b - sqrt_discriminant) / (2 * a)
+        root_2 = (-b + sqrt_discriminant) / (2 * a)
+        linear_root = -c / b  # the quadratic degenerates when the threat is as fast as the weapon
+    root_1 = np.where(a == 0, linear_root, root_1)
+    root_2 = np.where(a == 0, np.nan, root_2)
+
+    root_1 = np.where(root_1 > 0, root_1, np.nan)
+    root_2 = np.where(root_2 > 0, root_2, np.nan)
+    return np.fmin(root_1, root_2)
+
+
+class InterceptGeometry:
+    """
+    Intercept of a constant-velocity threat by weapons launched from a fixed ship, as a function of the time elapsed
+    since the threat was at a reference location. With r(tau) = r_0 + tau * v the threat location relative to the ship,
+    the intercept quadratic a * t^2 + b * t + c of get_weapon_launch_info has:
+        a = v.v - speed^2,  b(tau) = b_0 + 2 * tau * v.v,  c(tau) = c_0 + b_0 * tau + tau^2 * v.v
+    so only the elapsed time needs to be computed when the threat moves.
+    """
+    def __init__(self, threat_location: np.ndarray, threat_velocity: np.ndarray, ship_location: np.ndarray,
+                 weapon_speeds: Tuple[float, ...]):
+        """
+        :param threat_location: (np.ndarray) Reference location of the threat.
+        :param threat_velocity: (np.ndarray) Velocity of the threat.
+        :param ship_location: (np.ndarray) Location of the ship launching the weapons.
+        :param weapon_speeds: (tuple) Speed of each weapon type.
+        """
+        self.reference_location = (float(threat_location[0]), float(threat_location[1]))
+        self.velocity = (float(threat_velocity[0]), float(threat_velocity[1]))
+        self.ship_location = (float(ship_location[0]), float(ship_location[1]))
+        self.weapon_speeds = tuple(weapon_speeds)
+
+        vx, vy = self.velocity
+        rx, ry = self.reference_location[0] - self.ship_location[0], self.reference_location[1] - self.ship_location[1]
+        self.v_dot_v = vx * vx + vy * vy
+        self.b_0 = 2 * (rx * vx + ry * vy)
+        self.c_0 = rx * rx + ry * ry
+        self.a = tuple(self.v_dot_v - speed ** 2 for speed in self.weapon_speeds)
+
+    def matches(self, threat_velocity, ship_location) -> bool:
+        """Whether the geometry still applies to a threat with this velocity, seen from a ship at this location."""
+        return (self.velocity == (float(threat_velocity[0]), float(threat_velocity[1]))
+                and self.ship_location == (float(ship_location[0]), float(ship_location[1])))
+
+    def elapsed_time(self, threat_location) -> float:
+        """Time elapsed since the reference location, for a threat now at <threat_location>."""
+        if self.v_dot_v == 0:
+            return 0.
+        dx = float(threat_location[0]) - self.reference_location[0]
+        dy = float(threat_location[1]) - self.reference_location[1]
+        return (dx * self.velocity[0] + dy * self.velocity[1]) / self.v_dot_v
+
+    def intercept_time(self, elapsed_time: float, weapon_idx: int) -> Union[float, None]:
+        """
+        Time to intercept for a weapon launched <elapsed_time> seconds after the threat was at the reference location.
+        :param elapsed_time: (float) Time elapsed since the reference location.
+        :param weapon_idx: (int) Index of the weapon speed.
+        :return: (float) Smallest positive time to intercept, None if the weapon can't intercept the threat.
+        """
+        a = self.a[weapon_idx]
+        b = self.b_0 + 2 * elapsed_time * self.v_dot_v
+        c = self.c_0 + self.b_0 * elapsed_time + elapsed_time * elapsed_time * self.v_dot_v
+        if a == 0:  # the threat is as fast as the weapon
+            roots = (-c / b,) if b != 0 else ()
+        else:
+            discriminant = b * b - 4 * a * c
+            if discriminant < 0:
+                return None
+            sqrt_discriminant = math.sqrt(discriminant)
+            roots = ((-b - sqrt_discriminant) / (2 * a), (-b + sqrt_discriminant) / (2 * a))
+        roots = [t for t in roots if t > 0]
+        return min(roots) if roots else None
+
+    def intercept_distance(self, elapsed_time: float, weapon_idx: int) -> float:
+        """Distance from the ship to the intercept point (0 if the weapon can't intercept the threat)."""
+        time_to_intercept = self.intercept_time(elapsed_time, weapon_idx)
+        # the weapon flies straight to the intercept point at constant speed
+        return 0. if time_to_intercept is None else self.weapon_speeds[weapon_idx] * time_to_intercept
+
+
+@lru_cache(maxsize=None)
 def compute_pk_ring_radii() -> Tuple[float, float, float]:
     r = [item for item in range(0, 40000, 100)]
     weapon_0_threat_0_pk = [get_pk(d, 0, 0) for d in range(0, 40000, 100)]
@@ -75,6 +207,3 @@ def compute_pk_ring_radii() -> Tuple[float, float, float]:
     long_weapon_pk_radius = float(np.mean([r_list[0][1], r_list[1][1]]))  # weapon 0
 
     return low_pk_ring_radius, short_weapon_pk_radius, long_weapon_pk_radius
-
-
-
@@ -0,0 +1,180 @@
+# Copyright 2024 The Johns Hopkins University Applied Physics Laboratory LLC
+# All rights reserved.
+#
+# Licensed under the 3-Clause BSD License (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://opensource.org/licenses/BSD-3-Clause
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from typing import Union
+
+import numpy as np
+
+from .heuristic_agent import HeuristicAgent
+from .pk_table import get_pk_array
+from .utils import get_intercept_times
+
+SHIP_KEYS = ("ship_0", "ship_1")
+
+
+class ArrayObservation:
+    """
+    Array view of a HAT environment observation, with the threats seen by either ship along a single axis (in the
+    order the heuristic agent considers them: threats seen by ship 0, then threats only seen by ship 1).
+    """
+    def __init__(self, threat_ids: list[str], threat_type: np.ndarray, location: np.ndarray, velocity: np.ndarray,
+                 distance: np.ndarray, seen: np.ndarray, targeted: np.ndarray, ship_location: np.ndarray,
+                 inventory: np.ndarray, target_ship: np.ndarray, time_of_arrival: np.ndarray,
+                 survival: np.ndarray):
+        """
+        :param threat_ids: (list[str]) IDs of the n threats.
+        :param threat_type: (n,) threat types.
+        :param location: (n, 2) threat locations.
+        :param velocity: (n, 2) threat velocities.
+        :param distance: (2, n) distance of each threat to each ship.
+        :param seen: (2, n) whether each ship observes each threat.
+        :param targeted: (n,) whether a weapon is already in flight against each threat.
+        :param ship_location: (2, 2) ship locations.
+        :param inventory: (2, 2) weapon inventory, indexed by [ship, weapon type].
+        :param target_ship: (n,) ID of the ship targeted by each threat.
+        :param time_of_arrival: (n,) estimated time (in seconds) for each threat to reach its target ship.
+        :param survival: (n,) probability that each threat survives the weapons already in flight against it.
+        """
+        self.threat_ids = threat_ids
+        self.threat_type = threat_type
+        self.location = location
+        self.velocity = velocity
+        self.distance = distance
+        self.seen = seen
+        self.targeted = targeted
+        self.ship_location = ship_location
+        self.inventory = inventory
+        self.target_ship = target_ship
+        self.time_of_arrival = time_of_arrival
+        self.survival = survival
+
+    @classmethod
+    def from_observation(cls, observation: dict) -> "ArrayObservation":
+        """Build the array view of an observation, as returned by HatEnv.reset and HatEnv.step."""
+        index: dict[str, int] = dict()
+        threats: list[dict] = []
+        for ship_key in SHIP_KEYS:
+            for threat in observation[ship_key]["threats"]:
+                if threat["threat_id"] not in index:
+                    index[threat["threat_id"]] = len(threats)
+                    threats.append(threat)
+
+        n = len(threats)
+        distance = np.zeros((2, n))
+        seen = np.zeros((2, n), dtype=bool)
+        for s, ship_key in enumerate(SHIP_KEYS):
+            for threat in observation[ship_key]["threats"]:
+                i = index[threat["threat_id"]]
+                distance[s, i] = threat["distance"]
+                seen[s, i] = True
+
+        targeted_ids = {w["target_id"] for ship_key in SHIP_KEYS for w in observation[ship_key]["weapons"]}
+        threat_ids = [t["threat_id"] for t in threats]
+        return cls(
+            threat_ids=threat_ids,
+            threat_type=np.array([t["threat_type"] for t in threats], dtype=int),
+            location=np.array([t["location"] for t in threats], dtype=float).reshape(n, 2),
+            velocity=np.array([t["velocity"] for t in threats], dtype=float).reshape(n, 2),
+            distance=distance,
+            seen=seen,
+            targeted=np.array([threat_id in targeted_ids for threat_id in threat_ids], dtype=bool),
+            ship_location=np.array([observation[ship_key]["location"] for ship_key in SHIP_KEYS], dtype=float),
+            inventory=np.array([[observation[ship_key]["inventory"]["weapon_0_inventory"],
+                                 observation[ship_key]["inventory"]["weapon_1_inventory"]]
+                                for ship_key in SHIP_KEYS]),
+            target_ship=np.array([t["target_ship"] for t in threats], dtype=int),
+            time_of_arrival=np.array([t["estimated_time_of_arrival"] for t in threats], dtype=float),
+            survival=np.array([np.prod(1 - np.asarray(t["weapons_assigned_p_kill"], dtype=float)) for t in threats]),
+        )
+
+
+class VectorizedHeuristicAgent(HeuristicAgent):
+    """
+    Array-native version of the HeuristicAgent. The threat x ship x weapon weights are computed in a single vectorized
+    pass, and the top actions are selected with a partial sort, returning the same actions as HeuristicAgent.
+    """
+    def action_weights(self, obs: ArrayObservation) -> np.ndarray:
+        """
+        Compute the heuristic weight of launching each weapon type from each ship at each threat: the urgency of the
+        threat for the ship times the PK of the weapon at the intercept point.
+        :param obs: (ArrayObservation) The observation.
+        :return: (2, 2, n) weights, indexed by [ship, weapon type, threat].
+        """
+        urgency = np.where(obs.distance > self.max_urgency_dist, 1 - obs.distance / self.max_threat_dist, 1.0)
+
+        relative_location = obs.location[None, :, :] - obs.ship_location[:, None, :]  # (ship, threat, 2)
+        weapon_speeds = np.array([self.weapon_0_speed, self.weapon_1_speed])
+        time_to_intercept = get_intercept_times(relative_location[:, None, :, :], obs.velocity[None, None, :, :],
+                                                weapon_speeds[None, :, None])  # (ship, weapon, threat)
+
+        # Weapons may not be able to intercept, so set dist=0, which gives 0 prob weight
+        intercept_offset = (relative_location[:, None, :, :]
+                            + np.nan_to_num(time_to_intercept)[..., None] * obs.velocity)
+        dist_to_intercept = np.where(np.isnan(time_to_intercept), 0., np.linalg.norm(intercept_offset, axis=-1))
+
+        pk = get_pk_array(dist_to_intercept, np.arange(2)[None, :, None], obs.threat_type[None, None, :])
+        return urgency[:, None, :] * pk
+
+    def _top_actions(self, weights: np.ndarray) -> np.ndarray:
+        """Indices of the <max_actions> largest weights, in decreasing order, ties kept in their original order."""
+        k = min(self.max_actions, len(weights))
+        if k == 0:
+            return np.zeros(0, dtype=int)
+        if k < len(weights):
+            kth_weight = np.partition(weights, len(weights) - k)[len(weights) - k]
+            above = np.flatnonzero(weights > kth_weight)
+            ties = np.flatnonzero(weights == kth_weight)[:k - len(above)]
+            top = np.sort(np.concatenate([above, ties]))
+        else:
+            top = np.arange(len(weights))
+        return top[np.argsort(-weights[top], kind="stable")]
+
+    def heuristic_action(self, observation: Union[dict, ArrayObservation]):
+        """
+        Strategy is to launch the most likely weapons to destroy the most urgent threats, up to some set max number of
+        per turn. Only launch a weapon at a threat if no weapon has been launched against it yet. Decisions are made
+        for both ships.
+        :param observation: (Union[dict, ArrayObservation]) The observation from the HAT environment, or its array
+            view.
+        :return: (list) List of actions to take at this step.
+        """
+        if isinstance(observation, ArrayObservation):
+            obs = observation
+        else:
+            obs = ArrayObservation.from_observation(observation)
+        if len(obs.threat_ids) == 0:
+            return []
+
+        weights = self.action_weights(obs)
+        weapon_0_weight, weapon_1_weight = weights[:, 0, :], weights[:, 1, :]
+
+        # per ship weapon choice: the best weapon if any is above the threshold, falling back on the other weapon when
+        #   the best one is out of inventory (mirrors HeuristicAgent._get_ship_weapon_choice)
+        above_threshold = (weapon_0_weight > self.threshold) | (weapon_1_weight > self.threshold)
+        use_weapon_0 = (weapon_0_weight > weapon_1_weight) & (obs.inventory[:, 0:1] > 0)
+        use_weapon_1 = ~use_weapon_0 & (obs.inventory[:, 1:2] > 0)
+        ship_valid = obs.seen & above_threshold & (use_weapon_0 | use_weapon_1)  # (ship, threat)
+        ship_weight = np.where(use_weapon_0, weapon_0_weight, weapon_1_weight)
+        ship_weapon = np.where(use_weapon_0, 0, 1)
+
+        # ship choice: ship 0 only if strictly better than ship 1
+        use_ship_0 = ship_valid[0] & (~ship_valid[1] | (ship_weight[0] > ship_weight[1]))
+        ship = np.where(use_ship_0, 0, 1)
+        candidates = np.flatnonzero(~obs.targeted & (ship_valid[0] | ship_valid[1]))
+
+        threat_index = np.arange(len(obs.threat_ids))
+        candidate_weight = ship_weight[ship, threat_index][candidates]
+        chosen = candidates[self._top_actions(candidate_weight)]
+        return [(int(ship[i]), int(ship_weapon[ship[i], i]), obs.threat_ids[i]) for i in chosen]
@@ -0,0 +1,181 @@
+# Copyright 2024 The Johns Hopkins University Applied Physics Laboratory LLC
+# All rights reserved.
+#
+# Licensed under the 3-Clause BSD License (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://opensource.org/licenses/BSD-3-Clause
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import time
+from typing import Callable, Union
+
+from .serge import CHANGE_FEED_TIMEOUT
+
+
+class WaitStrategy:
+    """
+    How the Serge runner waits for new game messages: <next_messages> waits for a while, and returns the messages
+    received since the last call (possibly none). The game is a SergeGame, or an AsyncSergeGame for the async versions.
+    """
+    def __init__(self, sleep: Callable[[float], None] = time.sleep):
+        """
+        :param sleep: (Callable[[float], None]) Function waiting the given number of seconds (for testing).
+        """
+        self.sleep = sleep
+
+    def delay(self) -> float:
+        """Time to wait before the next poll, in seconds."""
+        raise NotImplementedError
+
+    def observe(self, messages: list[dict]) -> None:
+        """Update the strategy with new messages."""
+        pass
+
+    def next_messages(self, game) -> list[dict]:
+        self.sleep(self.delay())
+        messages = game.get_new_messages()
+        self.observe(messages)
+        return messages
+
+    async def next_messages_async(self, game) -> list[dict]:
+        await asyncio.sleep(self.delay())
+        messages = await game.poll_new_messages()
+        self.observe(messages)
+        return messages
+
+
+class FixedPolling(WaitStrategy):
+    def __init__(self, interval: float = 3., sleep: Callable[[float], None] = time.sleep):
+        """
+        Poll the game every <interval> seconds.
+        :param interval: (float) Time between polls, in seconds.
+        :param sleep: (Callable[[float], None]) Function waiting the given number of seconds (for testing).
+        """
+        super().__init__(sleep)
+        self.interval = interval
+        self._polls = 0
+
+    def delay(self) -> float:
+        # the first poll is immediate
+        self._polls += 1
+        return 0. if self._polls == 1 else self.interval
+
+
+class AdaptivePolling(WaitStrategy):
+    """
+    Poll the game more often as the end of the current phase approaches, and less often while nothing happens.
+    The duration of each phase (e.g. planning) is estimated from the phase changes observed so far (exponential moving
+    average). Before the expected end of the phase, each wait is half the time remaining. Past the expected end (or
+    when the phase is unknown), the wait grows geometrically from <min_interval> to <max_interval>. No wait exceeds
+    <max_interval>, which bounds the time to notice a phase ended early or late by an umpire: by default the 3 seconds
+    of FixedPolling, so that only the polls around the expected end of the phase are more frequent.
+    """
+    def __init__(self, min_interval: float = 0.5, max_interval: float = 3., idle_backoff: float = 1.5,
+                 default_phase_duration: float = 60., smoothing: float = 0.3,
+                 clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], None] = time.sleep):
+        """
+        :param min_interval: (float) Min time between polls, in seconds.
+        :param max_interval: (float) Max time between polls, in seconds (fewer polls, but a phase change may be
+            noticed that much later).
+        :param idle_backoff: (float) Growth factor of the wait past the expected end of a phase.
+        :param default_phase_duration: (float) Expected duration of a phase before any of it was observed, in seconds.
+        :param smoothing: (float) Weight of the last observed duration in the estimate of a phase duration.
+        :param clock: (Callable[[], float]) Monotonic clock, in seconds (for testing).
+        :param sleep: (Callable[[float], None]) Function waiting the given number of seconds (for testing).
+        """
+        super().__init__(sleep)
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.idle_backoff = idle_backoff
+        self.default_phase_duration = default_phase_duration
+        self.smoothing = smoothing
+        self.clock = clock
+        self.phase: Union[str, None] = None
+        self.phase_start: Union[float, None] = None
+        self.phase_durations: dict[str, float] = {}  # estimated duration of each phase, in seconds
+        self._idle_interval = 0.
+
+    def expected_phase_end(self) -> Union[float, None]:
+        """Expected end of the current phase (clock time), None if the phase is unknown."""
+        if self.phase is None:
+            return None
+        return self.phase_start + self.phase_durations.get(self.phase, self.default_phase_duration)
+
+    def observe(self, messages: list[dict]) -> None:
+        now = self.clock()
+        for message in messages:
+            if message.get("messageType") != "InfoMessage" or message.get("phase") == self.phase:
+                continue
+            if self.phase is not None and self.phase_start is not None:
+                duration = now - self.phase_start
+                previous = self.phase_durations.get(self.phase)
+                self.phase_durations[self.phase] = (
+                    duration if previous is None else self.smoothing * duration + (1 - self.smoothing) * previous
+                )
+            self.phase = message["phase"]
+            self.phase_start = now
+            self._idle_interval = 0.
+
+    def delay(self) -> float:
+        phase_end = self.expected_phase_end()
+        remaining = None if phase_end is None else phase_end - self.clock()
+        if remaining is not None and remaining > self.min_interval:
+            return min(self.max_interval, max(self.min_interval, remaining / 2))
+        # the phase should be over (or is unknown): back off while nothing happens
+        self._idle_interval = min(self.max_interval, max(self.min_interval, self._idle_interval * self.idle_backoff))
+        return self._idle_interval
+
+
+class ChangeFeed(WaitStrategy):
+    """
+    Wait on the change feed of the game (see SergeGame.wait_for_messages): the server responds as soon as there are
+    new messages. If the server has no change feed (or the request fails), the fallback strategy is used instead.
+    Note: the Serge API has no change feed, only the stand-in serves it (see serge_server.py), so this strategy is
+    opt-in, e.g. for the load tests.
+    """
+    def __init__(self, timeout: float = CHANGE_FEED_TIMEOUT, fallback: WaitStrategy = None):
+        """
+        :param timeout: (float) Max time a change feed request waits for new messages, in seconds.
+        :param fallback: (WaitStrategy) Strategy used when the change feed is not available (default: adaptive
+            polling). It also observes the messages of the change feed.
+        """
+        self.fallback = AdaptivePolling() if fallback is None else fallback
+        super().__init__(self.fallback.sleep)
+        self.timeout = timeout
+
+    def delay(self) -> float:
+        return self.fallback.delay()
+
+    def observe(self, messages: list[dict]) -> None:
+        self.fallback.observe(messages)
+
+    def next_messages(self, game) -> list[dict]:
+        if game.changes_supported:
+            messages = game.wait_for_messages(self.timeout)
+            if messages is not None:
+                self.observe(messages)
+                return messages
+        return self.fallback.next_messages(game)
+
+    async def next_messages_async(self, game) -> list[dict]:
+        if game.changes_supported:
+            messages = await game.poll_changes(self.timeout)
+            if messages is not None:
+                self.observe(messages)
+                return messages
+        return await self.fallback.next_messages_async(game)
+
+
+WAIT_STRATEGIES = {
+    "fixed": FixedPolling,
+    "adaptive": AdaptivePolling,
+    "changes": ChangeFeed,
+}
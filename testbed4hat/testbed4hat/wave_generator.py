@@ -23,6 +23,12 @@ from .utils import distance
 DEFAULT_THREAT_0_SPEED = 10 * 1_000 / 60 / np.sqrt(2)  # 10 km/min -> m/s, from cartesian to radial
 DEFAULT_THREAT_1_SPEED = 12 * 1_000 / 60 / np.sqrt(2)  # 12 km/min -> m/s, from cartesian to radial
 DEGREE_IN_RADIANS = np.deg2rad(1)
+DEFAULT_SCHEDULE = {
+    0: (1, 0),  # start of sim
+    4 * 60: (1, 1),  # 4 minutes
+    5 * 60 + 30: (0, 1),  # 5 minutes 30 seconds
+    7 * 60: (1, 1),  # 7 minutes
+}
 
 
 class WaveGenerator:
@@ -85,12 +91,7 @@ class WaveGenerator:
         # schedule should be a mapping from second to (num_threat_0, num_threat_1)
         self.rng = np.random.default_rng(seed)
         if schedule == "default":
-            self.schedule = {
-                0: (1, 0),  # start of sim
-                4 * 60: (1, 1),  # 4 minutes
-                5 * 60 + 30: (0, 1),  # 5 minutes 30 seconds
-                7 * 60: (1, 1),  # 7 minutes
-            }
+            self.schedule = dict(DEFAULT_SCHEDULE)
         elif schedule == "random":
             # up to 50 weapons spread over a schedule of between 10 and 20 minutes, only 1 of each weapon
             # can be launched per second
@@ -0,0 +1,202 @@
+# Copyright 2024 The Johns Hopkins University Applied Physics Laboratory LLC
+# All rights reserved.
+#
+# Licensed under the 3-Clause BSD License (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://opensource.org/licenses/BSD-3-Clause
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from typing import Union
+
+import numpy as np
+
+from .pk_table import get_pk_array
+from .utils import get_intercept_times
+from .vectorized_heuristic_agent import ArrayObservation
+
+OBJECTIVES = ("kills", "survival")
+
+
+class WTASolution:
+    def __init__(self, actions: list[tuple[int, int, str]], launch_seconds: list[int], p_kills: list[float],
+                 value: float, upper_bound: float):
+        """
+        Weapon-target assignment for one environment step.
+        :param actions: (list) Actions (ship ID, weapon type, threat ID), in the order they should be given to the env.
+        :param launch_seconds: (list[int]) Expected launch second (within the step) of each action.
+        :param p_kills: (list[float]) PK of each action at its expected launch second.
+        :param value: (float) Objective value gained by the assignment (expected threat kills, or increase of the log
+            probability of survival of the ships).
+        :param upper_bound: (float) Upper bound of the objective value any assignment could gain at this step.
+        """
+        self.actions = actions
+        self.launch_seconds = launch_seconds
+        self.p_kills = p_kills
+        self.value = value
+        self.upper_bound = upper_bound
+
+    @property
+    def gap(self) -> float:
+        """Fraction of the upper bound not reached by the assignment (0 means the assignment is optimal)."""
+        return 0.0 if self.upper_bound <= 0 else 1 - self.value / self.upper_bound
+
+
+class WTAAgent:
+    """
+    Weapon-target assignment (WTA) agent for the HAT simulation environment. Unlike the HeuristicAgent, the agent
+    models how the environment executes actions within a step: each ship launches at most one weapon per second, in
+    the order the actions are given, a weapon type can't be launched again before it is reloaded, at most
+    <seconds_per_timestep> // <reload_time> weapons of a type can be launched per ship per step, and the PK of a
+    weapon is set by the distance to its target at the second it is launched. Several weapons may be assigned to the
+    same threat, and the weapons already in flight are accounted for.
+
+    The assignment is built with a marginal-gain greedy over (ship, weapon type, threat) launches, and comes with an
+    upper bound of the objective (a relaxation dropping the ship, weapon type and timing constraints), so the
+    optimality gap of each decision is known.
+    """
+    def __init__(self, weapon_0_speed: float, weapon_1_speed: float, weapon_0_reload_time: int,
+                 weapon_1_reload_time: int, seconds_per_timestep: int,
+                 threat_kill_probs: tuple[float, float] = (1., 1.), objective: str = "kills", threshold: float = 0.35,
+                 max_actions: int = None):
+        """
+        Initialize WTA agent.
+        :param weapon_0_speed: (float) Speed of weapon type 0.
+        :param weapon_1_speed: (float) Speed of weapon type 1.
+        :param weapon_0_reload_time: (int) Number of seconds it takes to reload weapon 0.
+        :param weapon_1_reload_time: (int) Number of seconds it takes to reload weapon 1.
+        :param seconds_per_timestep: (int) Number of seconds simulated for each environment step.
+        :param threat_kill_probs: (tuple[float, float]) Probability of threat 0 and threat 1 destroying a ship they
+            reach. Only used by the "survival" objective.
+        :param objective: (str) "kills" maximizes the expected number of threats destroyed, "survival" maximizes the
+            log probability of survival of the ships.
+        :param threshold: (float) Minimum PK of a weapon launch.
+        :param max_actions: (int) The maximum number of actions to provide to the environment for a given step (None
+            for no limit other than the launch constraints).
+        """
+        if objective not in OBJECTIVES:
+            raise ValueError(f"Unknown objective {objective}, must be one of {OBJECTIVES}")
+        self.weapon_speeds = np.array([weapon_0_speed, weapon_1_speed], dtype=float)
+        self.reload_times = np.array([weapon_0_reload_time, weapon_1_reload_time], dtype=int)
+        self.seconds_per_timestep = seconds_per_timestep
+        self.threat_kill_probs = np.array(threat_kill_probs, dtype=float)
+        self.objective = objective
+        self.threshold = threshold
+        self.max_actions = max_actions
+
+    def launch_pk(self, obs: ArrayObservation) -> np.ndarray:
+        """
+        Compute the PK of launching each weapon type from each ship at each threat, at each second of the step. The PK
+        is 0 when the weapon can't reach the threat before the threat reaches its target, or is below the threshold.
+        :param obs: (ArrayObservation) The observation.
+        :return: (2, 2, seconds_per_timestep, n) PKs, indexed by [ship, weapon type, launch second, threat].
+        """
+        seconds = np.arange(self.seconds_per_timestep, dtype=float)
+        # threats move after the actions of each second are processed
+        threat_location = obs.location[None, :, :] + seconds[:, None, None] * obs.velocity[None, :, :]  # (t, n, 2)
+        relative_location = threat_location[None] - obs.ship_location[:, None, None, :]  # (ship, t, n, 2)
+
+        pk = get_pk_array(np.linalg.norm(relative_location, axis=-1)[:, None],
+                          np.arange(2)[None, :, None, None], obs.threat_type[None, None, None, :])
+        time_to_intercept = get_intercept_times(relative_location[:, None], obs.velocity[None, None, None],
+                                                self.weapon_speeds[None, :, None, None])
+        with np.errstate(invalid="ignore"):
+            in_time = seconds[:, None] + time_to_intercept < obs.time_of_arrival[None, :]  # False when NaN
+        feasible = in_time & obs.seen[:, None, None, :] & (pk >= self.threshold)
+        return np.where(feasible, pk, 0.)
+
+    def _gain(self, survival: np.ndarray, pk: np.ndarray, lethality: np.ndarray) -> np.ndarray:
+        """Objective gain of a launch with the given PK at threats with the given survival probability."""
+        if self.objective == "kills":
+            return survival * pk
+        return np.log1p(-lethality * survival * (1 - pk)) - np.log1p(-lethality * survival)
+
+    def _upper_bound(self, survival: np.ndarray, max_pk: np.ndarray, lethality: np.ndarray, num_launches: int) \
+            -> float:
+        """
+        Objective value of the best assignment of <num_launches> launches when every launch can reach its target with
+        the best PK possible for it. The gain of each extra launch at a threat decreases, so the best assignment takes
+        the largest gains across all threats.
+        """
+        if num_launches == 0 or len(survival) == 0:
+            return 0.
+        survival_after = survival[None, :] * (1 - max_pk[None, :]) ** np.arange(num_launches)[:, None]
+        gains = self._gain(survival_after, max_pk[None, :], lethality[None, :]).ravel()
+        num_launches = min(num_launches, len(gains))
+        return float(np.sum(np.partition(gains, len(gains) - num_launches)[len(gains) - num_launches:]))
+
+    def solve(self, observation: Union[dict, ArrayObservation]) -> WTASolution:
+        """
+        Compute the weapon-target assignment for the current step.
+        :param observation: (Union[dict, ArrayObservation]) The observation from the HAT environment, or its array
+            view.
+        :return: (WTASolution) The assignment.
+        """
+        if isinstance(observation, ArrayObservation):
+            obs = observation
+        else:
+            obs = ArrayObservation.from_observation(observation)
+        num_seconds = self.seconds_per_timestep
+        capacity = np.minimum(obs.inventory, num_seconds // self.reload_times[None, :])  # (ship, weapon)
+        max_actions = int(np.sum(np.minimum(capacity.sum(axis=1), num_seconds)))
+        if self.max_actions is not None:
+            max_actions = min(max_actions, self.max_actions)
+        if len(obs.threat_ids) == 0 or max_actions == 0:
+            return WTASolution([], [], [], 0., 0.)
+
+        pk = self.launch_pk(obs)
+        survival = obs.survival.astype(float)
+        # can't be 1, or a threat would be certain to destroy its target whatever the launches
+        lethality = np.minimum(self.threat_kill_probs[obs.threat_type], 1 - 1e-9)
+        upper_bound = self._upper_bound(survival, pk.max(axis=(0, 1, 2)), lethality, max_actions)
+
+        next_second = np.zeros(2, dtype=int)  # next second each ship can launch at
+        ready_second = np.zeros((2, 2), dtype=int)  # second each weapon of each ship is reloaded
+        launched = np.zeros((2, 2), dtype=int)
+        gains = np.empty((2, 2, len(obs.threat_ids)))
+        chosen = []
+        while len(chosen) < max_actions:
+            launch_second = np.maximum(next_second[:, None], ready_second)
+            for ship in range(2):
+                for weapon in range(2):
+                    if launched[ship, weapon] < capacity[ship, weapon] and launch_second[ship, weapon] < num_seconds:
+                        gains[ship, weapon] = self._gain(survival, pk[ship, weapon, launch_second[ship, weapon]],
+                                                         lethality)
+                    else:
+                        gains[ship, weapon] = 0.
+            ship, weapon, threat = np.unravel_index(np.argmax(gains), gains.shape)
+            if gains[ship, weapon, threat] <= 0:
+                break
+
+            second = int(launch_second[ship, weapon])
+            p_kill = float(pk[ship, weapon, second, threat])
+            chosen.append((second, int(ship), int(weapon), int(threat), p_kill, float(gains[ship, weapon, threat])))
+            survival[threat] *= 1 - p_kill
+            next_second[ship] = second + 1
+            ready_second[ship, weapon] = second + self.reload_times[weapon]
+            launched[ship, weapon] += 1
+
+        # the env launches the actions of a ship in order, so order them by launch second (stable, per ship order kept)
+        chosen.sort(key=lambda c: c[0])
+        return WTASolution(
+            actions=[(ship, weapon, obs.threat_ids[threat]) for _, ship, weapon, threat, _, _ in chosen],
+            launch_seconds=[c[0] for c in chosen],
+            p_kills=[c[4] for c in chosen],
+            value=sum(c[5] for c in chosen),
+            upper_bound=upper_bound,
+        )
+
+    def heuristic_action(self, observation: Union[dict, ArrayObservation]) -> list[tuple[int, int, str]]:
+        """
+        Same interface as HeuristicAgent.heuristic_action, so the agent can be used anywhere the heuristic agent is.
+        :param observation: (Union[dict, ArrayObservation]) The observation from the HAT environment, or its array
+            view.
+        :return: (list) List of actions to take at this step.
+        """
+        return self.solve(observation).actions